@@ -0,0 +1,225 @@
+"""
+Generate a campaign of FLUKA input variants from a base input and a parameter grid.
+
+The grid is a JSON file, e.g.
+    {
+      "base": "fluka/tc99m/LEHRS/LEHRS.inp",
+      "out": "fluka/tc99m/LEHRS/solid",
+      "name": "solid{fill}",
+      "cycles": 5,
+      "seed": 1,
+      "parameters": {
+        "fill": {"values": [98, 99.2, 99.4], "edits": [
+            {"define": ["solid", "solid99"]},
+            {"card": "COMPOUND", "sdum": "LEADvar", "what": 1, "scale": 0.01, "offset": -1},
+            {"card": "COMPOUND", "sdum": "LEADvar", "what": 3, "scale": -0.01}]},
+        "thickness_cm": {"values": [3.2, 4.0], "edits": [
+            {"body": "BBcollim", "index": 2, "offset": 50.0}]},
+        "activity_MBq": {"values": [925]}
+      }
+    }
+Every combination of parameter values is one variant, written as <out>/<name>/<name>_<cycle>.inp
+(cf. solid992/solid992_01.inp). Paths in the grid are relative to the grid file. Edits:
+    define   #define exactly these names (the value itself when the list is omitted); names may use
+             the name fields, e.g. ["solid", "solid{fill}"] selects the input's own #if solid992 block
+    card     WHAT(what) of the active cards of that name (and SDUM) = offset + scale * value
+    body     index-th parameter of a geometry body             = offset + scale * value
+    (none)   recorded in the manifest only (e.g. the source activity used to scale the results)
+In the 'name' template numbers appear without their decimal point (99.2 -> '992').
+Every cycle gets its own RANDOMIZ seed (seed, seed + 1, ... in grid order), so a campaign is
+deterministic and no two cycles share a random sequence. Scoring units must be the same in every
+variant; the manifest (manifest.csv in <out>) lists one row per cycle input.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+
+import fluka_input
+from run_times import parse_out
+
+# ---- CONFIGURATION ----
+MANIFEST_NAME = "manifest.csv"
+SCORING_CARDS = ("USRTRACK", "USRBDX", "USRBIN", "USRYIELD", "USRCOLL", "EVENTBIN", "RESNUCLE")
+UNIT_WHAT = {"RESNUCLE": 2}   # WHAT index (1-based) of the output unit; WHAT(3) for the other scoring cards
+SEED_WHAT = 2             # RANDOMIZ WHAT(2): seed
+PRIMARIES_WHAT = 1        # START WHAT(1): number of primaries
+
+
+# ---------------- grid ----------------
+def load_grid(path):
+    """Read a grid file; paths are resolved against its folder."""
+    path = Path(path)
+    grid = json.loads(path.read_text(encoding="utf-8"))
+    grid["base"] = (path.parent / grid["base"]).resolve()
+    grid["out"] = (path.parent / grid.get("out", ".")).resolve()
+    grid.setdefault("cycles", 1)
+    grid.setdefault("seed", 1)
+    grid.setdefault("parameters", {})
+    return grid
+
+
+def tag(value):
+    """Value as it appears in variant names: 99.2 -> '992', 98 -> '98', 'LEAD' -> 'LEAD'."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{value:g}".replace(".", "").replace("-", "m")
+    return str(value)
+
+
+def combinations(grid):
+    """[{parameter: value}] for every point of the grid, in grid order (last parameter fastest)."""
+    params = grid["parameters"]
+    return [dict(zip(params, values)) for values in itertools.product(*(p["values"] for p in params.values()))]
+
+
+def variant_name(grid, point):
+    template = grid.get("name") or "_".join([Path(grid["base"]).stem] + [f"{k}{{{k}}}" for k in point])
+    return template.format(**{k: tag(v) for k, v in point.items()})
+
+
+# ---------------- edits ----------------
+def apply_edit(model, edit, value, tags=None):
+    """Apply one edit of a parameter to model for the given value (tags: the variant's name fields)."""
+    if "define" in edit:
+        names = edit["define"] if isinstance(edit["define"], list) else [value]
+        fluka_input.set_defines(model, [str(n).format(**(tags or {})) for n in names])
+        return
+    if "card" not in edit and "body" not in edit:
+        return
+
+    new = value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        new = edit.get("offset", 0.0) + edit.get("scale", 1.0) * value
+    if "card" in edit:
+        defines = set(model["defines"])
+        targets = [c for c in fluka_input.cards(model, edit["card"], edit.get("sdum"))
+                   if fluka_input.is_active(c, defines)]
+        if not targets:
+            raise ValueError(f"No active {edit['card']} card" + (f" with SDUM {edit['sdum']}" if "sdum" in edit else ""))
+        for c in targets:
+            fluka_input.set_what(c, edit["what"], new)
+    else:
+        fluka_input.set_body(model, edit["body"], edit["index"], new)
+
+
+def detector_units(model):
+    """{detector name: output unit} of the active scoring cards (first line of each)."""
+    defines = set(model["defines"])
+    return {c["sdum"]: c["whats"][UNIT_WHAT.get(c["name"], 3) - 1] for c in fluka_input.cards(model)
+            if c["name"] in SCORING_CARDS and not c["continuation"] and fluka_input.is_active(c, defines)}
+
+
+def _format_units(units):
+    return ";".join(f"{abs(int(u))}:{name}" for name, u in sorted(units.items(), key=lambda x: (abs(x[1] or 0), x[0]))
+                    if u is not None)
+
+
+# ---------------- generation ----------------
+def generate(grid, write=True):
+    """
+    Emit every variant and cycle of a grid. Returns the manifest rows; with write=False nothing is
+    written (dry run). Unchanged files are not rewritten, so their mtimes survive a regeneration.
+    """
+    base = fluka_input.parse(grid["base"])
+    base_units = None
+    seed = int(grid["seed"])
+    rows = []
+    names = set()
+
+    for point in combinations(grid):
+        name = variant_name(grid, point)
+        tags = {k: tag(v) for k, v in point.items()}
+        if name in names:
+            raise ValueError(f"Variant name {name!r} is not unique; add parameters to the 'name' template.")
+        names.add(name)
+
+        model = fluka_input.copy_model(base)
+        for param, value in point.items():
+            for edit in grid["parameters"][param].get("edits", []):
+                apply_edit(model, edit, value, tags)
+
+        units = detector_units(model)
+        if base_units is None:
+            base_units = units
+        elif units != base_units:
+            raise ValueError(f"{name}: scoring units {units} differ from the first variant {base_units}")
+        randomiz = fluka_input.find(model, "RANDOMIZ")
+        start = fluka_input.find(model, "START")
+
+        folder = grid["out"] / name
+        for cycle in range(1, int(grid["cycles"]) + 1):
+            fluka_input.set_what(randomiz, SEED_WHAT, float(seed))
+            stem = f"{name}_{cycle:02d}"
+            path = folder / f"{stem}.inp"
+            if write:
+                folder.mkdir(parents=True, exist_ok=True)
+                data = fluka_input.to_text(model).encode("latin-1")
+                if not path.exists() or path.read_bytes() != data:
+                    path.write_bytes(data)
+            rows.append({"variant": name, "cycle": cycle, "stem": stem,
+                         "input": path.relative_to(grid["out"]).as_posix(), "seed": seed,
+                         "primaries": start["whats"][PRIMARIES_WHAT - 1],
+                         **point, "units": _format_units(units)})
+            seed += 1
+    return rows
+
+
+def write_manifest(rows, out_dir):
+    out_path = Path(out_dir) / MANIFEST_NAME
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")     # the scheduler rewrites it while running
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def read_manifest(path):
+    """Manifest rows as written by write_manifest (all values as strings)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def join_run_times(rows, out_dir):
+    """
+    Manifest rows with the CPU time and primaries of their FLUKA runs (<stem>NNN.out next to the
+    input, summed over the cycles of that input); None where the input has not been run yet.
+    """
+    out_dir = Path(out_dir)
+    joined = []
+    for row in rows:
+        inp = out_dir / row["input"]
+        outs = sorted(inp.parent.glob(f"{row['stem']}[0-9][0-9][0-9].out"))
+        runs = [parse_out(fp) for fp in outs]
+        joined.append({**row,
+                       "cpu_seconds": sum(c for c, _ in runs) if runs else None,
+                       "primaries_run": sum(n for _, n in runs) if runs else None})
+    return joined
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate FLUKA input variants and seeds from a parameter grid.")
+    p.add_argument("grid", type=Path, help="JSON grid file.")
+    p.add_argument("--out", type=Path, default=None, help="Output folder (overrides the grid's 'out').")
+    p.add_argument("--dry-run", action="store_true", help="List the variants without writing any file.")
+    args = p.parse_args()
+
+    grid = load_grid(args.grid)
+    if args.out:
+        grid["out"] = args.out.resolve()
+    t0 = time.perf_counter()
+    rows = generate(grid, write=not args.dry_run)
+    elapsed = time.perf_counter() - t0
+    n_variants = len({r["variant"] for r in rows})
+    print(f"{n_variants} variants, {len(rows)} inputs (seeds {rows[0]['seed']}-{rows[-1]['seed']}) in {elapsed:.2f} s")
+    if not args.dry_run:
+        print(f"Saved: {write_manifest(rows, grid['out'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Per-cycle convergence of the collimator transmission ratios.
+
+Every setting is run as several independent cycles (e.g. solid99_01 … solid99_05, distinct RANDOMIZ
+seeds). Each cycle's binary USRTRACK outputs (fort.21 = initial, fort.22 = transmitted) are integrated
+on their own, then combined cumulatively in cycle order:
+    R_k = Σ w T / Σ w I        (w = primaries of each cycle)
+with the error of the ratio estimated from the spread between cycles (linearised ratio estimator):
+    var(R_k) = k / (k − 1) · Σ w_c² (T_c − R_k I_c)² / (Σ w I)²,   w normalised to Σ w = 1.
+A setting is converged once adding its last cycle moved the ratio by less than the tolerance and the
+relative error is below it too; otherwise the cycles still needed are estimated from error ∝ 1/√k.
+"""
+from pathlib import Path
+from math import ceil
+import argparse
+import csv
+import sys
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from ratio_calculation import BASE, ISOTOPES, setting_folders
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "energy_spectra"))
+import usrtrack_decode
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root (validate_runs)
+import validate_runs
+
+OUT_DIR = Path(__file__).resolve().parent / "results"
+UNIT_INITIAL, UNIT_TRANSMITTED = 21, 22
+TOLERANCE = 0.01        # relative change / relative error accepted as converged
+
+
+# ---------------- per-cycle integrals ----------------
+def cycle_integral(run):
+    """Fluence integral of all USRTRACK detectors of one decoded cycle (same units as ratio_calculation)."""
+    total = 0.0
+    for d in run["detectors"].values():
+        if d["kind"] == "usrtrack":
+            total += float(np.sum(np.diff(d["edges"]) * 1e6 * np.ravel(d["values"])))   # GeV -> keV widths
+    return total
+
+
+def cycle_pairs(folder: Path, exclude=()):
+    """[(cycle stem, fort.21, fort.22)] for every cycle of a setting folder that has both units."""
+    initial = {f.name.rsplit("_fort.", 1)[0]: f
+               for f in usrtrack_decode.find_cycles(folder, UNIT_INITIAL, exclude)}
+    transmitted = {f.name.rsplit("_fort.", 1)[0]: f
+                   for f in usrtrack_decode.find_cycles(folder, UNIT_TRANSMITTED, exclude)}
+    return [(stem, initial[stem], transmitted[stem]) for stem in sorted(initial) if stem in transmitted]
+
+
+def read_setting(folder: Path, exclude=()):
+    """(stems, primaries, initial, transmitted) arrays over the cycles of one setting, in cycle order."""
+    pairs = cycle_pairs(folder, exclude)
+    if not pairs:
+        return [], np.empty(0), np.empty(0), np.empty(0)
+    runs = usrtrack_decode.read_cycles([fp for _, f21, f22 in pairs for fp in (f21, f22)])
+    ini, tra = runs[0::2], runs[1::2]
+    return ([stem for stem, _, _ in pairs],
+            np.array([r["primaries"] for r in ini], dtype=float),
+            np.array([cycle_integral(r) for r in ini]),
+            np.array([cycle_integral(r) for r in tra]))
+
+
+# ---------------- convergence ----------------
+def cumulative_ratio(weights, initial, transmitted):
+    """
+    Cumulative ratio and its between-cycle error after each cycle (arrays of length n_cycles);
+    the error is NaN for the first cycle. All prefixes are evaluated at once.
+    """
+    w = np.asarray(weights, dtype=float)
+    I = np.asarray(initial, dtype=float)
+    T = np.asarray(transmitted, dtype=float)
+    k = np.arange(1, w.size + 1)
+
+    W = np.cumsum(w)
+    I_bar = np.cumsum(w * I) / W
+    T_bar = np.cumsum(w * T) / W
+    with np.errstate(divide="ignore", invalid="ignore"):
+        R = np.where(I_bar != 0, T_bar / I_bar, np.nan)
+        # Σ w_c² (T_c − R_k I_c)² for every prefix k, expanded so it reuses cumulative sums
+        s = (np.cumsum(w ** 2 * T ** 2) - 2 * R * np.cumsum(w ** 2 * T * I) + R ** 2 * np.cumsum(w ** 2 * I ** 2))
+        var = np.where(k > 1, k / (k - 1) * np.clip(s, 0.0, None) / (W * I_bar) ** 2, np.nan)
+    return R, np.sqrt(var)
+
+
+def assess(stems, weights, initial, transmitted, tol=TOLERANCE):
+    """Convergence summary and cumulative trace of one setting."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_cycle = np.where(initial != 0, transmitted / initial, np.nan)
+    R, err = cumulative_ratio(weights, initial, transmitted)
+    n = len(stems)
+
+    change = abs(R[-1] - R[-2]) / abs(R[-1]) if n > 1 and R[-1] else np.nan
+    rel_err = err[-1] / abs(R[-1]) if n > 1 and R[-1] else np.nan
+    converged = bool(change < tol and rel_err < tol)
+    if converged:
+        needed = n
+    else:  # at least one more cycle, even when only the last change is above the tolerance
+        needed = n + 1 if not np.isfinite(rel_err) else max(n + 1, ceil(n * (rel_err / tol) ** 2))
+    return {
+        "cycles": n,
+        "ratio": R[-1] if n else np.nan,
+        "error": err[-1] if n else np.nan,
+        "between_cycle_sd": float(np.std(per_cycle, ddof=1)) if n > 1 else np.nan,
+        "last_change": change,
+        "converged": converged,
+        "cycles_needed": needed,
+        "trace": list(zip(stems, per_cycle, R, err)),
+    }
+
+
+def analyse_isotope(isotope: str, tol=TOLERANCE):
+    """{setting label: assess(...)} for every setting with per-cycle binaries; failed cycles excluded."""
+    root = BASE / isotope
+    if not root.is_dir():
+        raise FileNotFoundError(f"Isotope folder not found: {root}")
+
+    results = {}
+    for label, folder in setting_folders(root):
+        report = validate_runs.validate(folder, validate_runs.find_inputs(folder), usrbin_units={})
+        bad = validate_runs.bad_runs(report)
+        stems, w, ini, tra = read_setting(folder, exclude=bad)
+        if stems:
+            results[label] = assess(stems, w, ini, tra, tol)
+    return results
+
+
+# ---------------- output ----------------
+def print_convergence(results, isotope: str, tol=TOLERANCE):
+    table = Table(title=f"\nTransmission convergence — {isotope} (tolerance {tol:.1%})")
+    for col in ["Setting", "Cycles", "Transmitted / Initial", "Between-cycle SD",
+                "Last change", "Converged", "Cycles needed"]:
+        table.add_column(col, justify="center")
+    for label, r in sorted(results.items()):
+        table.add_row(
+            label,
+            str(r["cycles"]),
+            f"{r['ratio']:.6f} ± {r['error']:.6f}",
+            f"{r['between_cycle_sd']:.6f}",
+            f"{r['last_change']:.2%}",
+            "yes" if r["converged"] else "no",
+            str(r["cycles_needed"]),
+        )
+    Console(width=120, markup=False).print(table)
+
+
+def write_trace(results, out_path: Path):
+    """Per-cycle and cumulative ratios of every setting, one row per cycle."""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["setting", "k", "cycle", "ratio_cycle", "ratio_cumulative", "error_cumulative"])
+        for label, r in sorted(results.items()):
+            for k, (stem, rc, R, err) in enumerate(r["trace"], start=1):
+                w.writerow([label, k, stem, rc, R, err])
+    return out_path
+
+
+def main():
+    p = argparse.ArgumentParser(description="Per-cycle and cumulative transmission ratios of each collimator setting.")
+    p.add_argument("--isotopes", nargs="+", choices=ISOTOPES, default=ISOTOPES)
+    p.add_argument("--tol", type=float, default=TOLERANCE, help="Relative tolerance for convergence.")
+    args = p.parse_args()
+
+    for iso in args.isotopes:
+        results = analyse_isotope(iso, args.tol)
+        if not results:
+            print(f"No per-cycle fort.{UNIT_INITIAL}/fort.{UNIT_TRANSMITTED} files found under {iso}/.")
+            continue
+        print_convergence(results, iso, args.tol)
+        print(f"Saved: {write_trace(results, OUT_DIR / f'{iso}_convergence.csv')}")
+
+
+if __name__ == "__main__":
+    main()
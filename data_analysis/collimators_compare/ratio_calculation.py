@@ -1,50 +1,39 @@
 #!/usr/bin/env python3
 from pathlib import Path
 from math import sqrt, isfinite
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import sys
+import numpy as np
 from rich.console import Console
 from rich.table import Table
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root (fluka_parsers)
+from fluka_parsers import parse_tab_lis
+
 # Fixed base directory (contains tc99m/ and lu177/)
 BASE = Path("/Users/weli/Documents/pyCharm/MPH5008/data")
+ISOTOPES = ["tc99m", "lu177"]
+# Per-file integrals keyed by path, reused while the file's mtime and size are unchanged
+CACHE_PATH = Path(__file__).resolve().parent / "results" / "integral_cache.json"
 
 # ---------------- core maths ----------------
 def compute_total_energy_with_uncertainty(file_path: Path):
     """
-    Integrate column 3 (dPhi/dE per GeV) across each energy bin width (GeV→keV).
-    Column 4 is the relative uncertainty (fraction or percent). Returns (total, sigma_total).
+    Integrate column 3 (dPhi/dE per GeV) across each energy bin width (GeV→keV), summed over
+    all detectors in the file. Column 4 is the relative uncertainty in percent. Returns (total, sigma_total).
     """
-    total = 0.0
-    var_total = 0.0  # accumulate variance
-
-    with file_path.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            s = line.strip()
-            if not s or s.startswith("#"):
-                continue
-            parts = s.split()
-            if len(parts) < 3:
-                continue
-
-            # Handle both 3-col and 4-col formats gracefully
-            try:
-                a = float(parts[0])          # GeV
-                b = float(parts[1])          # GeV
-                y = float(parts[2])          # dPhi/dE per GeV
-                r = float(parts[3]) if len(parts) >= 4 else 0.0  # relative err
-            except ValueError:
-                continue
-
-            # Percent or fraction? If >1, assume percent and convert.
-            if r > 1.0:
-                r = r / 100.0
-
-            dE_keV = (b - a) * 1e6
-            total += dE_keV * y
-
-            sigma_i = abs(y) * abs(r)
-            var_total += (dE_keV * sigma_i) ** 2
-
-    return total, sqrt(var_total)
+    datasets = parse_tab_lis(file_path)
+    if not datasets:
+        return 0.0, 0.0
+    a, b, y, r = (np.concatenate(col) for col in zip(*datasets.values()))
+
+    dE_keV = (b - a) * 1e6
+    total = float(np.sum(dE_keV * y))
+    sigma = dE_keV * np.abs(y) * np.abs(r) / 100.0
+    return total, sqrt(float(np.sum(sigma ** 2)))
 
 # --------------- discovery for one isotope ---------------
 def _pairs_in_folder(folder: Path):
@@ -57,10 +46,10 @@ def _pairs_in_folder(folder: Path):
         if f22.exists():
             yield f21, f22
 
-def find_pairs_for_isotope(isotope_root: Path):
+def setting_folders(isotope_root: Path):
     """
-    Yield (label, f21, f22) where label is '<collimator>/<parent-folder>',
-    i.e. the setting is taken from the direct parent of the .lis files.
+    Yield (label, folder) for every collimator setting: '<collimator>/holes' and
+    '<collimator>/<setting>' for each folder under '<collimator>/solid/'.
     """
     for coll_dir in sorted(p for p in isotope_root.iterdir() if p.is_dir()):
         collimator = coll_dir.name
@@ -68,19 +57,83 @@ def find_pairs_for_isotope(isotope_root: Path):
         # holes/
         holes_dir = coll_dir / "holes"
         if holes_dir.is_dir():
-            for f21, f22 in _pairs_in_folder(holes_dir):
-                setting = f21.parent.name
-                yield f"{collimator}/{setting}", f21, f22
+            yield f"{collimator}/{holes_dir.name}", holes_dir
 
         # solid/<setting>/
         solid_root = coll_dir / "solid"
         if solid_root.is_dir():
             for setting_dir in sorted(p for p in solid_root.iterdir() if p.is_dir()):
-                for f21, f22 in _pairs_in_folder(setting_dir):
-                    setting = f21.parent.name
-                    yield f"{collimator}/{setting}", f21, f22
+                yield f"{collimator}/{setting_dir.name}", setting_dir
+
+def find_pairs_for_isotope(isotope_root: Path):
+    """
+    Yield (label, f21, f22) where label is '<collimator>/<parent-folder>',
+    i.e. the setting is taken from the direct parent of the .lis files.
+    """
+    for label, folder in setting_folders(isotope_root):
+        for f21, f22 in _pairs_in_folder(folder):
+            yield label, f21, f22
+
+# --------------- cached integrals ---------------
+def _file_key(path: Path):
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+def load_cache(path: Path = CACHE_PATH):
+    """{resolved path: {'key': [mtime_ns, size], 'total': ..., 'var': ...}}; empty if missing or unreadable."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache, path: Path = CACHE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(cache, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+def cached_integrals(files, cache, processes=None):
+    """
+    (total, sigma) for every file. Files whose mtime/size match the cache are not reread;
+    the others are integrated on a process pool and written back into the cache.
+    Returns ({file: (total, sigma)}, number of files recomputed).
+    """
+    keys = {fp: _file_key(fp) for fp in files}
+    stale = [fp for fp in files
+             if cache.get(str(fp.resolve()), {}).get("key") != keys[fp]]
+
+    if stale:
+        processes = min(processes or os.cpu_count() or 1, len(stale))
+        if processes == 1:
+            results = [compute_total_energy_with_uncertainty(fp) for fp in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(compute_total_energy_with_uncertainty, stale))
+        for fp, (total, sigma) in zip(stale, results):
+            cache[str(fp.resolve())] = {"key": keys[fp], "total": total, "var": sigma ** 2}
+
+    out = {}
+    for fp in files:
+        entry = cache[str(fp.resolve())]
+        out[fp] = (entry["total"], sqrt(entry["var"]))
+    return out, len(stale)
 
 # --------------- processing & printing ---------------
+def ratio_row(label, init, sig_i, trans, sig_t):
+    """(label, init, sig_init, trans, sig_trans, ratio, sig_ratio) for independent totals."""
+    if init != 0 and isfinite(init) and isfinite(trans):
+        ratio = trans / init
+        # guard against zero totals
+        rel2 = 0.0
+        if trans != 0:
+            rel2 += (sig_t / abs(trans)) ** 2
+        if init != 0:
+            rel2 += (sig_i / abs(init)) ** 2
+        sig_r = abs(ratio) * sqrt(rel2) if rel2 > 0 else 0.0
+    else:
+        ratio, sig_r = 0.0, 0.0
+    return (label, init, sig_i, trans, sig_t, ratio, sig_r)
+
 def process_isotope(isotope: str):
     """
     Return rows: (label, init, sig_init, trans, sig_trans, ratio, sig_ratio)
@@ -93,23 +146,32 @@ def process_isotope(isotope: str):
     for label, f21, f22 in find_pairs_for_isotope(root):
         init, sig_i = compute_total_energy_with_uncertainty(f21)        # 21 = initial
         trans, sig_t = compute_total_energy_with_uncertainty(f22)       # 22 = transmitted
-
-        # Ratio and its uncertainty (independent totals)
-        if init != 0 and isfinite(init) and isfinite(trans):
-            ratio = trans / init
-            # guard against zero totals
-            rel2 = 0.0
-            if trans != 0:
-                rel2 += (sig_t / abs(trans)) ** 2
-            if init != 0:
-                rel2 += (sig_i / abs(init)) ** 2
-            sig_r = abs(ratio) * sqrt(rel2) if rel2 > 0 else 0.0
-        else:
-            ratio, sig_r = 0.0, 0.0
-
-        rows.append((label, init, sig_i, trans, sig_t, ratio, sig_r))
+        rows.append(ratio_row(label, init, sig_i, trans, sig_t))
     return rows
 
+def sweep(isotopes=ISOTOPES, processes=None, cache_path: Path = CACHE_PATH):
+    """
+    All settings of all isotopes in one pass: every 21/22 file is integrated concurrently, and only
+    files that are new or changed since the last sweep are reread. Returns {isotope: rows}.
+    """
+    pairs = {}
+    for iso in isotopes:
+        root = BASE / iso
+        if not root.is_dir():
+            print(f"Isotope folder not found: {root}")
+            continue
+        pairs[iso] = list(find_pairs_for_isotope(root))
+
+    files = [fp for found in pairs.values() for _, f21, f22 in found for fp in (f21, f22)]
+    cache = load_cache(cache_path)
+    integrals, n_new = cached_integrals(files, cache, processes)
+    if n_new:
+        save_cache(cache, cache_path)
+    print(f"{len(files)} files, {n_new} (re)integrated, {len(files) - n_new} from cache")
+
+    return {iso: [ratio_row(label, *integrals[f21], *integrals[f22]) for label, f21, f22 in found]
+            for iso, found in pairs.items()}
+
 def print_energy_table(rows, isotope: str):
     console = Console()
     table = Table(title=f"\nEnergy Transmission Summary — {isotope}")
@@ -132,9 +194,24 @@ def print_energy_table(rows, isotope: str):
     console.print(table)
 
 # ---------------- main ----------------
-if __name__ == "__main__":
+def main():
+    p = argparse.ArgumentParser(description="Initial vs transmitted energy behind each collimator setting.")
+    p.add_argument("--sweep", action="store_true",
+                   help="Process all isotopes and settings concurrently, reusing cached integrals.")
+    p.add_argument("--isotopes", nargs="+", choices=ISOTOPES, default=ISOTOPES)
+    p.add_argument("--processes", type=int, default=None)
+    args = p.parse_args()
+
+    if args.sweep:
+        for iso, rows in sweep(args.isotopes, args.processes).items():
+            if rows:
+                print_energy_table(rows, iso)
+            else:
+                print(f"No matching 21/22 _tab.lis pairs found under {iso}/.")
+        return
+
     choice = input("Which isotope? (tc99m / lu177): ").strip().lower()
-    if choice not in ("tc99m", "lu177"):
+    if choice not in ISOTOPES:
         print("Invalid choice — please enter 'tc99m' or 'lu177'.")
     else:
         rows = process_isotope(choice)
@@ -142,3 +219,6 @@ if __name__ == "__main__":
             print(f"No matching 21/22 _tab.lis pairs found under {choice}/.")
         else:
             print_energy_table(rows, choice)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Surrogate model of collimator transmission against fill fraction.
+
+The measured ratios (ratio_calculation.sweep) of the solid settings of each isotope are fitted with a
+low-order polynomial in the open fraction o = 100 − fill [%] by weighted least squares (w = 1/σ²).
+The parameter covariance is scaled by the reduced χ² when that exceeds 1, so the bands also cover
+scatter beyond the Monte Carlo errors. The fit predicts unsimulated fills with confidence bands
+and proposes the next fills to simulate for a transmission target: unsimulated fills on a grid
+whose band still contains the target, nearest to the fill where the fit crosses it first.
+"""
+from pathlib import Path
+import argparse
+import csv
+import re
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from ratio_calculation import ISOTOPES, sweep
+
+OUT_DIR = Path(__file__).resolve().parent / "results"
+SETTING_RE = re.compile(r"/solid(\d{2,5})$")      # 'LEHRS/solid985' -> 98.5 %, 'solid100' -> 100 %
+DEGREE = 2              # highest polynomial order (reduced when there are few settings)
+Z = 1.96                # 95 % confidence band
+GRID_STEP = 0.1         # fill-fraction resolution of the proposals [%]
+N_PROPOSALS = 3
+
+
+def fill_fraction(label):
+    """Fill fraction [%] encoded in a solid setting label, else None (e.g. 'holes')."""
+    m = SETTING_RE.search(label)
+    if not m:
+        return None
+    digits = m.group(1)
+    whole = 3 if digits.startswith("100") else 2    # integer part: two digits, or 100
+    fill = int(digits) / 10 ** (len(digits) - whole)
+    return fill if fill <= 100.0 else None
+
+
+def settings_table(rows):
+    """(fill [%], ratio, sigma) arrays of the solid settings in the rows of one isotope, sorted by fill."""
+    pts = sorted((fill_fraction(r[0]), r[5], r[6]) for r in rows if fill_fraction(r[0]) is not None)
+    fill, ratio, sigma = (np.array(c, dtype=float) for c in zip(*pts)) if pts else (np.empty(0),) * 3
+    return fill, ratio, sigma
+
+
+# ---------------- fit ----------------
+def fit(fill, ratio, sigma, degree=DEGREE):
+    """
+    Weighted polynomial fit of ratio against open fraction. Returns a dict with the coefficients
+    (lowest order first), their covariance, χ²/dof and the fitted range.
+    """
+    fill = np.asarray(fill, dtype=float)
+    o = 100.0 - fill
+    y = np.asarray(ratio, dtype=float)
+    s = np.asarray(sigma, dtype=float)
+    s = np.where(s > 0, s, s[s > 0].min() if np.any(s > 0) else 1.0)   # zero errors: smallest known error
+    degree = min(degree, o.size - 1)
+    if degree < 0:
+        raise ValueError("No settings to fit.")
+
+    X = np.vander(o, degree + 1, increasing=True)
+    Xw, yw = X / s[:, None], y / s
+    coef, *_ = np.linalg.lstsq(Xw, yw, rcond=None)
+    cov = np.linalg.pinv(Xw.T @ Xw)
+    dof = o.size - (degree + 1)
+    chi2 = float(np.sum((Xw @ coef - yw) ** 2) / dof) if dof > 0 else np.nan
+    if dof > 0 and chi2 > 1:
+        cov *= chi2
+    return {"coef": coef, "cov": cov, "chi2_dof": chi2, "degree": degree, "range": (float(fill.min()), float(fill.max()))}
+
+
+def predict(model, fill, z=Z):
+    """(prediction, band half-width) at the given fills [%]."""
+    o = 100.0 - np.atleast_1d(np.asarray(fill, dtype=float))
+    X = np.vander(o, model["degree"] + 1, increasing=True)
+    sd = np.sqrt(np.clip(np.einsum("ij,jk,ik->i", X, model["cov"], X), 0.0, None))
+    return X @ model["coef"], z * sd
+
+
+def propose(model, target, simulated, step=GRID_STEP, n=N_PROPOSALS, z=Z):
+    """
+    Fill fractions to simulate next for a transmission target, best first: unsimulated grid fills
+    whose band contains the target, nearest to where the fit crosses it (or that crossing itself,
+    to 0.01 %, when no grid fill qualifies). The grid reaches 10 steps beyond the fitted range
+    on either side.
+    Returns (crossing fill or None, proposals).
+    """
+    lo, hi = model["range"]
+    grid = np.round(np.arange(max(lo - 10 * step, 0.0), min(hi + 10 * step, 100.0) + step / 2, step), 6)
+    pred, band = predict(model, grid, z)
+    crossing = np.flatnonzero(np.diff(np.sign(pred - target)) != 0)
+    if crossing.size:
+        i = crossing[0]
+        f_star = grid[i] + (target - pred[i]) * (grid[i + 1] - grid[i]) / (pred[i + 1] - pred[i])
+    else:
+        f_star = None
+
+    done = set(np.round(np.asarray(simulated, dtype=float), 6))
+    ref = f_star if f_star is not None else grid[np.argmin(np.abs(pred - target))]
+    candidates = [(abs(f - ref), f) for f, p, b in zip(grid, pred, band)
+                  if f not in done and abs(p - target) <= b]
+    if not candidates:
+        # Band narrower than the grid step: refine at the crossing itself
+        nearest = round(float(ref), 2)
+        candidates = [(0.0, nearest)] if nearest not in done else []
+    return f_star, [float(f) for _, f in sorted(candidates)[:n]]
+
+
+def extrapolated(model, fill):
+    """True where a fill [%] lies outside the fitted range (prediction by extrapolation)."""
+    lo, hi = model["range"]
+    f = np.asarray(fill, dtype=float)
+    return (f < lo - 1e-9) | (f > hi + 1e-9)
+
+
+# ---------------- output ----------------
+def _with_proposals(grid, proposals):
+    """Grid fills plus the proposals (which may lie beyond the fitted range), sorted."""
+    return np.union1d(np.round(grid, 6), np.round(np.asarray(proposals, dtype=float), 6))
+
+
+def print_surrogate(isotope, model, fill, ratio, sigma, grid, target=None, f_star=None, proposals=()):
+    grid = _with_proposals(grid, proposals)
+    pred, band = predict(model, grid)
+    extra = extrapolated(model, grid)
+    measured = dict(zip(np.round(fill, 6), zip(ratio, sigma)))
+    title = (f"\nTransmission surrogate — {isotope} (order {model['degree']}, "
+             f"χ²/dof {model['chi2_dof']:.2f})")
+    table = Table(title=title)
+    for col in ["Fill [%]", "Simulated", "Predicted (95% band)", "Proposed"]:
+        table.add_column(col, justify="center")
+    for f, p, b, x in zip(grid, pred, band, extra):
+        sim = measured.get(round(f, 6))
+        table.add_row(f"{f:g}",
+                      f"{sim[0]:.6f} ± {sim[1]:.6f}" if sim else "—",
+                      f"{p:.6f} ± {b:.6f}" + (" (extrapolated)" if x else ""),
+                      "yes" if round(f, 6) in proposals else "")
+    Console(width=120, markup=False).print(table)
+    if target is not None:
+        where = f"fill ≈ {f_star:.2f} %" if f_star is not None else "no crossing in the fitted range"
+        print(f"Target ratio {target:g}: {where}; simulate next: "
+              + (", ".join(f"{f:g} %" + (" (extrapolated)" if extrapolated(model, f) else "")
+                           for f in proposals) or "—"))
+
+
+def write_predictions(out_path: Path, model, grid, fill, proposals=()):
+    grid = _with_proposals(grid, proposals)
+    pred, band = predict(model, grid)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    simulated = set(np.round(fill, 6))
+    proposed = set(np.round(np.asarray(proposals, dtype=float), 6))
+    with out_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["fill_percent", "predicted_ratio", "band_95", "simulated", "proposed", "extrapolated"])
+        for g, p, b, x in zip(grid, pred, band, extrapolated(model, grid)):
+            w.writerow([f"{g:g}", p, b, round(g, 6) in simulated, round(g, 6) in proposed, bool(x)])
+    return out_path
+
+
+def main():
+    p = argparse.ArgumentParser(description="Fit transmission ratio against fill fraction and propose next settings.")
+    p.add_argument("--isotopes", nargs="+", choices=ISOTOPES, default=ISOTOPES)
+    p.add_argument("--target", type=float, default=None, help="Transmission ratio to meet.")
+    p.add_argument("--degree", type=int, default=DEGREE)
+    p.add_argument("--processes", type=int, default=None)
+    args = p.parse_args()
+
+    for iso, rows in sweep(args.isotopes, args.processes).items():
+        fill, ratio, sigma = settings_table(rows)
+        if fill.size < 2:
+            print(f"Fewer than two solid settings for {iso}; nothing to fit.")
+            continue
+        model = fit(fill, ratio, sigma, args.degree)
+        grid = np.round(np.arange(fill.min(), fill.max() + GRID_STEP / 2, GRID_STEP), 6)
+        f_star, proposals = (propose(model, args.target, fill) if args.target is not None else (None, []))
+        print_surrogate(iso, model, fill, ratio, sigma, grid, args.target, f_star, proposals)
+        print(f"Saved: {write_predictions(OUT_DIR / f'{iso}_surrogate.csv', model, grid, fill, proposals)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
+import json
 import math
-import inspect
 from pathlib import Path
 from datetime import datetime, time, timedelta
 
+import numpy as np
+
 # --- physical half-lives (seconds) ---
 HALF_LIFE_S = {
     "tc-99m": 6.006 * 3600,           # ~6.006 h
     "lu-177": 6.644 * 24 * 3600,      # ~6.644 d
 }
 
+# --- activity scenarios (A0, isotope and time window per use case) ---
+DEFAULTS_FILE = Path(__file__).resolve().parent / "activity_defaults.json"
+
 
 def _parse_hms(hms):
     parts = [int(p) for p in hms.split(":")]
@@ -34,69 +39,83 @@ def duration_seconds(start_hms, end_hms, *, next_day=False, strict_positive=Fals
     return dt
 
 
+def clock_seconds(hms):
+    """Seconds after midnight for one 'HH:MM[:SS]' string or an array of them."""
+    arr = np.asarray(hms, dtype=str)
+    secs = [(t.hour * 3600 + t.minute * 60 + t.second) for t in map(_parse_hms, arr.ravel())]
+    return np.asarray(secs, dtype=float).reshape(arr.shape)
+
+
+def decay_constants(isotope):
+    """Physical decay constants [1/s] for one isotope name or an array of names."""
+    iso = np.asarray(isotope, dtype=str)
+    key = np.char.lower(iso)                     # HALF_LIFE_S keys are lower case ('Tc-99m' -> 'tc-99m')
+    lam = np.full(iso.shape, np.nan)
+    for name, half_life in HALF_LIFE_S.items():  # one vectorized comparison per known isotope
+        lam[key == name] = math.log(2.0) / half_life
+    if np.isnan(lam).any():
+        unknown = sorted(set(iso[np.isnan(lam)].tolist()))
+        raise KeyError(f"No half-life for {unknown}. Add it to activity.HALF_LIFE_S.")
+    return lam
+
+
+def cumulated_activity(isotope, A0_MBq, t_inj_s, t_start_s, t_end_s):
+    """
+    Vectorized cumulated activity in Bq·s over [t_start_s, t_end_s] for sources of activity
+    A0_MBq at injection time t_inj_s (all times in seconds on a common clock). The part of a
+    window before injection contributes nothing. Arguments broadcast against each other, so
+    whole schedules are evaluated at once.
+    """
+    lam = decay_constants(isotope)
+    A0_Bq = np.asarray(A0_MBq, dtype=float) * 1e6
+    t_inj = np.asarray(t_inj_s, dtype=float)
+    t_start = np.asarray(t_start_s, dtype=float)
+    t_end = np.asarray(t_end_s, dtype=float)
+
+    if np.any(t_end < t_start):
+        raise ValueError("Window end must not precede window start.")
+    t_start = np.maximum(t_start, t_inj)  # no source before injection
+    t_end = np.maximum(t_end, t_inj)
+
+    return A0_Bq / lam * (np.exp(-lam * (t_start - t_inj)) - np.exp(-lam * (t_end - t_inj)))
+
+
 def cumulated_activity_Bq_s(A0_MBq, isotope, duration_s):
     """Cumulated activity in Bq·s (A0 decays physically over duration_s)."""
-    A0_Bq = A0_MBq * 1e6
-    T_p = HALF_LIFE_S[isotope]
-    ln2 = math.log(2.0)
-
-    A_cum = A0_Bq * T_p / ln2 * (1.0 - math.exp(-ln2 * duration_s / T_p))
+    A_cum = float(cumulated_activity(isotope, A0_MBq, 0.0, 0.0, duration_s))
     print(f"Cumulated A: {A_cum:.2f} Bq·s")
 
     return A_cum
 
 
-DEFAULTS = {
-    # methods.py (Day 1 → Day 2)
-    ("methods", "main_study"): dict(isotope="tc-99m", A0_MBq=2942.4237, start="14:27", end="07:29"),
-    ("methods", "pre_study"):  dict(isotope="tc-99m", A0_MBq=1134.2590, start="13:18", end="08:21"),
+def load_defaults(path=DEFAULTS_FILE):
+    """
+    Load activity scenarios from a JSON file of the form
+    {scope: {name: {isotope, A0_MBq, start, end, next_day}}}.
+    Returns {(scope, name): cfg}.
+    """
+    with Path(path).open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {(scope, name): cfg for scope, entries in raw.items() for name, cfg in entries.items()}
+
+
+DEFAULTS = load_defaults()
 
-    # annual_doses.py (same-day)
-    ("annual_doses", "tc-99m"): dict(isotope="tc-99m", A0_MBq=500.0, start="08:00", end="08:30"), # 0.5 h scan
-    ("annual_doses", "lu-177"): dict(isotope="lu-177", A0_MBq=1100.0, start="08:00", end="19:00"), # numbers are placeholders
-}
 
-def cumulated_activity_auto():
+def cumulated_activity_for(scope, name, defaults=None):
     """
-    One-line, zero-argument entry point.
-    Detects caller script and reads its variables to choose the right defaults.
-
-    Conventions:
-      - If called from methods.py:
-          * Looks for 'study_folder' in the caller's locals/globals ('main_study' or 'pre_study').
-          * Uses Day-1→Day-2 window.
-      - If called from annual_doses.py:
-          * Looks for 'source' in the caller ('tc-99m' or 'lu-177').
-          * Uses SAME-DAY window (end > start).
-    All A0/times/isotope are taken from DEFAULTS above.
+    Cumulated activity in Bq·s for a named scenario, e.g. ("methods", "main_study")
+    or ("annual_doses", "lu-177").
+    Scenarios with next_day=True run Day 1 → Day 2; the others are same-day windows (end > start).
     """
-    # identify caller frame + script name (stem)
-    frame = inspect.currentframe()
-    assert frame is not None
-    caller = inspect.getouterframes(frame, 2)[1].frame
-    fname = caller.f_code.co_filename
-    stem = Path(fname).stem.lower()
-
-    # search variables in caller (locals first, then globals)
-    def _lookup(name):
-        if name in caller.f_locals:  return caller.f_locals[name]
-        if name in caller.f_globals: return caller.f_globals[name]
-        return None
-
-    if "methods" in stem:
-        study_name = _lookup("study_folder") or "main_study"  # fallback if not set yet
-        key = ("methods", str(study_name))
-        cfg = DEFAULTS.get(key)
-        if not cfg:
-            raise KeyError(f"No defaults for {key}. Add it to activity.DEFAULTS.")
-        dur_s = duration_seconds(cfg["start"], cfg["end"], next_day=True)  # Day 1 → Day 2
-        return cumulated_activity_Bq_s(cfg["A0_MBq"], cfg["isotope"], dur_s)
-
-    if "annual_doses" in stem:
-        source = (_lookup("source") or "tc-99m").lower()
-        key = ("annual_doses", source)
-        cfg = DEFAULTS.get(key)
-        if not cfg:
-            raise KeyError(f"No defaults for {key}. Add it to activity.DEFAULTS.")
-        dur_s = duration_seconds(cfg["start"], cfg["end"], strict_positive=True)  # same day, end > start
-        return cumulated_activity_Bq_s(cfg["A0_MBq"], cfg["isotope"], dur_s)
\ No newline at end of file
+    defaults = DEFAULTS if defaults is None else defaults
+    key = (scope, str(name))
+    cfg = defaults.get(key)
+    if not cfg:
+        raise KeyError(f"No defaults for {key}. Add it to {DEFAULTS_FILE.name}.")
+
+    if cfg.get("next_day", False):
+        dur_s = duration_seconds(cfg["start"], cfg["end"], next_day=True)
+    else:
+        dur_s = duration_seconds(cfg["start"], cfg["end"], strict_positive=True)
+    return cumulated_activity_Bq_s(cfg["A0_MBq"], cfg["isotope"], dur_s)
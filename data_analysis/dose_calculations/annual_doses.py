@@ -4,7 +4,7 @@ import numpy as np
 from rich.console import Console
 from rich.table import Table
 
-from activity import cumulated_activity_auto          # zero-arg; uses caller globals
+from activity import cumulated_activity_for           # (scope, name) -> A_cum [Bq·s]
 from methods.simulation import process_simulation     # (folder: Path, A_cum: float) -> (dose, unc)
 
 # --- config -------------------------------------------------------------------
@@ -28,9 +28,6 @@ def main():
     if src not in ("tc-99m", "lu-177"):
         raise ValueError("Source must be 'tc-99m' or 'lu-177'.")
 
-    # expose 'source' so cumulated_activity_auto() picks the correct isotope & same-day window
-    globals()["source"] = src
-
     BASE_PATH = BASE_PATHS[src]
     MAIN_STUDY_FOLDER = BASE_PATH / "main_study"
 
@@ -38,7 +35,7 @@ def main():
         raise FileNotFoundError(f"Missing folder: {MAIN_STUDY_FOLDER}")
 
     # --- activity --------------------------------------------------------------
-    A_cum = cumulated_activity_auto()  # uses same-day duration in dose-limits mode
+    A_cum = cumulated_activity_for("annual_doses", src)  # same-day window
 
     # --- simulation doses (µSv) & uncertainties (µSv) --------------------------
     sim_dose, sim_unc = process_simulation(MAIN_STUDY_FOLDER, A_cum)
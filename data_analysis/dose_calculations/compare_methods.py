@@ -1,3 +1,4 @@
+import argparse
 from pathlib import Path
 import numpy as np
 from scipy import stats
@@ -6,11 +7,14 @@ import matplotlib.ticker as tck
 from rich.console import Console
 from rich.table import Table
 
-from activity import cumulated_activity_auto
+from activity import cumulated_activity_for
 
 from methods.analytical import process_analytical          # expected to return (ana_dose, ana_unc) as arrays
 from methods.experimental import process_experimental      # expected to return (exp_dose, exp_unc) as arrays
 from methods.simulation import process_simulation          # expected to return (sim_dose, sim_unc) as arrays
+from methods import attenuation
+import mc_uncertainty
+import resampling
 
 plt.rcParams.update({'font.family': 'Trebuchet MS'})
 
@@ -207,7 +211,20 @@ def plot_grouped_bars(tld_labels, ana, ana_u, exp, exp_u, sim, sim_u, out_dir: P
     print(f"Saved plot: {out_file}")
 
 
+def parse_args():
+    p = argparse.ArgumentParser(description="Compare analytical, experimental and simulated TLD doses.")
+    p.add_argument("--mc-samples", type=int, default=0,
+                   help="Also propagate uncertainties by Monte Carlo with this many samples (0 = off).")
+    p.add_argument("--spectral", action="store_true",
+                   help="Attenuate the extracted photon spectrum in the analytical method (energy-dependent μ).")
+    p.add_argument("--resamples", type=int, default=100_000,
+                   help="Resamples for the permutation and bootstrap tests (exact enumeration for few TLDs).")
+    p.add_argument("--seed", type=int, default=None, help="Seed for the Monte Carlo and resampling tests.")
+    return p.parse_args()
+
+
 def main():
+    args = parse_args()
     BASE_PATH = Path("/Users/weli/Documents/pyCharm/MPH5008/tc99m")
 
     while True:
@@ -225,12 +242,13 @@ def main():
     has_analytical = (study_folder == "main_study")
 
     # Calculate cumulated activity first
-    A_cum = cumulated_activity_auto()
+    A_cum = cumulated_activity_for("methods", study_folder)
 
     # --- Get data from each pipeline ---
     # Analytical: returns doses and uncertainties (arrays)
     if has_analytical:
-        ana_dose, ana_unc = process_analytical(A_cum)
+        spectrum = attenuation.load_spectrum("tc99m", study_folder) if args.spectral else None
+        ana_dose, ana_unc = process_analytical(A_cum, spectrum)
         ana_dose = np.asarray(ana_dose, dtype=float)
         ana_unc = np.asarray(ana_unc, dtype=float)
     else:
@@ -292,12 +310,31 @@ def main():
     p_se, file_se = paired_t_test(sim_dose, exp_dose, "Simulation", "Experimental", out_dir=run_dir)
     print(f"\nPaired t-test (Sim vs Exp): p = {p_se:.4g}")
 
+    rp_se, rfile_se = resampling.resampling_report(sim_dose, exp_dose, "Simulation", "Experimental", out_dir=run_dir,
+                                                   n_resamples=args.resamples, seed=args.seed)
+    print(f"Sign-flip test (Sim vs Exp): p = {rp_se:.4g}")
+    files = [file_se, rfile_se]
+
     if has_analytical:
         p_ae, file_ae = paired_t_test(ana_dose, exp_dose, "Analytical", "Experimental", out_dir=run_dir)
         print(f"Paired t-test (Ana vs Exp): p = {p_ae:.4g}")
-        print(f"\nSaved reports:\n - {file_se}\n - {file_ae}")
-    else:
-        print(f"\nSaved reports:\n - {file_se}")
+        rp_ae, rfile_ae = resampling.resampling_report(ana_dose, exp_dose, "Analytical", "Experimental", out_dir=run_dir,
+                                                       n_resamples=args.resamples, seed=args.seed)
+        print(f"Sign-flip test (Ana vs Exp): p = {rp_ae:.4g}")
+        files += [file_ae, rfile_ae]
+
+    print("\nSaved reports:\n" + "\n".join(f" - {f}" for f in files))
+
+    # --- Monte Carlo uncertainty propagation (optional) ---
+    if args.mc_samples > 0:
+        ratio_unc = {"Sim/Exp": r_sim_exp_unc}
+        if has_analytical:
+            ratio_unc["Ana/Exp"] = r_ana_exp_unc
+        mc = mc_uncertainty.propagate(ana_dose, exp_dose, exp_unc, sim_dose, sim_unc, ratio_unc,
+                                      n_samples=args.mc_samples, seed=args.seed)
+        mc_uncertainty.print_mc_table(tld_labels, mc)
+        file_mc = mc_uncertainty.write_mc_report(tld_labels, mc, args.mc_samples, out_dir=run_dir)
+        print(f"Saved Monte Carlo report: {file_mc}")
 
     # --- Plot ---
     plot_grouped_bars(
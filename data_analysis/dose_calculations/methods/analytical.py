@@ -1,6 +1,8 @@
 import numpy as np
 import math
 
+from methods import attenuation
+
 def linear_att_coeff(mu_rho, rho):
     return mu_rho * rho
 
@@ -31,16 +33,35 @@ x_Pb_glass = 2.0 / 1000 # mm → m
 x_Pb_wallB = 2.0 / 1000 # mm → m
 x_Pb_wallC = 4.0 / 1000 # mm → m
 
+# Barriers in front of the TLDs (1-based TLD index → (material, thickness))
+barriers = {
+    2: ("glass", x_Pb_glass),
+    4: ("lead", x_Pb_wallB),
+    6: ("lead", x_Pb_wallC),
+}
+
 # Equivalent dose gamma constant [mSv/h MBq]
 gamma = 2.24E-5
 
-def process_analytical(A_cum):
+# Relative uncertainty of the administered activity (dose calibrator)
+calibrator_rel_unc = 0.02
+
+def process_analytical(A_cum, spectrum=None):
     """
     Returns (doses, uncertainties) for all TLDs.
+    With spectrum=(E [keV], dΦ/dE) the barriers attenuate the spectrum-weighted H*(10)
+    (methods/attenuation.py) instead of using one μ per material.
     """
 
     A_cum_MBqh = A_cum / 3.6e9  # MBq·h
 
+    if spectrum is not None:
+        materials = [barriers.get(idx, (None, 0.0))[0] for idx in range(1, len(distances) + 1)]
+        thicknesses = [barriers.get(idx, (None, 0.0))[1] for idx in range(1, len(distances) + 1)]
+        T = attenuation.transmission(spectrum, materials, thicknesses)
+        doses = gamma * A_cum_MBqh * T / np.asarray(distances) ** 2 * 1000  # mSv → µSv
+        return doses, doses * calibrator_rel_unc
+
     doses = []
     for idx, d in enumerate(distances, start=1):
         corrected_A_cum = A_cum_MBqh
@@ -55,5 +76,5 @@ def process_analytical(A_cum):
         doses.append(H)
 
     doses = np.array(doses)
-    unc = doses * 0.02  # 2% uncertainty from dose calibrator
-    return doses, unc
\ No newline at end of file
+    unc = doses * calibrator_rel_unc  # 2% uncertainty from dose calibrator
+    return doses, unc
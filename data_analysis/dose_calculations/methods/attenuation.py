@@ -0,0 +1,113 @@
+import csv
+from pathlib import Path
+
+import numpy as np
+
+# Photon spectra extracted by energy_spectra/data_extraction.py (E [keV], value [cm^-2 keV^-1 per primary], rel_err)
+SPECTRA_ROOT = Path(__file__).resolve().parents[2] / "energy_spectra" / "datasets"
+SPECTRUM_FILES = {
+    "main_study": "run_27_tab__airRfluP.csv",   # photon fluence averaged over the room air
+    "pre_study":  "run_25_tab__TLD1fluP.csv",
+}
+
+# Mass attenuation coefficients μ/ρ [cm²/g] with coherent scattering (NIST XCOM), E in keV.
+# Absorption edges appear as two rows at the same energy (below, above).
+MU_RHO_ENERGY_KEV = {
+    "Pb": [10.0, 13.035, 13.035, 15.0, 15.2, 15.2, 15.861, 15.861, 20.0, 30.0, 40.0, 50.0, 60.0, 80.0,
+           88.005, 88.005, 100.0, 150.0, 200.0, 300.0, 400.0, 500.0, 600.0, 800.0, 1000.0],
+    "O":  [10.0, 15.0, 20.0, 30.0, 40.0, 50.0, 60.0, 80.0, 100.0, 150.0, 200.0, 300.0, 400.0, 500.0, 600.0,
+           800.0, 1000.0],
+    "Si": [10.0, 15.0, 20.0, 30.0, 40.0, 50.0, 60.0, 80.0, 100.0, 150.0, 200.0, 300.0, 400.0, 500.0, 600.0,
+           800.0, 1000.0],
+}
+MU_RHO = {
+    "Pb": [130.6, 67.01, 162.1, 111.6, 107.4, 148.5, 134.4, 154.8, 86.36, 30.32, 14.36, 8.041, 5.021, 2.419,
+           1.910, 7.683, 5.549, 2.014, 0.9985, 0.4031, 0.2323, 0.1614, 0.1248, 0.08870, 0.07102],
+    "O":  [5.952, 1.836, 0.8651, 0.3779, 0.2585, 0.2132, 0.1907, 0.1678, 0.1551, 0.1361, 0.1237, 0.1070,
+           0.09566, 0.08729, 0.08070, 0.07087, 0.06372],
+    "Si": [33.89, 10.34, 4.464, 1.436, 0.7012, 0.4385, 0.3207, 0.2228, 0.1835, 0.1448, 0.1275, 0.1082,
+           0.09614, 0.08748, 0.08077, 0.07082, 0.06361],
+}
+
+# Barrier materials: density [g/cm³] and mass fractions (LEAD-GLA compound of the FLUKA input;
+# its Ti and As, 1.1% by mass, are lumped with Si)
+MATERIALS = {
+    "lead":  {"density": 11.35, "fractions": {"Pb": 1.0}},
+    "glass": {"density": 6.22,  "fractions": {"Pb": 0.751938, "O": 0.156453, "Si": 0.089609}},
+}
+
+# Fluence-to-H*(10) conversion coefficients for photons [pSv·cm²] (ICRP 74), E in keV
+H10_ENERGY_KEV = [10.0, 15.0, 20.0, 30.0, 40.0, 50.0, 60.0, 80.0, 100.0, 150.0, 200.0, 300.0, 400.0, 500.0,
+                  600.0, 800.0, 1000.0]
+H10_PER_FLUENCE = [0.061, 0.83, 1.05, 0.81, 0.64, 0.55, 0.51, 0.53, 0.61, 0.89, 1.20, 1.80, 2.38, 2.93,
+                   3.44, 4.38, 5.20]
+
+# Fluence-to-air-kerma conversion coefficients for photons [pGy·cm²] (ICRP 74), same energies
+KERMA_PER_FLUENCE = [7.43, 3.12, 1.68, 0.721, 0.429, 0.323, 0.289, 0.307, 0.371, 0.599, 0.856, 1.38, 1.89,
+                     2.38, 2.84, 3.69, 4.47]
+
+# Berger buildup B = 1 + a·μx·exp(b·μx) for Pb at ~140 keV (also used for Pb glass, which is 75% Pb by mass)
+BUILDUP_A = 0.295
+BUILDUP_B = -0.2076
+
+
+def interp_loglog(E, E_tab, y_tab):
+    """Log–log interpolation of a table at energies E (any shape), linear extrapolation in log–log space."""
+    lx, ly = np.log(np.asarray(E_tab, dtype=float)), np.log(np.asarray(y_tab, dtype=float))
+    E = np.asarray(E, dtype=float)
+    lE = np.log(np.atleast_1d(E))
+    out = np.interp(lE, lx, ly)
+    out = np.where(lE < lx[0], ly[0] + (lE - lx[0]) * (ly[1] - ly[0]) / (lx[1] - lx[0]), out)
+    out = np.where(lE > lx[-1], ly[-1] + (lE - lx[-1]) * (ly[-1] - ly[-2]) / (lx[-1] - lx[-2]), out)
+    return np.exp(out).reshape(E.shape)
+
+
+def material_att_coeff(material, E_keV):
+    """Linear attenuation coefficient μ(E) [m^-1] of a barrier material (mixture rule over elements)."""
+    mat = MATERIALS[material]
+    mu_rho = sum(w * interp_loglog(E_keV, MU_RHO_ENERGY_KEV[el], MU_RHO[el])
+                 for el, w in mat["fractions"].items())
+    return mu_rho * mat["density"] * 100  # cm^-1 → m^-1
+
+
+def buildup(mfp, a=BUILDUP_A, b=BUILDUP_B):
+    """Berger buildup factor."""
+    return 1.0 + a * mfp * np.exp(b * mfp)
+
+
+def h10_per_fluence(E_keV):
+    """Fluence-to-H*(10) coefficient h(E) [pSv·cm²]."""
+    return interp_loglog(E_keV, H10_ENERGY_KEV, H10_PER_FLUENCE)
+
+
+def kerma_per_fluence(E_keV):
+    """Fluence-to-air-kerma coefficient k(E) [pGy·cm²]."""
+    return interp_loglog(E_keV, H10_ENERGY_KEV, KERMA_PER_FLUENCE)
+
+
+def load_spectrum(isotope="tc99m", study="main_study", file_name=None):
+    """Photon fluence spectrum (E [keV], dΦ/dE) from the extracted datasets; empty bins are dropped."""
+    fp = SPECTRA_ROOT / isotope / study / (file_name or SPECTRUM_FILES[study])
+    with fp.open("r", encoding="utf-8", newline="") as f:
+        rows = [(float(r["E"]), float(r["value"])) for r in csv.DictReader(f)]
+    E, phi = np.array(rows).T
+    keep = (E > 0) & (phi > 0)
+    return E[keep], phi[keep]
+
+
+def transmission(spectrum, materials, thicknesses):
+    """
+    Spectrum-weighted H*(10) transmission of barriers, one per TLD:
+        T_i = Σ_E Φ(E) h(E) exp(-μ_i(E) x_i) / Σ_E Φ(E) h(E)
+    evaluated for all TLDs and energy bins in one (TLD × E) array.
+    materials: material name per TLD (None for no barrier); thicknesses [m] per TLD.
+    """
+    E, phi = (np.asarray(a, dtype=float) for a in spectrum)
+    weight = phi * h10_per_fluence(E)          # H*(10) per energy bin without barrier
+
+    names = [m for m in dict.fromkeys(materials) if m is not None]
+    mu = {m: material_att_coeff(m, E) for m in names}
+    mu_tld = np.array([mu[m] if m is not None else np.zeros_like(E) for m in materials])  # (TLD, E)
+    x = np.asarray(thicknesses, dtype=float)[:, None]
+
+    return np.exp(-mu_tld * x) @ weight / weight.sum()
@@ -1,17 +1,20 @@
-import os
-import re
+import sys
 import numpy as np
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[3]))  # repo root (fluka_store)
+import fluka_store
+from fluka_parsers import find_bnn_lis
 
-def read_lis(file_path):
-    """Extracts numerical values from .lis file (dose and uncertainty)."""
-    with open(file_path, 'r') as file:
-        content = file.read()
-    matches = re.findall(r'[+-]?\d+\.\d{4}E[+-]?\d{2}', content)
-    half_length = len(matches) // 2
-    return ([float(match) for match in matches[:half_length]],
-            [float(match) for match in matches[half_length:]])
+# USRBIN region binning scoring H*(10) in the TLD regions (both studies)
+TLD_DETECTOR = "tldDosH"
+
+
+def read_lis(file_path, detector=TLD_DETECTOR):
+    """Extracts dose and uncertainty of one detector from a .bnn.lis file, via the .npz store if fresh."""
+    cols = fluka_store.load_or_parse(file_path, "bnn.lis", "region_dose", ["detector", "value", "rel_err"])
+    sel = cols["detector"] == detector
+    return cols["value"][sel].tolist(), cols["rel_err"][sel].tolist()
 
 
 def process_simulation(folder, A_cum):
@@ -21,14 +24,8 @@ def process_simulation(folder, A_cum):
         sim_dose (np.ndarray), sim_unc (np.ndarray)
     """
 
-    path = Path(folder)
-    study_name = path.name
-
-    # Choose file based on folder
-    if study_name == 'main_study':
-        lis_file = os.path.join(folder, "run/run_25.bnn.lis")
-    else:
-        lis_file = os.path.join(folder, "run/run_23.bnn.lis")
+    # Choose the file that holds the TLD detector (run_25 in main_study, run_23 in pre_study)
+    lis_file = find_bnn_lis(Path(folder) / "run", TLD_DETECTOR)
 
     dose, unc = read_lis(lis_file)
 
@@ -0,0 +1,88 @@
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Reader exports (one CSV per readout campaign, three rows per chip: counts, temperature, setpoint)
+READOUT_DIR = Path(__file__).resolve().parents[1] / "TLD_readouts"
+CAMPAIGNS = {
+    "main_study": READOUT_DIR / "readout_main.csv",
+    "pre_study":  READOUT_DIR / "readout_pre.csv",
+}
+DOSE_COLUMN = "MeasuredDose [µSv]:"
+ELEMENT_RE = re.compile(r"^([A-Za-z]+)(\d+)$")  # 'a4' -> position 'a', chip 4
+
+
+def discover(readout_dir=READOUT_DIR):
+    """Registered campaigns plus any other readout_<name>.csv in readout_dir (campaign '<name>')."""
+    campaigns = dict(CAMPAIGNS)
+    known = {p.resolve() for p in campaigns.values()}
+    for fp in sorted(Path(readout_dir).glob("readout_*.csv")):
+        if fp.resolve() not in known:
+            campaigns[fp.stem[len("readout_"):]] = fp
+    return campaigns
+
+
+def read_readout(file_path):
+    """
+    One reader export -> DataFrame with one row per chip: position, chip, timestamp, dose_uSv.
+    Only the metadata columns are parsed (the glow-curve columns are skipped).
+    """
+    data = pd.read_csv(file_path, encoding="latin1", usecols=["Timestamp", "Element", DOSE_COLUMN])
+    data = data.iloc[1::3]                         # one row per chip (all three carry the same dose)
+    data = data[data[DOSE_COLUMN].notna()]
+
+    parts = data["Element"].astype(str).str.extract(ELEMENT_RE)
+    return pd.DataFrame({
+        "position":  parts[0].str.lower().to_numpy(),
+        "chip":      parts[1].astype(int).to_numpy(),
+        "timestamp": pd.to_datetime(data["Timestamp"], format="%d.%m.%Y %H:%M:%S").to_numpy(),
+        "dose_uSv":  data[DOSE_COLUMN].astype(float).to_numpy(),
+    })
+
+
+def load_campaigns(names=None, campaigns=None):
+    """
+    Load readout campaigns (default: all discovered) into one table indexed by (campaign, position, chip).
+    Positions keep their order of appearance within each campaign.
+    """
+    campaigns = campaigns or discover()
+    names = list(campaigns) if names is None else list(names)
+    unknown = [n for n in names if n not in campaigns]
+    if unknown:
+        raise KeyError(f"Unknown readout campaign(s) {unknown}. Add them to tld_readouts.CAMPAIGNS.")
+
+    frames = [read_readout(campaigns[n]).assign(campaign=n) for n in names]
+    table = pd.concat(frames, ignore_index=True)
+    return table.set_index(["campaign", "position", "chip"])
+
+
+def triplet_stats(table):
+    """
+    Mean, sample standard deviation and number of chips per (campaign, position), computed with
+    grouped NumPy sums over the whole table. Returns a DataFrame indexed like the groups.
+    """
+    keys = table.index.droplevel("chip")
+    groups, first, inverse = np.unique(keys.to_numpy(), return_index=True, return_inverse=True)
+    order = np.argsort(first)                      # groups in order of appearance
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    inverse = rank[inverse.ravel()]
+
+    dose = table["dose_uSv"].to_numpy(dtype=float)
+    n = np.bincount(inverse)
+    mean = np.bincount(inverse, weights=dose) / n
+    ss = np.bincount(inverse, weights=(dose - mean[inverse]) ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(ss / (n - 1))
+
+    index = pd.MultiIndex.from_tuples(groups[order].tolist(), names=["campaign", "position"])
+    return pd.DataFrame({"mean_uSv": mean, "std_uSv": std, "n": n}, index=index)
+
+
+def campaign_triplets(campaign, table=None):
+    """(mean, std) arrays per position of one campaign, in readout order."""
+    table = load_campaigns([campaign]) if table is None else table
+    stats = triplet_stats(table).loc[campaign]
+    return stats["mean_uSv"].to_numpy(), stats["std_uSv"].to_numpy()
@@ -0,0 +1,347 @@
+# point_kernel_map.py — analytical point-kernel H*(10) over a USRBIN mesh (voxel-by-voxel check of FLUKA)
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "plot_2Dmaps"))  # usrbin_decode
+from usrbin_decode import decode_usrbin
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root (fluka_input)
+import fluka_input
+from methods import analytical, attenuation
+
+# ---- CONFIGURATION ----
+REPO_ROOT    = Path(__file__).resolve().parents[2]
+BASE_PATH    = Path("/Users/weli/Documents/pyCharm/MPH5008/tc99m")
+RESULTS_BASE = Path(__file__).resolve().parent / "results"
+
+# Linear attenuation coefficients [cm^-1] of the barrier materials (same values as methods/analytical.py)
+MU_CM = {
+    "LEAD":     analytical.mu_Pb / 100,
+    "LEAD-GLA": analytical.mu_Pb_glass / 100,
+}
+
+# H*(10) rate constant converted to µSv·m² per Bq·s
+GAMMA_USV_M2_PER_BQS = analytical.gamma * 1000 / 3.6e9
+
+TILE = 16                 # bins per tile edge (tiles are the unit of work and of zone culling)
+MAX_REL_ERR = 0.10        # FLUKA voxels with larger relative errors are left out of the summary
+PERCENTILES = (5, 50, 95)
+
+
+# ---------------- FLUKA geometry (plane bodies only) ----------------
+def _halfspaces(kind, vals):
+    """Interior of a body as a list of (normal, offset) half-spaces n·x < c, or None if not convex-planar."""
+    if kind == "YZP":
+        return [((1.0, 0.0, 0.0), vals[0])]
+    if kind == "XZP":
+        return [((0.0, 1.0, 0.0), vals[0])]
+    if kind == "XYP":
+        return [((0.0, 0.0, 1.0), vals[0])]
+    if kind == "PLA":
+        n, p = np.asarray(vals[:3]), np.asarray(vals[3:6])
+        return [(tuple(n), float(n @ p))]
+    if kind == "RPP":
+        x0, x1, y0, y1, z0, z1 = vals[:6]
+        return [((-1.0, 0.0, 0.0), -x0), ((1.0, 0.0, 0.0), x1),
+                ((0.0, -1.0, 0.0), -y0), ((0.0, 1.0, 0.0), y1),
+                ((0.0, 0.0, -1.0), -z0), ((0.0, 0.0, 1.0), z1)]
+    return None
+
+
+def read_geometry(inp_file):
+    """
+    Parse the free-format geometry of a FLUKA input; only the lines of the active preprocessor
+    branches are read (fluka_input.is_active with the input's #define names).
+    Returns (bodies, regions, materials):
+      bodies    {name: (kind, values, transform)} with transform the $start_transform name or None
+      regions   {name: [zone, ...]} with zone = [(sign, body), ...], in definition order
+      materials {region: material} from the ASSIGNMA cards (region ranges expanded)
+    """
+    model = fluka_input.parse(inp_file)
+    defines = set(model["defines"])
+    bodies, regions = {}, {}
+    assign = [[str(w) for w in c["whats"][:3] if w is not None] for c in fluka_input.active_cards(model, "ASSIGNMA")]
+    section, transformed, current, last_region = "bodies", None, None, None
+
+    for e in model["entries"]:
+        if e["kind"] != "geometry" or not fluka_input.is_active(e, defines):
+            continue
+        line = e["raw"].rstrip("\r\n")
+        if not line.strip() or line[0] in "*!":
+            continue
+        tok = line.split()
+        if section == "bodies":
+            if tok[0] == "END":
+                section = "regions"
+            elif tok[0].startswith("$start_transform"):
+                transformed = tok[1] if len(tok) > 1 else tok[0]
+            elif tok[0].startswith("$end_transform"):
+                transformed = None
+            elif len(tok[0]) == 3 and tok[0].isupper() and len(tok) > 1:
+                current = [tok[0], tok[1], [float(v) for v in tok[2:]], transformed]
+                bodies[current[1]] = current
+            elif current is not None:  # continuation of the previous body's values
+                current[2].extend(float(v) for v in tok)
+            continue
+        if section == "regions":
+            if tok[0] == "END":
+                break
+            if not line[0].isspace():
+                last_region = tok[0]
+                expr = " ".join(tok[2:])
+                regions[last_region] = []
+            else:
+                expr = line.strip()
+            for part in expr.split("|"):
+                zone = [(t[0], t[1:]) for t in part.split()]
+                if zone:
+                    regions[last_region].append(zone)
+
+    names = list(regions)
+    materials = {}
+    for fields in assign:
+        if len(fields) < 2 or fields[1] not in regions:
+            continue
+        first = names.index(fields[1])
+        last = names.index(fields[2]) if len(fields) > 2 and fields[2] in regions else first
+        for reg in names[first:last + 1]:
+            materials[reg] = fields[0]
+
+    bodies = {name: (kind, vals, tr) for kind, name, vals, tr in bodies.values()}
+    return bodies, regions, materials
+
+
+def read_source(inp_file):
+    """Point-source position [cm] from the first active BEAMPOS card without SDUM."""
+    for c in fluka_input.active_cards(fluka_input.parse(inp_file), "BEAMPOS"):
+        if not c["sdum"]:
+            return np.array([0.0 if w is None else float(w) for w in c["whats"][:3]])
+    raise ValueError(f"No BEAMPOS card in {inp_file}")
+
+
+def barrier_zones(bodies, regions, materials, mu_cm=MU_CM):
+    """
+    Convex zones of all regions made of an attenuating material (keys of mu_cm).
+    Returns a dict of arrays:
+      normals (C, 3), offsets (C,)  half-spaces n·x < c of all zones, zone by zone
+      starts (Z,)                   index of each zone's first half-space
+      mu (Z,)                       linear attenuation coefficient [cm^-1] per zone
+      bbox (Z, 6)                   axis-aligned bounds (±inf where a zone is only bounded by tilted planes)
+    Zones using curved bodies, '-' boxes or transformed bodies are skipped and reported per region,
+    with the bodies that ruled them out (their shielding is missing from the map).
+    """
+    normals, offsets, starts, zone_mu, bbox = [], [], [], [], []
+    skipped = {}   # {region: [zones skipped, {reason}]}
+    for reg, zones in regions.items():
+        mat = materials.get(reg)
+        if mat not in mu_cm:
+            continue
+        for zone in zones:
+            hs, reason = [], None
+            for sign, name in zone:
+                kind, vals, transformed = bodies[name]
+                h = None if transformed else _halfspaces(kind, vals)
+                if transformed:
+                    reason = f"{name} ({kind}, transformed by {transformed})"
+                elif h is None:
+                    reason = f"{name} ({kind}, not planar)"
+                elif sign == "-" and len(h) > 1:
+                    reason = f"-{name} ({kind} subtracted)"
+                if reason:
+                    break
+                hs += h if sign == "+" else [(tuple(-np.asarray(n)), -c) for n, c in h]
+            if reason or not hs:
+                entry = skipped.setdefault(reg, [0, set()])
+                entry[0] += 1
+                entry[1].add(reason or "no bodies")
+                continue
+            lo, hi = np.full(3, -np.inf), np.full(3, np.inf)
+            for n, c in hs:
+                axis = np.flatnonzero(n)
+                if axis.size == 1:
+                    a = axis[0]
+                    if n[a] > 0:
+                        hi[a] = min(hi[a], c / n[a])
+                    else:
+                        lo[a] = max(lo[a], c / n[a])
+            starts.append(len(normals))
+            normals += [n for n, _ in hs]
+            offsets += [c for _, c in hs]
+            zone_mu.append(mu_cm[mat])
+            bbox.append(np.concatenate([lo, hi]))
+
+    if skipped:
+        print(f"WARNING: {sum(n for n, _ in skipped.values())} barrier zone(s) left out of the point kernel "
+              "(no shielding from them in the map):")
+        for reg, (n, reasons) in skipped.items():
+            shown = sorted(reasons)
+            more = f" and {len(shown) - 3} more" if len(shown) > 3 else ""
+            print(f"  {reg} ({materials[reg]}): {n} zone(s); {', '.join(shown[:3])}{more}")
+    return {
+        "normals": np.asarray(normals, dtype=float).reshape(-1, 3),
+        "offsets": np.asarray(offsets, dtype=float),
+        "starts":  np.asarray(starts, dtype=np.intp),
+        "mu":      np.asarray(zone_mu, dtype=float),
+        "bbox":    np.asarray(bbox, dtype=float).reshape(-1, 6),
+    }
+
+
+# ---------------- point kernel ----------------
+def _select_zones(barriers, keep):
+    """Sub-geometry with only the zones flagged in keep."""
+    ends = np.append(barriers["starts"][1:], barriers["offsets"].size)
+    idx = [np.arange(s, e) for s, e in zip(barriers["starts"][keep], ends[keep])]
+    lengths = [i.size for i in idx]
+    idx = np.concatenate(idx) if idx else np.empty(0, dtype=np.intp)
+    return (barriers["normals"][idx], barriers["offsets"][idx],
+            np.cumsum([0] + lengths[:-1]).astype(np.intp), barriers["mu"][keep])
+
+
+def mu_path(points, source, barriers):
+    """
+    Σ μ·x [mfp] along the straight rays source → points (N, 3) [cm].
+    Each ray is clipped against every convex zone at once (Cyrus–Beck: one matrix product for all
+    half-spaces, then per-zone max/min of the entry/exit parameters).
+    """
+    mfp = np.zeros(len(points))
+    if barriers["starts"].size == 0:
+        return mfp
+
+    # Cull zones whose bounds miss the box spanned by the source and these points
+    lo = np.minimum(points.min(axis=0), source)
+    hi = np.maximum(points.max(axis=0), source)
+    bb = barriers["bbox"]
+    keep = np.all(bb[:, :3] <= hi, axis=1) & np.all(bb[:, 3:] >= lo, axis=1)
+    if not keep.any():
+        return mfp
+    normals, offsets, starts, mu = _select_zones(barriers, keep)
+
+    D = points - source
+    a = normals @ source - offsets            # (C,)   g(0) per half-space
+    b = normals @ D.T                         # (C, N) dg/dt per half-space and ray
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = -a[:, None] / b
+    t_in = np.where(b < 0, t, -np.inf)
+    t_in[(b == 0) & (a[:, None] >= 0)] = np.inf  # parallel to a plane, on its outer side
+    t_out = np.where(b > 0, t, np.inf)
+    t_in = np.maximum(np.maximum.reduceat(t_in, starts, axis=0), 0.0)
+    t_out = np.minimum(np.minimum.reduceat(t_out, starts, axis=0), 1.0)
+
+    frac = np.clip(t_out - t_in, 0.0, None)   # (Z, N) fraction of each ray inside each zone
+    return (mu @ frac) * np.linalg.norm(D, axis=1)
+
+
+def point_kernel(points, source, barriers, A_cum=1.0, r_min_cm=0.0):
+    """H*(10) [µSv] at points (N, 3) [cm] for a cumulated activity A_cum [Bq·s] at source."""
+    r_m = np.maximum(np.linalg.norm(points - source, axis=1), r_min_cm) / 100
+    mfp = mu_path(points, source, barriers)
+    return GAMMA_USV_M2_PER_BQS * A_cum / r_m ** 2 * np.exp(-mfp) * attenuation.buildup(mfp)
+
+
+def _tile_slices(shape, stride, tile=TILE):
+    """Index slices (over the strided grid) of the tiles covering a mesh."""
+    n = [len(range(0, s, stride)) for s in shape]
+    return [(slice(i, i + tile), slice(j, j + tile), slice(k, k + tile))
+            for i in range(0, n[0], tile) for j in range(0, n[1], tile) for k in range(0, n[2], tile)]
+
+
+def _tile_dose(centres, sl, source, barriers, A_cum, r_min_cm):
+    xc, yc, zc = (c[s] for c, s in zip(centres, sl))
+    X, Y, Z = np.meshgrid(xc, yc, zc, indexing="ij")
+    pts = np.column_stack([X.ravel(), Y.ravel(), Z.ravel()])
+    return point_kernel(pts, source, barriers, A_cum, r_min_cm).reshape(X.shape)
+
+
+def point_kernel_map(x_edges, y_edges, z_edges, source, barriers, A_cum=1.0, stride=1, processes=None):
+    """
+    Point-kernel H*(10) [µSv] at every (stride-th) bin centre of a Cartesian mesh.
+    Tiles of TILE^3 bins are evaluated on a process pool; returns an (nx, ny, nz) array.
+    """
+    centres = [0.5 * (e[:-1] + e[1:])[::stride] for e in (x_edges, y_edges, z_edges)]
+    out = np.empty([c.size for c in centres])
+    r_min_cm = 0.5 * max(np.diff(e).max() for e in (x_edges, y_edges, z_edges)) * stride
+
+    tiles = _tile_slices((x_edges.size - 1, y_edges.size - 1, z_edges.size - 1), stride)
+    args = (centres, source, barriers, A_cum, r_min_cm)
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        for sl in tiles:
+            out[sl] = _tile_dose(centres, sl, *args[1:])
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(_tile_dose, centres, sl, *args[1:]): sl for sl in tiles}
+            for fut, sl in futures.items():
+                out[sl] = fut.result()
+    return out
+
+
+# ---------------- comparison with FLUKA ----------------
+def compare_to_fluka(bnn_file, inp_file, stride=1, processes=None):
+    """
+    Analytical map per Bq·s on the mesh of a USRBIN DOSE-EQ file [pSv/primary] and its ratio to FLUKA.
+    Returns (edges, analytical [µSv], fluka [µSv], fluka rel. err, ratio analytical/FLUKA);
+    the errors are NaN for per-cycle files, which carry none.
+    """
+    x_edges, y_edges, z_edges, values, errors = decode_usrbin(bnn_file)
+    source = read_source(inp_file)
+    barriers = barrier_zones(*read_geometry(inp_file))
+    print(f"Barrier zones traced: {barriers['starts'].size}, source at {source} cm")
+
+    ana = point_kernel_map(x_edges, y_edges, z_edges, source, barriers, 1.0, stride, processes)
+    fluka = values[::stride, ::stride, ::stride].astype(float) * 1e-6  # pSv -> µSv per primary (Bq·s)
+    if errors is None:  # per-cycle file: no statistics block
+        err = np.full(fluka.shape, np.nan)
+    else:
+        err = errors[::stride, ::stride, ::stride].astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(fluka > 0, ana / fluka, np.nan)
+    return (x_edges, y_edges, z_edges), ana, fluka, err, ratio
+
+
+def print_summary(ratio, err, elapsed):
+    """Rich table of analytical/FLUKA percentiles for well-converged voxels (all voxels without errors)."""
+    has_err = np.isfinite(err).any()
+    ok = np.isfinite(ratio) & (err < MAX_REL_ERR) if has_err else np.isfinite(ratio)
+    which = f"voxels with rel. err < {MAX_REL_ERR:.0%}" if has_err else "all voxels, no FLUKA errors"
+    table = Table(title=f"\nAnalytical / FLUKA H*(10) ({which})")
+    for h in ["Voxels"] + [f"P{q}" for q in PERCENTILES] + ["Time\n[s]"]:
+        table.add_column(h, justify="center")
+    pct = np.percentile(ratio[ok], PERCENTILES) if ok.any() else [np.nan] * len(PERCENTILES)
+    table.add_row(f"{ok.sum():,}", *[f"{p:.3f}" for p in pct], f"{elapsed:.1f}")
+    Console(width=120).print(table)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Analytical point-kernel H*(10) map and its ratio to the FLUKA map.")
+    p.add_argument("--study", default="main_study")
+    p.add_argument("--bnn", type=Path, default=None, help="USRBIN DOSE-EQ .bnn (default: <study>/run/run_23.bnn).")
+    p.add_argument("--inp", type=Path, default=None, help="FLUKA input with the geometry (default: fluka/tc99m/<study>).")
+    p.add_argument("--stride", type=int, default=1, help="Evaluate every n-th bin along each axis.")
+    p.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores).")
+    args = p.parse_args()
+
+    bnn = args.bnn or BASE_PATH / args.study / "run" / "run_23.bnn"
+    inp = args.inp or REPO_ROOT / "fluka" / "tc99m" / args.study / f"{args.study}.inp"
+
+    t0 = time.perf_counter()
+    edges, ana, fluka, err, ratio = compare_to_fluka(bnn, inp, args.stride, args.processes)
+    elapsed = time.perf_counter() - t0
+    print_summary(ratio, err, elapsed)
+
+    out_dir = RESULTS_BASE / f"point_kernel_{args.study}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_file = out_dir / "point_kernel_map.npz"
+    np.savez_compressed(out_file, x_edges=edges[0], y_edges=edges[1], z_edges=edges[2], stride=args.stride,
+                        analytical=ana.astype(np.float32), ratio=ratio.astype(np.float32))
+    print(f"Saved map: {out_file}")
+
+
+if __name__ == "__main__":
+    main()
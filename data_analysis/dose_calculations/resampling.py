@@ -0,0 +1,127 @@
+# resampling.py — permutation and bootstrap tests for paired method comparisons
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+EXACT_MAX_N  = 16         # enumerate all 2^n sign patterns up to this many pairs
+CHUNK        = 100_000    # resamples per vectorized batch
+POOL_MIN     = 1_000_000  # use a process pool from this many resamples on
+CI_LEVEL     = 95.0
+
+
+def _paired(x, y, transform):
+    """Return per-pair statistics d (NaN pairs dropped): differences or log-ratios."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = x - y if transform == "difference" else np.log(x / y)
+    return d[np.isfinite(d)]
+
+
+def _chunks(n_total):
+    return [min(CHUNK, n_total - s) for s in range(0, n_total, CHUNK)]
+
+
+def _map_chunks(fn, sizes, seed, *args):
+    """Evaluate fn(size, *args, seed) per chunk; spread over processes for large resample counts."""
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if sum(sizes) < POOL_MIN or len(sizes) == 1:
+        return [fn(n, *args, s) for n, s in zip(sizes, seeds)]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        return list(pool.map(fn, sizes, *[[a] * len(sizes) for a in args], seeds))
+
+
+# ---------------- permutation (sign-flip) test ----------------
+def _flip_chunk(n, d, seed):
+    """Count random sign patterns whose |mean| reaches the observed |mean|."""
+    rng = np.random.default_rng(seed)
+    signs = rng.integers(0, 2, size=(n, d.size), dtype=np.int8) * 2 - 1
+    stats = signs @ d / d.size
+    return int(np.count_nonzero(np.abs(stats) >= np.abs(d.mean()) * (1 - 1e-12)))
+
+
+def sign_flip_test(x, y, transform="difference", n_resamples=100_000, seed=None):
+    """
+    Paired permutation test: under H0 each pair difference is equally likely to have either sign.
+    Exact (all 2^n patterns in one matrix product) for n <= EXACT_MAX_N, Monte Carlo otherwise.
+    Returns (p_value, n_patterns, exact).
+    """
+    d = _paired(x, y, transform)
+    n = d.size
+    if n == 0:
+        return np.nan, 0, True
+
+    if n <= EXACT_MAX_N:
+        bits = (np.arange(2 ** n, dtype=np.int64)[:, None] >> np.arange(n)) & 1
+        stats = (1 - 2 * bits.astype(np.int8)) @ d / n
+        hits = np.count_nonzero(np.abs(stats) >= np.abs(d.mean()) * (1 - 1e-12))
+        return hits / 2 ** n, 2 ** n, True
+
+    hits = sum(_map_chunks(_flip_chunk, _chunks(n_resamples), seed, d))
+    return (hits + 1) / (n_resamples + 1), n_resamples, False
+
+
+# ---------------- bootstrap ----------------
+def _boot_chunk(n, x, y, seed):
+    """Bootstrap over pairs -> (mean difference, ratio of means, geometric-mean ratio) per resample."""
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, x.size, size=(n, x.size))
+    xs, ys = x[idx], y[idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.column_stack([
+            (xs - ys).mean(axis=1),
+            xs.sum(axis=1) / ys.sum(axis=1),
+            np.exp(np.log(xs / ys).mean(axis=1)),
+        ])
+
+
+def bootstrap(x, y, n_resamples=100_000, seed=None, level=CI_LEVEL):
+    """
+    Percentile bootstrap intervals for the mean difference, the ratio of means and the
+    geometric-mean ratio of paired doses. Returns {name: (estimate, low, high)}.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+
+    samples = np.vstack(_map_chunks(_boot_chunk, _chunks(n_resamples), seed, x, y))
+    lo, hi = (100 - level) / 2, 100 - (100 - level) / 2
+    low, high = np.nanpercentile(samples, [lo, hi], axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = [np.mean(x - y), x.sum() / y.sum(), np.exp(np.mean(np.log(x / y)))]
+    names = ["Mean difference", "Ratio of means", "Geometric-mean ratio"]
+    return {name: (est, l, h) for name, est, l, h in zip(names, estimate, low, high)}
+
+
+# ---------------- report ----------------
+def resampling_report(x, y, label_left, label_right, out_dir: Path, n_resamples=100_000, seed=None):
+    """
+    Runs sign-flip tests (on differences and log-ratios) and bootstrap intervals for
+    label_left vs label_right, saves a text file next to the paired t-test report
+    and returns (p_difference, filename).
+    """
+    p_diff, n_diff, exact_diff = sign_flip_test(x, y, "difference", n_resamples, seed)
+    p_log, n_log, exact_log = sign_flip_test(x, y, "log_ratio", n_resamples, seed)
+    boot = bootstrap(x, y, n_resamples, seed)
+
+    def kind(exact, n):
+        return f"exact, {n} sign patterns" if exact else f"Monte Carlo, {n:,} resamples"
+
+    lines = [
+        f"Permutation and bootstrap tests — {label_left} vs {label_right}",
+        "",
+        f"Pairs (n)                        : {np.count_nonzero(np.isfinite(np.asarray(x, float) - np.asarray(y, float)))}",
+        f"Sign-flip p-value (differences)  : {p_diff:.6g}  ({kind(exact_diff, n_diff)})",
+        f"Sign-flip p-value (log-ratios)   : {p_log:.6g}  ({kind(exact_log, n_log)})",
+        "",
+        f"Bootstrap ({n_resamples:,} resamples, {CI_LEVEL:g}% percentile intervals)",
+    ]
+    for name, (est, low, high) in boot.items():
+        lines.append(f"{name:<33}: {est:.6g}  [{low:.6g}, {high:.6g}]")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fname = out_dir / f"resampling_{label_left}_vs_{label_right}.txt"
+    fname.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return p_diff, str(fname)
@@ -0,0 +1,165 @@
+# shielding.py — what-if solver for barrier thicknesses (analytical model, main_study geometry)
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from activity import cumulated_activity_for
+from annual_doses import DAYS_PER_YEAR, OCCUPANCY_MAIN, TLD_LABELS_MAIN, WORKLOAD_PER_DAY
+from methods import analytical, attenuation
+
+RESULTS_BASE = Path(__file__).resolve().parent / "results"
+
+# Single-energy μ [m^-1] per barrier material, as in methods/analytical.py
+MU_M = {
+    "lead":  analytical.mu_Pb,
+    "glass": analytical.mu_Pb_glass,
+}
+
+ANNUAL_LIMIT_MSV = 1.0      # public dose limit [mSv/y]
+POOL_MIN = 5_000_000        # grid points from which the process-pool mode is worthwhile
+
+
+# ---------------- model ----------------
+def transmission_curves(materials, thicknesses_m, spectrum=None, with_buildup=False):
+    """
+    H*(10) transmission for every material and thickness, shape (n_materials, n_thicknesses).
+    With spectrum=(E [keV], dΦ/dE) μ depends on energy (methods/attenuation.py); otherwise one μ per material.
+    """
+    x = np.asarray(thicknesses_m, dtype=float)
+    if spectrum is None:
+        mux = np.array([MU_M[m] for m in materials])[:, None] * x          # (M, X)
+        T = np.exp(-mux)
+        return T * attenuation.buildup(mux) if with_buildup else T
+
+    E, phi = (np.asarray(a, dtype=float) for a in spectrum)
+    weight = phi * attenuation.h10_per_fluence(E)
+    mu = np.array([attenuation.material_att_coeff(m, E) for m in materials])  # (M, E)
+    mux = mu[:, None, :] * x[None, :, None]                                   # (M, X, E)
+    T = np.exp(-mux)
+    if with_buildup:
+        T *= attenuation.buildup(mux)
+    return T @ weight / weight.sum()
+
+
+def annual_dose_grid(A_cum, transmission, workloads, occupancies, distances=None):
+    """
+    Annual H*(10) [mSv/y] for every TLD, material, thickness, workload and occupancy,
+    shape (n_TLD, n_materials, n_thicknesses, n_workloads, n_occupancies).
+    A_cum [Bq·s] is per patient; workloads are patients per day; occupancies have shape (n_TLD, n_occupancies).
+    """
+    d = np.asarray(analytical.distances if distances is None else distances, dtype=float)
+    per_patient = analytical.gamma * (A_cum / 3.6e9) / d ** 2               # mSv per patient, unshielded
+    W = np.asarray(workloads, dtype=float) * DAYS_PER_YEAR
+    occ = np.clip(np.asarray(occupancies, dtype=float), 0.0, 1.0)
+    return (per_patient[:, None, None, None, None]
+            * transmission[None, :, :, None, None]
+            * W[None, None, None, :, None]
+            * occ[:, None, None, None, :])
+
+
+def min_thickness(doses, thicknesses_m, limit=ANNUAL_LIMIT_MSV):
+    """
+    Minimum thickness [m] meeting the limit along the thickness axis (axis 2) of annual_dose_grid.
+    NaN where even the thickest barrier of the grid is not enough.
+    """
+    ok = doses <= limit
+    first = ok.argmax(axis=2)
+    x = np.asarray(thicknesses_m, dtype=float)[first]
+    return np.where(ok.any(axis=2), x, np.nan)
+
+
+def _solve_chunk(A_cum, transmission, workloads, occupancies, thicknesses_m, limit):
+    return min_thickness(annual_dose_grid(A_cum, transmission, workloads, occupancies), thicknesses_m, limit)
+
+
+def solve(A_cum, materials, thicknesses_m, workloads, occupancies, limit=ANNUAL_LIMIT_MSV,
+          spectrum=None, with_buildup=False, processes=None):
+    """
+    Minimum barrier thickness [m] per TLD, material, workload and occupancy,
+    shape (n_TLD, n_materials, n_workloads, n_occupancies).
+    Large grids are split over workloads and solved on a process pool.
+    """
+    T = transmission_curves(materials, thicknesses_m, spectrum, with_buildup)
+    workloads = np.atleast_1d(np.asarray(workloads, dtype=float))
+    occupancies = np.asarray(occupancies, dtype=float)
+    size = len(analytical.distances) * T.size * workloads.size * occupancies.shape[1]
+
+    processes = processes or os.cpu_count()
+    if processes == 1 or size < POOL_MIN or workloads.size == 1:
+        return _solve_chunk(A_cum, T, workloads, occupancies, thicknesses_m, limit)
+
+    chunks = np.array_split(workloads, min(processes * 4, workloads.size))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_solve_chunk, A_cum, T, w, occupancies, thicknesses_m, limit) for w in chunks]
+        return np.concatenate([f.result() for f in futures], axis=2)
+
+
+# ---------------- output ----------------
+def print_table(x_min, materials, workloads, occupancies, limit):
+    """Minimum thickness per TLD at the nominal workload (or the closest one on the grid) and first occupancy."""
+    w_idx = int(np.argmin(np.abs(np.asarray(workloads) - WORKLOAD_PER_DAY)))
+    table = Table(title=f"\nMinimum barrier thickness for {limit:g} mSv/y "
+                        f"(workload {workloads[w_idx]:g}/day)")
+    for h in ["TLD", "Distance\n[m]", "Occupancy"] + [f"{m}\n[mm]" for m in materials]:
+        table.add_column(h, justify="center")
+    for i, lab in enumerate(TLD_LABELS_MAIN[:x_min.shape[0]]):
+        cells = []
+        for k in range(len(materials)):
+            x = x_min[i, k, w_idx, 0]
+            cells.append("> grid" if np.isnan(x) else f"{x * 1000:.1f}")
+        table.add_row(lab, f"{analytical.distances[i]:.2f}", f"{occupancies[i, 0]:.2f}", *cells)
+    Console(width=120, markup=False).print(table)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Minimum barrier thickness per TLD over grids of design parameters.")
+    p.add_argument("--limit", type=float, default=ANNUAL_LIMIT_MSV, help="Annual dose limit [mSv/y].")
+    p.add_argument("--materials", nargs="+", default=list(MU_M), choices=list(MU_M))
+    p.add_argument("--max-mm", type=float, default=10.0, help="Largest thickness on the grid [mm].")
+    p.add_argument("--step-mm", type=float, default=0.1, help="Thickness step [mm].")
+    p.add_argument("--workloads", type=float, nargs="+", default=None,
+                   help="Patients per day (default: 1..40).")
+    p.add_argument("--occupancy", type=float, nargs="+", default=None,
+                   help="Occupancy factors shared by all TLDs (default: annual_doses.OCCUPANCY_MAIN per TLD).")
+    p.add_argument("--spectral", action="store_true", help="Energy-dependent μ folded with the room spectrum.")
+    p.add_argument("--buildup", action="store_true", help="Include a Berger buildup factor.")
+    p.add_argument("--processes", type=int, default=None)
+    args = p.parse_args()
+
+    n = len(analytical.distances)
+    thicknesses = np.arange(0.0, args.max_mm + args.step_mm / 2, args.step_mm) / 1000  # mm → m
+    workloads = np.asarray(args.workloads or np.arange(1, 41), dtype=float)
+    if args.occupancy:
+        occupancies = np.tile(np.asarray(args.occupancy, dtype=float), (n, 1))
+    else:
+        occ = np.pad(np.asarray(OCCUPANCY_MAIN, dtype=float), (0, max(n - len(OCCUPANCY_MAIN), 0)),
+                     constant_values=1.0)[:n]
+        occupancies = occ[:, None]
+    spectrum = attenuation.load_spectrum("tc99m", "main_study") if args.spectral else None
+
+    A_cum = cumulated_activity_for("annual_doses", "tc-99m")
+    t0 = time.perf_counter()
+    x_min = solve(A_cum, args.materials, thicknesses, workloads, occupancies, args.limit,
+                  spectrum, args.buildup, args.processes)
+    n_comb = n * len(args.materials) * thicknesses.size * workloads.size * occupancies.shape[1]
+    print(f"Solved {n_comb:,} combinations in {time.perf_counter() - t0:.2f} s")
+
+    print_table(x_min, args.materials, workloads, occupancies, args.limit)
+
+    out_dir = RESULTS_BASE / "shielding_main_study"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_file = out_dir / "min_thickness.npz"
+    np.savez_compressed(out_file, min_thickness_m=x_min, materials=np.asarray(args.materials),
+                        workloads=workloads, occupancies=occupancies, limit=args.limit,
+                        labels=np.asarray(TLD_LABELS_MAIN[:n]))
+    print(f"Saved: {out_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# workload.py — Monte Carlo annual workload engine (main_study geometry)
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from activity import DEFAULTS, HALF_LIFE_S, clock_seconds, cumulated_activity
+from annual_doses import (BASE_PATHS, DAYS_PER_YEAR, OCCUPANCY_MAIN, TLD_LABELS_MAIN,
+                          WORKLOAD_PER_DAY)
+from methods.simulation import process_simulation     # (folder: Path, A_cum: float) -> (dose, unc)
+
+# --- workload model -------------------------------------------------------------
+# A0 means and scan durations come from the ("annual_doses", isotope) entries of
+# activity_defaults.json; with all spreads set to 0, p_missed_day = 0 and a single
+# isotope, the mean annual dose reproduces annual_doses.py.
+WORKLOAD_MODEL = {
+    "patients_per_day": WORKLOAD_PER_DAY,   # Poisson mean per working day
+    "days_per_year":    int(DAYS_PER_YEAR),
+    "p_missed_day":     0.05,               # probability the scanner is idle on a given day
+    "injection_window": ("08:00", "16:00"), # injection times are uniform within this window
+    "isotopes": {
+        #           share of patients, relative SD of A0 (lognormal), scan start delay after injection [s]
+        "tc-99m": dict(fraction=0.85, A0_rel_sd=0.10, delay_mean_s=0.0, delay_sd_s=600.0),
+        "lu-177": dict(fraction=0.15, A0_rel_sd=0.05, delay_mean_s=0.0, delay_sd_s=600.0),
+    },
+}
+
+CHUNK_YEARS   = 200         # years per batch in exact mode (~1e6 patients)
+CHUNK_YEARS_CLT = 250_000   # years per batch in CLT mode
+PILOT_PATIENTS  = 1_000_000 # patients per isotope used to estimate per-patient moments
+PERCENTILES = (5, 50, 95, 99)
+
+
+# ---------------- sampling ----------------
+def _isotope_params(model):
+    """Return (names, fractions, A0 means [MBq], A0 rel. SDs, delay means, delay SDs, scan durations [s])."""
+    names = [iso for iso, p in model["isotopes"].items() if p["fraction"] > 0]
+    for iso in names:
+        if iso not in HALF_LIFE_S:
+            raise KeyError(f"No half-life for {iso}. Add it to activity.HALF_LIFE_S.")
+    iso_cfg = [model["isotopes"][iso] for iso in names]
+    act_cfg = [DEFAULTS[("annual_doses", iso)] for iso in names]
+
+    frac = np.array([c["fraction"] for c in iso_cfg], dtype=float)
+    frac /= frac.sum()
+    dur = np.array([clock_seconds(a["end"]) - clock_seconds(a["start"]) for a in act_cfg])
+    return (names, frac,
+            np.array([a["A0_MBq"] for a in act_cfg], dtype=float),
+            np.array([c["A0_rel_sd"] for c in iso_cfg], dtype=float),
+            np.array([c["delay_mean_s"] for c in iso_cfg], dtype=float),
+            np.array([c["delay_sd_s"] for c in iso_cfg], dtype=float),
+            dur)
+
+
+def sample_patients(n, model, rng, iso_idx=None):
+    """
+    Sample n patients and return (iso_idx, A_cum [Bq·s]).
+    If iso_idx is given, only the remaining attributes are sampled.
+    """
+    names, frac, A0_mean, A0_sd, d_mean, d_sd, dur = _isotope_params(model)
+    if iso_idx is None:
+        iso_idx = rng.choice(len(names), size=n, p=frac)
+
+    # Lognormal A0 with the requested mean and relative SD
+    s2 = np.log1p(A0_sd[iso_idx] ** 2)
+    A0 = A0_mean[iso_idx] * np.exp(rng.standard_normal(n) * np.sqrt(s2) - 0.5 * s2)
+
+    t0, t1 = clock_seconds(model["injection_window"])
+    t_inj = rng.uniform(t0, t1, n)
+    t_start = t_inj + np.abs(d_mean[iso_idx] + d_sd[iso_idx] * rng.standard_normal(n))
+    t_end = t_start + dur[iso_idx]
+
+    lam_names = np.asarray(names)[iso_idx]
+    return iso_idx, cumulated_activity(lam_names, A0, t_inj, t_start, t_end)
+
+
+def _patients_per_year(n_years, model, rng):
+    """Working days ~ Binomial, patients ~ Poisson(rate × working days)."""
+    days = rng.binomial(model["days_per_year"], 1.0 - model["p_missed_day"], n_years)
+    return rng.poisson(model["patients_per_day"] * days)
+
+
+def _exact_chunk(n_years, model, seed):
+    """Per-patient sampling for n_years -> yearly cumulated activity per isotope (n_years, n_iso)."""
+    rng = np.random.default_rng(seed)
+    n_iso = len(_isotope_params(model)[0])
+    n_pat = _patients_per_year(n_years, model, rng)
+    year = np.repeat(np.arange(n_years), n_pat)
+    iso_idx, A = sample_patients(year.size, model, rng)
+    return np.bincount(year * n_iso + iso_idx, weights=A,
+                       minlength=n_years * n_iso).reshape(n_years, n_iso)
+
+
+def patient_moments(model, n=PILOT_PATIENTS, seed=None):
+    """Per-isotope mean and variance of the per-patient cumulated activity (pilot sample)."""
+    rng = np.random.default_rng(seed)
+    n_iso = len(_isotope_params(model)[0])
+    mean, var = np.empty(n_iso), np.empty(n_iso)
+    for k in range(n_iso):
+        _, A = sample_patients(n, model, rng, iso_idx=np.full(n, k))
+        mean[k], var[k] = A.mean(), A.var(ddof=1)
+    return mean, var
+
+
+def _clt_chunk(n_years, model, moments, seed):
+    """
+    Aggregate sampling: a year's total for N patients of one isotope is drawn from
+    Normal(N·mean, N·var), which is exact in the limit of the ~10^3 patients per year.
+    """
+    rng = np.random.default_rng(seed)
+    frac = _isotope_params(model)[1]
+    mean, var = moments
+    n_pat = rng.multinomial(_patients_per_year(n_years, model, rng), frac)
+    A = rng.normal(n_pat * mean, np.sqrt(n_pat * var))
+    return np.clip(A, 0.0, None)
+
+
+def _run_chunks(fn, n_years, chunk, processes, seed, *args):
+    """Split n_years into chunks with independent seeds; run them serially or on a process pool."""
+    sizes = [chunk] * (n_years // chunk) + ([n_years % chunk] if n_years % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if processes == 1 or len(sizes) == 1:
+        return np.vstack([fn(n, *args, s) for n, s in zip(sizes, seeds)])
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(fn, n, *args, s) for n, s in zip(sizes, seeds)]
+        return np.vstack([f.result() for f in futures])
+
+
+def sample_annual_activity(n_years, model=WORKLOAD_MODEL, method="clt", seed=None, processes=None):
+    """
+    Sample n_years of workload -> yearly cumulated activity per isotope, shape (n_years, n_iso) [Bq·s].
+    method="exact": every patient is sampled (batched per CHUNK_YEARS years).
+    method="clt"  : yearly totals are drawn from per-patient moments (10^6+ years in seconds).
+    """
+    processes = processes or os.cpu_count()
+    if method == "exact":
+        return _run_chunks(_exact_chunk, n_years, CHUNK_YEARS, processes, seed, model)
+    if method == "clt":
+        moments = patient_moments(model, seed=seed)
+        return _run_chunks(_clt_chunk, n_years, CHUNK_YEARS_CLT, processes, seed, model, moments)
+    raise ValueError("method must be 'exact' or 'clt'.")
+
+
+# ---------------- doses ----------------
+def annual_dose_samples(A_year, dose_per_Bqs, occupancy=None):
+    """
+    Annual doses [mSv/y] from yearly activity (n_years, n_iso) and dose per Bq·s (n_iso, n_points) [µSv].
+    n_points can be TLDs or flattened voxels; occupancy broadcasts over the points.
+    """
+    dose = A_year @ np.asarray(dose_per_Bqs, dtype=float) / 1000  # µSv -> mSv
+    if occupancy is not None:
+        dose *= np.clip(np.asarray(occupancy, dtype=float), 0.0, 1.0)
+    return dose
+
+
+def dose_percentiles(A_year, dose_per_Bqs, occupancy=None, q=PERCENTILES, chunk_points=2048):
+    """Percentiles of the annual dose per point, computed in chunks of points (for voxel maps)."""
+    D = np.asarray(dose_per_Bqs, dtype=float)
+    occ = np.ones(D.shape[1]) if occupancy is None else np.broadcast_to(occupancy, D.shape[1])
+    out = np.empty((len(q), D.shape[1]))
+    for i in range(0, D.shape[1], chunk_points):
+        sl = slice(i, i + chunk_points)
+        out[:, sl] = np.percentile(annual_dose_samples(A_year, D[:, sl], occ[sl]), q, axis=0)
+    return out
+
+
+def load_dose_per_Bqs(isotopes):
+    """Simulated H*(10) per Bq·s [µSv] at every main_study TLD, one row per isotope."""
+    rows = []
+    for iso in isotopes:
+        folder = BASE_PATHS[iso] / "main_study"
+        if not folder.is_dir():
+            raise FileNotFoundError(f"Missing folder: {folder}")
+        dose, _ = process_simulation(folder, 1.0)
+        rows.append(np.asarray(dose, dtype=float)[:len(TLD_LABELS_MAIN)])
+    return np.vstack(rows)
+
+
+def print_summary(annual, labels, occupancy, method, n_years):
+    """Rich table with mean and percentiles of the annual dose per TLD."""
+    table = Table(title=f"\nAnnual dose distribution (main_study, {n_years:,} years, {method})")
+    for h in ["TLD", "Occupancy", "Mean\n[mSv/y]"] + [f"P{q}\n[mSv/y]" for q in PERCENTILES]:
+        table.add_column(h, justify="center")
+    pct = np.percentile(annual, PERCENTILES, axis=0)
+    mean = annual.mean(axis=0)
+    for i, lab in enumerate(labels):
+        table.add_row(lab, f"{occupancy[i]:.2f}", f"{mean[i]:.4f}",
+                      *[f"{pct[k, i]:.4f}" for k in range(len(PERCENTILES))])
+    Console(width=140, markup=False).print(table)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Monte Carlo annual workload and dose simulator.")
+    p.add_argument("--years", type=int, default=100_000, help="Number of simulated years.")
+    p.add_argument("--method", choices=["clt", "exact"], default="clt")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores).")
+    args = p.parse_args()
+
+    names = _isotope_params(WORKLOAD_MODEL)[0]
+    D = load_dose_per_Bqs(names)
+    n = D.shape[1]
+    occ = np.asarray(OCCUPANCY_MAIN, dtype=float)
+    occ = np.pad(occ, (0, max(n - occ.size, 0)), constant_values=1.0)[:n]
+
+    A_year = sample_annual_activity(args.years, WORKLOAD_MODEL, args.method, args.seed, args.processes)
+    annual = annual_dose_samples(A_year, D, occ)
+    print_summary(annual, TLD_LABELS_MAIN[:n], occ, args.method, args.years)
+
+
+if __name__ == "__main__":
+    main()
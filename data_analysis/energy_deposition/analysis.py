@@ -1,5 +1,8 @@
 # analyse_runs.py
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
@@ -12,10 +15,16 @@ SCRIPT_DIR   = Path(__file__).resolve().parent
 RUN_FOLDER   = Path()  # Leave empty; will be set from plot.py
 HIERARCHY_CSV = SCRIPT_DIR / "region_hierarchy.csv"
 OUTPUT_CSV    = SCRIPT_DIR / "energy_by_region.csv"
+ACCUMULATOR_NAME = "energy_accumulator.npz"  # running statistics, saved next to OUTPUT_CSV
 
 # Placeholder for missing hierarchy labels (use "" if you prefer blanks)
 MISSING_LABEL = "Unspecified"
 
+sys.path.append(str(SCRIPT_DIR.parents[1]))  # repo root (fluka_store)
+import fluka_store
+import running_stats
+import validate_runs
+
 # -----------------------------
 # File listing / parsing helpers
 # -----------------------------
@@ -25,36 +34,27 @@ def list_run_files(folder):
     """Return sorted run_XXXXX.out files from folder."""
     return sorted(p for p in folder.glob("run_*.out") if RUN_FILE_RX.match(p.name))
 
-def find_em_energy_start(lines):
-    """Return index of first data line after EM-ENRGY header, else None."""
-    for i, line in enumerate(lines):
-        if ("EM-ENRGY" in line) and ("Density" in line) and ("Region" in line):
-            return i + 4
-    return None
-
-def parse_em_energy_rows(lines, start_idx, tokens_per_row=7):
-    """Parse EM-ENRGY rows into (region_names, energy_keV) until token count changes."""
-    names, vals = [], []
-    for line in lines[start_idx:]:
-        parts = line.strip().split()
-        if len(parts) != tokens_per_row:
-            break
-        names.append(parts[1])
-        vals.append(float(parts[-1].replace("D", "E")) * 1e6)  # GeV -> keV
-    return names, vals
-
 def extract_energy_from_file(file_path):
-    """Extract per-region EM-ENRGY (keV) from one .out file."""
-    lines = file_path.read_text(errors="ignore").splitlines()
-    start = find_em_energy_start(lines)
-    return parse_em_energy_rows(lines, start)
-
-def load_all_files(folder_path):
+    """Extract per-region EM-ENRGY (keV) from one .out file, via the .npz store if fresh."""
+    cols = fluka_store.load_or_parse(file_path, "out", "em_energy")
+    return cols["region"].tolist(), (cols["energy"] * 1e6).tolist()  # GeV -> keV
+
+def load_files(files, processes=None):
+    """
+    Parse run files -> list of (region_names, values), in the order of files.
+    Runs are parsed on a process pool (each worker streams its file only up to the end of the EM-ENRGY table).
+    """
+    files = list(files)
+    processes = min(processes or os.cpu_count() or 1, max(len(files), 1))
+    if processes == 1:
+        return [extract_energy_from_file(f) for f in files]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(extract_energy_from_file, files, chunksize=max(1, len(files) // (4 * processes))))
+
+def load_all_files(folder_path, processes=None):
     """Collect energy vectors from all runs -> (region_names, matrix[n_runs, n_regions])."""
-    files = list_run_files(folder_path)
     region_names_ref, all_energy = [], []
-    for f in files:
-        names, values = extract_energy_from_file(f)
+    for names, values in load_files(list_run_files(folder_path), processes):
         if not values:
             continue
         if not region_names_ref:
@@ -62,6 +62,37 @@ def load_all_files(folder_path):
         all_energy.append(values)
     return region_names_ref, np.asarray(all_energy, dtype=float)
 
+def update_accumulator(folder_path, acc_path, processes=None, exclude=()):
+    """
+    Fold runs of folder_path that are not yet in the accumulator at acc_path (created if missing),
+    save it and return it. Runs already folded in (or recorded without values) are never reread; runs in
+    exclude (file names) are skipped. Raises ValueError for a run whose regions differ from the accumulator's.
+    If an excluded run was folded in earlier (validation can reject it once more cycles exist),
+    the accumulator is rebuilt from the remaining runs.
+    """
+    acc = running_stats.load(acc_path) if Path(acc_path).exists() else None
+    if acc and set(acc["runs"]) & set(exclude):
+        print(f"Rebuilding {Path(acc_path).name}: it holds run(s) that now fail validation")
+        acc = None
+        Path(acc_path).unlink()
+    skip = set(acc["runs"]) | set(acc["empty_runs"]) if acc else set()
+    skip |= set(exclude)
+    new_files = [f for f in list_run_files(folder_path) if f.name not in skip]
+
+    empty_runs = []
+    for f, (names, values) in zip(new_files, load_files(new_files, processes)):
+        if not values:
+            empty_runs.append(f.name)
+            continue
+        if acc is None:
+            acc = running_stats.empty(names)
+        running_stats.update(acc, f.name, values, names)
+
+    if acc is not None and new_files:
+        acc["empty_runs"] += empty_runs
+        running_stats.save(acc, acc_path)
+    return acc
+
 # -----------------------------
 # Stats / hierarchy / output
 # -----------------------------
@@ -119,8 +150,17 @@ def save_region_table(df):
 # Main function
 # -----------------------------
 def run():
-    region_names, energy_data = load_all_files(RUN_FOLDER)
-    mean_energy, error_percent = compute_mean_and_error(energy_data)
+    acc_path = OUTPUT_CSV.with_name(ACCUMULATOR_NAME)
+    bad = validate_runs.bad_runs(validate_runs.validate(RUN_FOLDER, validate_runs.find_inputs(RUN_FOLDER)))
+    if bad:
+        print(f"Excluding {len(bad)} run(s) that failed validation: {', '.join(sorted(bad))}")
+    acc = update_accumulator(RUN_FOLDER, acc_path, exclude={f"{stem}.out" for stem in bad})
+    if acc is None:
+        print(f"No EM-ENRGY data in {RUN_FOLDER}")
+        return None
+    print(f"Running statistics over {acc['count']} runs ({acc_path.name})")
+    region_names = acc["regions"]
+    mean_energy, error_percent = running_stats.mean_and_error(acc)
     hdf = load_hierarchy()
     results = build_results_dataframe(region_names, mean_energy, error_percent, hdf)
 
@@ -1,29 +1,25 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 from pathlib import Path
 import analysis
+import rollup
 import matplotlib.ticker as mticker
 
 plt.rcParams.update({'font.family': 'Trebuchet MS'})
 
 SCRIPT_DIR = Path(__file__).resolve().parent
+RUN_ROOT = Path("/Users/weli/Documents/pyCharm/MPH5008/data")
 
-# Ask user for isotope
-iso = input("Select isotope [tc99m/lu177]: ").strip().lower()
-while iso not in {"tc99m", "lu177"}:
-    print("Invalid input. Please type 'tc99m' or 'lu177'.")
-    iso = input("Select isotope [tc99m/lu177]: ").strip().lower()
-
-
-# Update paths for analysis and plots
-analysis.RUN_FOLDER = Path(f"/Users/weli/Documents/pyCharm/MPH5008/data/{iso}/main_study/run")
-results_dir = SCRIPT_DIR / "results" / iso
-results_dir.mkdir(parents=True, exist_ok=True)
-analysis.OUTPUT_CSV = results_dir / "energy_by_region.csv"
-
-analysis.run() # <-- THIS LINE ENSURES CSV IS GENERATED
+# --- Add mapping for isotope labels ---
+ISOTOPE_LABELS = {
+    "tc99m": r"$^{99\mathrm{m}}$Tc",
+    "lu177": r"$^{177}$Lu",
+}
 
 # ---------- helpers ----------
 def format_percentage(p):
@@ -37,14 +33,7 @@ def tint_series(base_hex, n, start=0.8, end=1.0):
     ts = np.linspace(start, end, max(n, 1)+1)
     return [mcolors.to_hex((1 - t) * white + t * base) for t in ts]
 
-def summarise(df, by):
-    """Group by 'by' column(s) and return summed energy and percentage totals."""
-    return df.groupby(by, as_index=False, dropna=False).agg(
-        Total_Energy_keV=('Mean_Energy_[keV]', 'sum'),
-        Percentage_of_Total=('Percentage_of_Total', 'sum')
-    )
-
-def barh_simple(df, y, title, colour_map_or_seq=None, figsize=(6, 3), save_path=None):
+def barh_simple(df, y, title, colour_map_or_seq=None, figsize=(6, 3), save_path=None, show=False):
     """Plot a simple horizontal bar chart with percentage labels."""
     df = df.sort_values('Percentage_of_Total', ascending=True)
     if isinstance(colour_map_or_seq, dict):
@@ -71,21 +60,20 @@ def barh_simple(df, y, title, colour_map_or_seq=None, figsize=(6, 3), save_path=
     plt.tight_layout()
     if save_path:
         plt.savefig(save_path, format="pdf", bbox_inches="tight")
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)
 
-def grouped_bar_plot(df, query, base_colour, title, save_path=None,
+def grouped_bar_plot(regions, base_colour, title, save_path=None,
                      unit_col='Region', group_by=None, levels=None,
-                     intra_bar_step=0.9, gap_lvl1=0.8, gap_lvl2=0.4):
-    """Plot a grouped horizontal bar chart (single- or multi-level grouping)."""
+                     intra_bar_step=0.9, gap_lvl1=0.8, gap_lvl2=0.4, show=False):
+    """Plot a grouped horizontal bar chart (single- or multi-level grouping) of pre-aggregated rows."""
     if levels is None:
         levels = [group_by]
-    sub = df.query(query).copy()
 
-    keys = [unit_col] + levels
-    agg = (sub.groupby(keys, as_index=False)
-              .agg(Total_Energy_keV=('Mean_Energy_[keV]', 'sum'),
-                   Percentage_of_Total=('Percentage_of_Total', 'sum'))
+    # Rows without a label on a grouping level are not drawn
+    keep = (regions[levels] != "").all(axis=1)
+    agg = (regions[keep]
               .sort_values(levels + ['Total_Energy_keV'])
               .reset_index(drop=True))
 
@@ -156,63 +144,108 @@ def grouped_bar_plot(df, query, base_colour, title, save_path=None,
     plt.tight_layout()
     if save_path:
         plt.savefig(save_path, format="pdf", bbox_inches="tight")
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)
 
-# ============================== CALLS ==============================
-df = pd.read_csv(analysis.OUTPUT_CSV)
-df.columns = df.columns.str.strip().str.replace(" ", "_")
-default_cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+# ============================== RENDERING ==============================
+def render(iso, cube, results_dir, show=False):
+    """Draw the four energy-deposition plots of one isotope from the rollup cube."""
+    if not show:
+        plt.switch_backend("Agg")
+    results_dir.mkdir(parents=True, exist_ok=True)
+    default_cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+    iso_label = ISOTOPE_LABELS[iso]
+
+    # PLOT 1
+    group1_sum = rollup.select(cube, iso, 1)
+    barh_simple(
+        group1_sum.rename(columns={'Level1': 'Level_(Level_1)'}),
+        y='Level_(Level_1)',
+        title=f'Energy deposition within phantom, scanner, facility and TLDs - {iso_label}',
+        colour_map_or_seq={
+            'Phantom':  default_cycle[0],
+            'Scanner':  default_cycle[1],
+            'Facility': default_cycle[2],
+            'TLDs':     default_cycle[3],
+        },
+        save_path=results_dir / "plot1_all_grouped.pdf", show=show
+    )
+
+    # PLOT 2
+    phantom_sum = rollup.select(cube, iso, 2, Level1="Phantom")
+    barh_simple(
+        phantom_sum.rename(columns={'Level2': 'Phantom_Component'}),
+        y='Phantom_Component',
+        title=f'Energy deposition within phantom components - {iso_label}',
+        colour_map_or_seq=tint_series(default_cycle[0], len(phantom_sum), start=0.4, end=1.0),
+        save_path=results_dir / "plot2_phantom.pdf", show=show
+    )
+
+    # PLOT 3
+    grouped_bar_plot(
+        rollup.select(cube, iso, 4, Level1="Scanner"),
+        group_by='Level2', unit_col='Region',
+        base_colour=default_cycle[1],
+        title=f'Energy deposition within scanner components - {iso_label}',
+        save_path=results_dir / "plot3_scanner.pdf",
+        intra_bar_step=0.85, gap_lvl1=0.6, gap_lvl2=0.0, show=show
+    )
+
+    # PLOT 4
+    grouped_bar_plot(
+        rollup.select(cube, iso, 4, Level1="Facility"),
+        levels=['Level2', 'Level3'], unit_col='Region',
+        base_colour=default_cycle[2],
+        title=f'Energy deposition within facility components - {iso_label}',
+        save_path=results_dir / "plot4_facility.pdf",
+        intra_bar_step=0.9, gap_lvl1=0.9, gap_lvl2=0.5, show=show
+    )
+    return results_dir
+
+
+def render_all(isotopes, cube, processes=None):
+    """Render every isotope non-interactively, one process per isotope."""
+    processes = min(processes or os.cpu_count() or 1, len(isotopes))
+    dirs = [SCRIPT_DIR / "results" / iso for iso in isotopes]
+    if processes <= 1:
+        return [render(iso, cube, d) for iso, d in zip(isotopes, dirs)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(render, isotopes, [cube] * len(isotopes), dirs))
+
+
+def analyse(iso):
+    """Regenerate the per-region table of one isotope (analysis.run)."""
+    analysis.RUN_FOLDER = RUN_ROOT / iso / "main_study" / "run"
+    results_dir = SCRIPT_DIR / "results" / iso
+    results_dir.mkdir(parents=True, exist_ok=True)
+    analysis.OUTPUT_CSV = results_dir / "energy_by_region.csv"
+    return analysis.run()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Energy deposition rollup and plots.")
+    p.add_argument("--isotopes", nargs="+", choices=list(ISOTOPE_LABELS), default=list(ISOTOPE_LABELS))
+    p.add_argument("--skip-analysis", action="store_true",
+                   help="Use the existing energy_by_region.csv tables instead of re-running analysis.")
+    p.add_argument("--show", action="store_true", help="Show each figure interactively (renders serially).")
+    p.add_argument("--processes", type=int, default=None)
+    args = p.parse_args()
+
+    if not args.skip_analysis:
+        for iso in args.isotopes:
+            analyse(iso)
+
+    cube = rollup.build_rollup(rollup.load_regions(args.isotopes))
+    print(f"Saved: {rollup.save_rollup(cube)}")
+
+    if args.show:
+        out_dirs = [render(iso, cube, SCRIPT_DIR / "results" / iso, show=True) for iso in args.isotopes]
+    else:
+        out_dirs = render_all(args.isotopes, cube, args.processes)
+    for d in out_dirs:
+        print(f"Plots saved in: {d}")
 
-# --- Add mapping for isotope labels ---
-isotope_labels = {
-    "tc99m": r"$^{99\mathrm{m}}$Tc",
-    "lu177": r"$^{177}$Lu",
-}
 
-iso_label = isotope_labels[iso]  # pick the right one based on input
-
-# PLOT 1
-group1_sum = summarise(df, 'Level1')
-barh_simple(
-    group1_sum.rename(columns={'Level1': 'Level_(Level_1)'}),
-    y='Level_(Level_1)',
-    title=f'Energy deposition within phantom, scanner, facility and TLDs - {iso_label}',
-    colour_map_or_seq={
-        'Phantom':  default_cycle[0],
-        'Scanner':  default_cycle[1],
-        'Facility': default_cycle[2],
-        'TLDs':     default_cycle[3],
-    },
-    save_path=results_dir / "plot1_all_grouped.pdf"
-)
-
-# PLOT 2
-phantom_sum = summarise(df.query('Level1 == "Phantom"'), 'Level2')
-barh_simple(
-    phantom_sum.rename(columns={'Level2': 'Phantom_Component'}),
-    y='Phantom_Component',
-    title=f'Energy deposition within phantom components - {iso_label}',
-    colour_map_or_seq=tint_series(default_cycle[0], len(phantom_sum), start=0.4, end=1.0),
-    save_path=results_dir / "plot2_phantom.pdf"
-)
-
-# PLOT 3
-grouped_bar_plot(
-    df, 'Level1 == "Scanner"',
-    group_by='Level2', unit_col='Region',
-    base_colour=default_cycle[1],
-    title=f'Energy deposition within scanner components - {iso_label}',
-    save_path=results_dir / "plot3_scanner.pdf",
-    intra_bar_step=0.85, gap_lvl1=0.6, gap_lvl2=0.0
-)
-
-# PLOT 4
-grouped_bar_plot(
-    df, 'Level1 == "Facility"',
-    levels=['Level2', 'Level3'], unit_col='Region',
-    base_colour=default_cycle[2],
-    title=f'Energy deposition within facility components - {iso_label}',
-    save_path=results_dir / "plot4_facility.pdf",
-    intra_bar_step=0.9, gap_lvl1=0.9, gap_lvl2=0.5
-)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
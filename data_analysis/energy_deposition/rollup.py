@@ -0,0 +1,90 @@
+# rollup.py — precomputed hierarchy aggregates (Level1 → Level2 → Level3 → Region) for all isotopes
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = SCRIPT_DIR / "results"
+ROLLUP_CSV = RESULTS_DIR / "rollup.csv"
+ISOTOPES = ["tc99m", "lu177"]
+
+LEVELS = ["Level1", "Level2", "Level3"]
+KEYS = LEVELS + ["Region"]
+# Depth of an aggregate: number of hierarchy keys it is grouped by (4 = single regions)
+DEPTHS = {1: "Level1", 2: "Level2", 3: "Level3", 4: "Region"}
+
+
+def region_csv(isotope):
+    """Per-region table written by analysis.run() for an isotope."""
+    return RESULTS_DIR / isotope / "energy_by_region.csv"
+
+
+def load_regions(isotopes=ISOTOPES):
+    """All per-region tables stacked, with an isotope column and absolute uncertainties [keV]."""
+    frames = []
+    for iso in isotopes:
+        df = pd.read_csv(region_csv(iso))
+        df.columns = df.columns.str.strip().str.replace(" ", "_")
+        frames.append(df.assign(isotope=iso))
+    df = pd.concat(frames, ignore_index=True)
+    df[LEVELS] = df[LEVELS].fillna("")
+    df["Uncertainty_keV"] = df["Mean_Energy_[keV]"] * df["Percentage_Error"] / 100.0
+    return df
+
+
+def build_rollup(regions):
+    """
+    Sums, percentages of the isotope total and uncertainties (regions independent: added in quadrature)
+    for every prefix of the hierarchy, all isotopes at once. Returns one table indexed by
+    (isotope, depth, Level1, Level2, Level3, Region); rolled-up keys are empty strings.
+    """
+    regions = regions.assign(var=regions["Uncertainty_keV"] ** 2)
+    totals = regions.groupby("isotope")["Mean_Energy_[keV]"].sum()
+
+    parts = []
+    for depth in DEPTHS:
+        keys = KEYS[:depth]
+        agg = (regions.groupby(["isotope"] + keys, sort=False, dropna=False)
+                      .agg(Total_Energy_keV=("Mean_Energy_[keV]", "sum"), var=("var", "sum"))
+                      .reset_index())
+        for k in KEYS[depth:]:
+            agg[k] = ""
+        agg["depth"] = depth
+        parts.append(agg)
+
+    cube = pd.concat(parts, ignore_index=True)
+    total = cube["isotope"].map(totals).to_numpy()
+    cube["Uncertainty_keV"] = np.sqrt(cube.pop("var"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cube["Percentage_of_Total"] = np.where(total > 0, cube["Total_Energy_keV"] / total * 100.0, 0.0)
+        cube["Percentage_Uncertainty"] = np.where(total > 0, cube["Uncertainty_keV"] / total * 100.0, 0.0)
+    return cube.set_index(["isotope", "depth"] + KEYS).sort_index()
+
+
+def save_rollup(cube, path=ROLLUP_CSV):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cube.to_csv(path)
+    return path
+
+
+def load_rollup(path=ROLLUP_CSV):
+    cube = pd.read_csv(path, dtype={k: str for k in KEYS}, keep_default_na=False)
+    return cube.set_index(["isotope", "depth"] + KEYS).sort_index()
+
+
+def select(cube, isotope, depth, **levels):
+    """Aggregates of one isotope at one depth, optionally restricted by level labels (e.g. Level1='Scanner')."""
+    df = cube.xs((isotope, depth), level=("isotope", "depth")).reset_index()
+    for col, val in levels.items():
+        df = df[df[col] == val]
+    return df.reset_index(drop=True)
+
+
+def main():
+    cube = build_rollup(load_regions([iso for iso in ISOTOPES if region_csv(iso).exists()]))
+    print(f"Saved: {save_rollup(cube)} ({len(cube)} aggregates)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# running_stats.py — persistent per-region running mean/variance (Welford) over FLUKA runs
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def empty(region_names):
+    """
+    New accumulator for the given regions: count, mean, M2 per region, the runs folded in and the
+    runs seen without any values (kept so they are not reread).
+    """
+    n = len(region_names)
+    return {
+        "regions": list(region_names),
+        "count": 0,
+        "mean": np.zeros(n),
+        "m2": np.zeros(n),
+        "runs": [],
+        "empty_runs": [],
+    }
+
+
+def update(acc, run_name, values, regions=None):
+    """Fold one run (one value per region, ordered as regions if given) into the accumulator in O(n_regions)."""
+    if run_name in acc["runs"]:
+        return acc
+    if regions is not None and list(regions) != acc["regions"]:
+        raise ValueError(f"{run_name}: regions differ from the accumulator's")
+    x = np.asarray(values, dtype=float)
+    if x.shape != acc["mean"].shape:
+        raise ValueError(f"{run_name}: {x.size} regions, accumulator has {acc['mean'].size}")
+    acc["count"] += 1
+    delta = x - acc["mean"]
+    acc["mean"] += delta / acc["count"]
+    acc["m2"] += delta * (x - acc["mean"])
+    acc["runs"].append(run_name)
+    return acc
+
+
+def merge(a, b):
+    """
+    Combine two accumulators over disjoint runs (e.g. built on different machines), Chan et al.:
+        mean = mean_a + δ n_b / n,   M2 = M2_a + M2_b + δ² n_a n_b / n,   δ = mean_b − mean_a
+    """
+    if a["regions"] != b["regions"]:
+        raise ValueError("Accumulators cover different regions.")
+    shared = set(a["runs"]) & set(b["runs"])
+    if shared:
+        raise ValueError(f"Runs folded into both accumulators: {sorted(shared)}")
+    empty_runs = list(dict.fromkeys(a["empty_runs"] + b["empty_runs"]))
+    if b["count"] == 0:
+        return {**a, "mean": a["mean"].copy(), "m2": a["m2"].copy(), "runs": list(a["runs"]),
+                "empty_runs": empty_runs}
+    if a["count"] == 0:
+        return {**b, "mean": b["mean"].copy(), "m2": b["m2"].copy(), "runs": list(b["runs"]),
+                "empty_runs": empty_runs}
+
+    n = a["count"] + b["count"]
+    delta = b["mean"] - a["mean"]
+    return {
+        "regions": list(a["regions"]),
+        "count": n,
+        "mean": a["mean"] + delta * b["count"] / n,
+        "m2": a["m2"] + b["m2"] + delta ** 2 * a["count"] * b["count"] / n,
+        "runs": a["runs"] + b["runs"],
+        "empty_runs": empty_runs,
+    }
+
+
+def mean_and_error(acc):
+    """Return (mean, percentage_error) with the error of the mean (SEM), as analysis.compute_mean_and_error."""
+    n = acc["count"]
+    mean = acc["mean"].copy()
+    if n > 1:
+        sem = np.sqrt(acc["m2"] / (n - 1)) / np.sqrt(n)
+    else:
+        sem = np.zeros_like(mean)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_err = np.where(mean > 0, (sem / mean) * 100.0, 0.0)
+    return mean, per_err
+
+
+# ---------------- persistence ----------------
+def save(acc, path):
+    """Write the accumulator to a .npz file (atomically)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez(f, regions=np.asarray(acc["regions"], dtype="U"), count=np.int64(acc["count"]),
+                 mean=acc["mean"], m2=acc["m2"], runs=np.asarray(acc["runs"], dtype="U"),
+                 empty_runs=np.asarray(acc["empty_runs"], dtype="U"))
+    os.replace(tmp, path)
+    return path
+
+
+def load(path):
+    """Read an accumulator written by save()."""
+    with np.load(path, allow_pickle=False) as npz:
+        return {
+            "regions": npz["regions"].tolist(),
+            "count": int(npz["count"]),
+            "mean": npz["mean"].astype(float),
+            "m2": npz["m2"].astype(float),
+            "runs": npz["runs"].tolist(),
+            "empty_runs": npz["empty_runs"].tolist() if "empty_runs" in npz.files else [],  # older files
+        }
+
+
+def merge_files(paths, out_path=None):
+    """Merge accumulators saved on several machines; optionally save the result."""
+    paths = list(paths)
+    acc = load(paths[0])
+    for p in paths[1:]:
+        acc = merge(acc, load(p))
+    if out_path is not None:
+        save(acc, out_path)
+    return acc
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python running_stats.py OUT.npz IN1.npz [IN2.npz ...]")
+        sys.exit(1)
+    merged = merge_files(sys.argv[2:], sys.argv[1])
+    print(f"Merged {len(sys.argv) - 2} accumulators: {merged['count']} runs, {len(merged['regions'])} regions "
+          f"-> {sys.argv[1]}")
@@ -4,20 +4,17 @@ from pathlib import Path
 import argparse
 import csv
 import re
+import sys
 from typing import Dict, List, Tuple, Optional
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root (fluka_store)
+import fluka_store
+
 # --- Paths ---
 IN_ROOT  = Path("/Users/weli/Documents/pyCharm/MPH5008/")
 OUT_ROOT = IN_ROOT / "data_analysis" / "energy_spectra" / "datasets"
 
-# --- Patterns & file lists ---
-DET_HEADER_RE = re.compile(r'^\s*#\s*Detector\s*n:\s*\d+\s+(\S+)', re.IGNORECASE)
-FOUR_FLOATS_RE = re.compile(
-    r'^\s*([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)\s+'
-    r'([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)\s+'
-    r'([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)\s+'
-    r'([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)\s*$'
-)
+# --- File lists ---
 MAIN_FILES = ["run/run_27_tab.lis", "run/run_28_tab.lis", "run/run_29_tab.lis"]
 PRE_FILES  = ["run/run_25_tab.lis"]
 
@@ -67,30 +64,19 @@ def safe_name(s: str) -> str:
 
 def parse_lis_multi(fp: Path) -> Dict[str, List[Tuple[float,float,float]]]:
     """
-    Parse a .lis file into multiple datasets keyed by detector name.
+    Parse a .lis file into multiple datasets keyed by detector name
+    (read from the .npz store written by update_data when it is up to date).
     Returns: {detector_name: [(E_mid, value, rel_err), ...], ...}
     """
+    cols = fluka_store.load_or_parse(fp, "tab.lis", "spectra")
     datasets: Dict[str, List[Tuple[float,float,float]]] = {}
-    current: Optional[str] = None
-
-    with fp.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            m_header = DET_HEADER_RE.match(line)
-            if m_header:
-                current = m_header.group(1)
-                datasets.setdefault(current, [])
-                continue
-
-            if current is None:
-                continue
 
-            m_vals = FOUR_FLOATS_RE.match(line)
-            if m_vals:
-                a, b, c, d = (float(m_vals.group(i)) for i in range(1, 5))
-                E_mid = 0.5 * (a + b) * 1e6  # GeV -> keV
-                c = c / 1e6  # per GeV -> per keV
-                rel_err_fraction = d / 100.0  # d is percentage from file
-                datasets[current].append((E_mid, c, rel_err_fraction))
+    for det in dict.fromkeys(cols["detector"].tolist()):  # preserve file order
+        sel = cols["detector"] == det
+        E_mid = 0.5 * (cols["e_low"][sel] + cols["e_high"][sel]) * 1e6  # GeV -> keV
+        value = cols["value"][sel] / 1e6  # per GeV -> per keV
+        rel_err_fraction = cols["rel_err"][sel] / 100.0  # percentage in file
+        datasets[det] = list(zip(E_mid.tolist(), value.tolist(), rel_err_fraction.tolist()))
 
     return datasets
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Fold fluence spectra with fluence-to-dose conversion coefficients (H*(10) and air kerma, ICRP 74).
+
+For spectra sharing an energy grid, dose = Φ @ C with C[i, q] the coefficient of quantity q averaged
+over bin i times its width, and var = (σΦ)² @ C² (bins independent). This gives an independent
+cross-check of the USRBIN DOSE-EQ doses without extra simulation time.
+Coefficients are for photons: electron spectra (detectors ending in 'E') are skipped, and the
+ALL-PART spectra are folded as photons (electrons add < 0.01% of the fluence in these studies).
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import csv
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "dose_calculations"))
+from methods import attenuation
+from activity import DEFAULTS, cumulated_activity_for
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))  # repo root (validate_runs)
+import validate_runs
+
+import rebin
+import usrtrack_decode
+
+# --- Paths ---
+DATA_ROOT = Path(__file__).resolve().parent / "datasets"
+OUT_ROOT  = Path(__file__).resolve().parent / "results"
+
+# Conversion coefficients per unit fluence, E in keV
+QUANTITIES = {
+    "H*(10)": attenuation.h10_per_fluence,    # pSv·cm²
+    "Ka":     attenuation.kerma_per_fluence,  # pGy·cm²
+}
+QUANTITY_UNITS = {"H*(10)": "pSv", "Ka": "pGy"}
+SUBSAMPLES = 16         # points per bin for the bin-averaged coefficients
+ELECTRON_SUFFIX = "E"
+
+
+def coefficient_matrix(edges_keV, quantities=QUANTITIES, n_sub=SUBSAMPLES) -> np.ndarray:
+    """(n_bins, n_quantities) matrix of bin-averaged coefficients times bin widths [keV]."""
+    e = np.asarray(edges_keV, dtype=float)
+    width = np.diff(e)
+    points = e[:-1, None] + width[:, None] * ((np.arange(n_sub) + 0.5) / n_sub)
+    return np.stack([f(points).mean(axis=1) * width for f in quantities.values()], axis=1)
+
+
+def fold(spectra: Dict[str, rebin.Spectrum], quantities=QUANTITIES) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Fold {name: (edges [keV], dΦ/dE [cm^-2 keV^-1 per primary], rel_err [%])}.
+    Returns (names, dose, unc), dose and unc of shape (n_spectra, n_quantities) in the coefficient
+    units per primary; one matrix product per distinct energy grid.
+    """
+    groups: Dict[bytes, List[str]] = {}
+    for name, (edges, _, _) in spectra.items():
+        groups.setdefault(np.asarray(edges, dtype=float).tobytes(), []).append(name)
+
+    names = list(spectra)
+    dose = np.empty((len(names), len(quantities)))
+    unc = np.empty_like(dose)
+    row = {n: i for i, n in enumerate(names)}
+    for group in groups.values():
+        C = coefficient_matrix(spectra[group[0]][0], quantities)
+        phi = np.stack([spectra[n][1] for n in group])
+        sd = phi * np.stack([spectra[n][2] for n in group]) / 100.0
+        idx = [row[n] for n in group]
+        dose[idx] = phi @ C
+        unc[idx] = np.sqrt(sd ** 2 @ C ** 2)
+    return names, dose, unc
+
+
+# ---------- inputs ----------
+def load_datasets(isotope: str, study: str) -> Dict[str, rebin.Spectrum]:
+    """Photon/all-particle spectra extracted by data_extraction.py (CSV: E [keV] mid-points, value per keV, rel_err)."""
+    spectra: Dict[str, rebin.Spectrum] = {}
+    for fp in sorted((DATA_ROOT / isotope / study).glob("*.csv")):
+        if fp.name == "index.csv":
+            continue
+        det = fp.stem.split("__", 1)[-1]
+        if det.endswith(ELECTRON_SUFFIX):
+            continue
+        data = np.loadtxt(fp, delimiter=",", skiprows=1, ndmin=2)
+        spectra[det] = (rebin.edges_from_centres(data[:, 0]), data[:, 1], data[:, 2] * 100.0)
+    return spectra
+
+
+def fold_cycles(files, quantities=QUANTITIES) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Fold every detector of every per-cycle binary file (usrtrack_decode) in one pass, then combine
+    the cycles per detector (primary-weighted mean, error from the spread between cycles).
+    """
+    runs = usrtrack_decode.read_cycles(files)
+    names = [n for n, d in runs[0]["detectors"].items()
+             if d["kind"] == "usrtrack" and not n.endswith(ELECTRON_SUFFIX)]
+    spectra = {}
+    for k, r in enumerate(runs):
+        for n in names:
+            d = r["detectors"][n]
+            spectra[(n, k)] = (d["edges"] * 1e6, d["values"] / 1e6, np.zeros_like(d["values"]))  # GeV -> keV
+    _, dose, _ = fold(spectra, quantities)
+    X = dose.reshape(len(runs), len(names), -1)
+
+    w = np.array([r["primaries"] for r in runs], dtype=float)
+    w /= w.sum()
+    mean = np.einsum("c,cdq->dq", w, X)
+    if len(runs) > 1:
+        var = np.clip(np.einsum("c,cdq->dq", w, X ** 2) - mean ** 2, 0.0, None) / (len(runs) - 1)
+    else:
+        var = np.zeros_like(mean)
+    return names, mean, np.sqrt(var)
+
+
+# ---------- output ----------
+def print_table(names, dose, unc, quantities, A_cum: Optional[float], title: str) -> None:
+    table = Table(title=title)
+    table.add_column("Detector", justify="left")
+    for q in quantities:
+        table.add_column(f"{q}\n[{QUANTITY_UNITS[q]}/primary]", justify="center")
+    if A_cum is not None:
+        table.add_column("H*(10)\n[µSv]", justify="center")
+    h = list(quantities).index("H*(10)") if "H*(10)" in quantities else None
+
+    for i, name in enumerate(names):
+        cells = [f"{dose[i, q]:.4e} ± {unc[i, q]:.1e}" for q in range(len(quantities))]
+        if A_cum is not None and h is not None:
+            cells.append(f"{dose[i, h] * A_cum * 1e-6:.3f} ± {unc[i, h] * A_cum * 1e-6:.3f}")
+        table.add_row(str(name), *cells)
+    Console(width=120, markup=False).print(table)
+
+
+def write_csv(out_path: Path, names, dose, unc, quantities) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["detector"] + [c for q in quantities for c in (f"{q} [{QUANTITY_UNITS[q]}]", f"{q} unc")])
+        for i, name in enumerate(names):
+            w.writerow([name] + [v for q in range(len(quantities)) for v in (dose[i, q], unc[i, q])])
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Fold fluence spectra with fluence-to-H*(10) and air-kerma coefficients.")
+    p.add_argument("--isotope", choices=["tc99m", "lu177"], default="tc99m")
+    p.add_argument("--study", choices=["pre_study", "main_study"], default="main_study")
+    p.add_argument("--cycles", type=Path, default=None,
+                   help="Folder with per-cycle USRTRACK binaries; folds those instead of the extracted datasets.")
+    p.add_argument("--units", type=int, nargs="+", default=list(usrtrack_decode.UNITS),
+                   help="Output units of the per-cycle binaries (with --cycles).")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.cycles:
+        bad = validate_runs.bad_runs(validate_runs.validate(args.cycles, validate_runs.find_inputs(args.cycles)))
+        if bad:
+            print(f"Excluding {len(bad)} cycle(s) that failed validation: {', '.join(sorted(bad))}")
+        names, dose, unc = [], [], []
+        for unit in args.units:
+            files = usrtrack_decode.find_cycles(args.cycles, unit, exclude=bad)
+            if not files:
+                print(f"No per-cycle files for unit {unit} in {args.cycles}")
+                continue
+            n, d, u = fold_cycles(files)
+            names += n
+            dose.append(d)
+            unc.append(u)
+        if not names:
+            return
+        dose, unc = np.concatenate(dose), np.concatenate(unc)
+    else:
+        spectra = load_datasets(args.isotope, args.study)
+        if not spectra:
+            print(f"No extracted spectra in {DATA_ROOT / args.isotope / args.study}")
+            return
+        names, dose, unc = fold(spectra)
+
+    # Study totals only where the cumulated activity of the measurement is known (tc99m studies)
+    A_cum = cumulated_activity_for("methods", args.study) if (
+        args.isotope == "tc99m" and ("methods", args.study) in DEFAULTS) else None
+
+    print_table(names, dose, unc, QUANTITIES, A_cum,
+                f"\nFolded fluence spectra — {args.isotope} {args.study}")
+    out_fp = OUT_ROOT / f"{args.isotope}_{args.study}_folded_doses.csv"
+    write_csv(out_fp, names, dose, unc, QUANTITIES)
+    print(f"Saved: {out_fp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Photopeak / scatter-continuum analysis of the extracted fluence spectra.
+
+Each photopeak window is corrected for the continuum underneath with the triple-energy-window
+(TEW) estimate from two adjacent side windows:
+    primary_k = P_k − W_k / (2 w_s) · (S_low,k + S_high,k)
+and the scatter is everything else, scatter = total − Σ primary_k. Window integrals for all
+detectors and windows come from one cumulative sum of the (value × width) and variance arrays.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import csv
+from typing import Dict, List
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from folding import DATA_ROOT, OUT_ROOT, load_datasets
+
+# Photopeak energies [keV]
+PHOTOPEAKS = {
+    "tc99m": [140.5],
+    "lu177": [112.9, 208.4],
+}
+PEAK_HALF_WIDTH_KEV = 1.0   # photopeak window: E0 ± half width
+SIDE_WIDTH_KEV = 2.0        # each TEW side window
+STUDIES = {"tc99m": ["pre_study", "main_study"], "lu177": ["main_study"]}
+
+
+def window_indices(edges, peaks, half_width=PEAK_HALF_WIDTH_KEV, side=SIDE_WIDTH_KEV) -> np.ndarray:
+    """
+    Bin-edge indices (n_peaks, 4) of [low side start, peak start, peak end, high side end],
+    snapped to the grid. Side windows sit directly below and above the peak window.
+    """
+    e = np.asarray(edges, dtype=float)
+    p = np.asarray(peaks, dtype=float)[:, None]
+    bounds = np.hstack([p - half_width - side, p - half_width, p + half_width, p + half_width + side])
+    return np.clip(np.searchsorted(e, bounds), 0, e.size - 1)
+
+
+def photopeak_stats(edges, values, rel_err, peaks, half_width=PEAK_HALF_WIDTH_KEV, side=SIDE_WIDTH_KEV):
+    """
+    Primary, scatter and scatter-to-primary ratio (each with its 1σ) for spectra of shape
+    (n_detectors, n_bins) on one grid (values per keV, rel_err in %). Returns a dict of arrays.
+    """
+    e = np.asarray(edges, dtype=float)
+    y = np.atleast_2d(values) * np.diff(e)                               # fluence per bin
+    var = (y * np.atleast_2d(rel_err) / 100.0) ** 2
+
+    C = np.pad(np.cumsum(y, axis=1), ((0, 0), (1, 0)))
+    V = np.pad(np.cumsum(var, axis=1), ((0, 0), (1, 0)))
+    idx = window_indices(e, peaks, half_width, side)                     # (K, 4)
+
+    lo, hi = idx[:, :-1], idx[:, 1:]                                     # three windows per peak
+    seg = C[:, hi] - C[:, lo]                                            # (D, K, 3): S_low, P, S_high
+    seg_var = V[:, hi] - V[:, lo]
+    width = e[idx[:, 2]] - e[idx[:, 1]]
+    side_width = 0.5 * ((e[idx[:, 1]] - e[idx[:, 0]]) + (e[idx[:, 3]] - e[idx[:, 2]]))
+    c = np.divide(width, 2 * side_width, out=np.zeros_like(width), where=side_width > 0)  # (K,)
+
+    S, S_var = seg[..., 0] + seg[..., 2], seg_var[..., 0] + seg_var[..., 2]
+    P, P_var = seg[..., 1], seg_var[..., 1]
+    total, total_var = C[:, -1], V[:, -1]
+    rest = total - (S + P).sum(axis=1)                                   # bins outside every window
+    rest_var = total_var - (S_var + P_var).sum(axis=1)
+
+    primary_k = P - c * S
+    primary = primary_k.sum(axis=1)
+    primary_var = (P_var + c ** 2 * S_var).sum(axis=1)
+    scatter = total - primary                                            # = rest + Σ (1 + c) S
+    scatter_var = np.clip(rest_var, 0.0, None) + ((1 + c) ** 2 * S_var).sum(axis=1)
+    cov = -(c * (1 + c) * S_var).sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spr = scatter / primary
+        spr_var = spr ** 2 * (scatter_var / scatter ** 2 + primary_var / primary ** 2
+                              - 2 * cov / (scatter * primary))
+    return {
+        "total": total, "total_unc": np.sqrt(total_var),
+        "primary_k": primary_k, "primary_k_unc": np.sqrt(P_var + c ** 2 * S_var),
+        "primary": primary, "primary_unc": np.sqrt(primary_var),
+        "scatter": scatter, "scatter_unc": np.sqrt(scatter_var),
+        "spr": spr, "spr_unc": np.sqrt(np.clip(spr_var, 0.0, None)),
+    }
+
+
+def analyse(isotope: str, study: str) -> List[dict]:
+    """One summary row per photon / all-particle detector of an isotope and study."""
+    spectra = load_datasets(isotope, study)
+    peaks = PHOTOPEAKS[isotope]
+    groups: Dict[bytes, List[str]] = {}
+    for name, (edges, _, _) in spectra.items():
+        groups.setdefault(edges.tobytes(), []).append(name)
+
+    rows = []
+    for names in groups.values():
+        edges = spectra[names[0]][0]
+        st = photopeak_stats(edges, np.stack([spectra[n][1] for n in names]),
+                             np.stack([spectra[n][2] for n in names]), peaks)
+        for i, name in enumerate(names):
+            row = {"isotope": isotope, "study": study, "detector": name}
+            for k, E0 in enumerate(peaks):
+                row[f"primary_{E0:g}keV"] = st["primary_k"][i, k]
+                row[f"primary_{E0:g}keV_unc"] = st["primary_k_unc"][i, k]
+            for key in ("total", "primary", "scatter", "spr"):
+                row[key], row[f"{key}_unc"] = st[key][i], st[f"{key}_unc"][i]
+            rows.append(row)
+    return rows
+
+
+def print_table(rows: List[dict]) -> None:
+    table = Table(title="\nPhotopeak (TEW) vs scatter continuum")
+    for h in ["Isotope", "Study", "Detector", "Primary\n[cm^-2]", "Scatter\n[cm^-2]", "Scatter/primary"]:
+        table.add_column(h, justify="center")
+    for r in rows:
+        table.add_row(r["isotope"], r["study"], r["detector"],
+                      f"{r['primary']:.3e} ± {r['primary_unc']:.1e}",
+                      f"{r['scatter']:.3e} ± {r['scatter_unc']:.1e}",
+                      f"{r['spr']:.3f} ± {r['spr_unc']:.3f}")
+    Console(width=120, markup=False).print(table)
+
+
+def write_summary(out_path: Path, rows: List[dict]) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fields = list(dict.fromkeys(k for r in rows for k in r))
+    with out_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields, restval="")
+        w.writeheader()
+        w.writerows(rows)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Photopeak and scatter-continuum summary of all extracted spectra.")
+    p.add_argument("--isotopes", nargs="+", choices=list(PHOTOPEAKS), default=list(PHOTOPEAKS))
+    args = p.parse_args()
+
+    rows = []
+    for isotope in args.isotopes:
+        for study in STUDIES[isotope]:
+            if not (DATA_ROOT / isotope / study).is_dir():
+                print(f"No datasets for {isotope} {study}")
+                continue
+            rows += analyse(isotope, study)
+    if not rows:
+        return
+
+    print_table(rows)
+    out_fp = OUT_ROOT / "photopeak_summary.csv"
+    write_summary(out_fp, rows)
+    print(f"Saved: {out_fp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,16 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import LogLocator, LogFormatterMathtext, NullFormatter
 from matplotlib import colors as mcolors
 
+import rebin
+
 plt.rcParams.update({'font.family': 'Trebuchet MS'})
 
 DATA_ROOT  = Path("/Users/weli/Documents/pyCharm/MPH5008/data_analysis/energy_spectra/datasets")
 PLOTS_ROOT = DATA_ROOT.parent / "plots" / "results"
 
+# Target grid for the plotted spectra [keV] (the extracted spectra have 1000 linear bins up to 500 keV)
+REBIN_EDGES = rebin.log_grid(1.0, 500.0, 150)
+
 # ---------- helpers ----------
 def _parse_detector_from_filename(fp: Path) -> str:
     """Extract detector name from filename."""
@@ -102,14 +107,18 @@ def plot_main_study(isotope: str):
         ("airRflu", "E"): ">",   # Air electrons → triangle
     }
 
-    plotted = []
+    # Rebin every selected spectrum onto REBIN_EDGES in one pass (rel_err fraction <-> %)
+    selected = {
+        det_name: (rebin.edges_from_centres(E), y, r * 100.0)
+        for det_name, (E, y, r, fp) in ds.items()
+        if fp.stem.startswith(("run_27_", "run_28_", "run_29_")) and det_name.endswith(("P", "E"))
+    }
+    rebinned = rebin.rebin_all(selected, REBIN_EDGES)
+    E_centres = np.sqrt(REBIN_EDGES[:-1] * REBIN_EDGES[1:])
 
-    for det_name, (E, y, r, fp) in ds.items():
-        if not fp.stem.startswith(("run_27_", "run_28_", "run_29_")):
-            continue
-        if not det_name.endswith(("P", "E")):
-            continue
+    plotted = []
 
+    for det_name, (edges, y, r_pct) in rebinned.items():
         family = det_name[:-1]  # "ptmWflu" or "airRflu"
         kind   = det_name[-1]   # "P" or "E"
 
@@ -125,10 +134,14 @@ def plot_main_study(isotope: str):
         plot_colour = base_colour if kind == "P" else _lighter_colour(base_colour, factor=0.5)
 
         mask = y > 0
-        yerr_abs = np.abs(y) * np.abs(r)
+        yerr_abs = np.abs(y) * np.abs(r_pct) / 100.0
+
+        total, total_err = rebin.integral(edges, y, r_pct)
+        print(f"{friendly_name} — {part_label}: integral fluence {total:.4e} ± {total_err:.1e} "
+              f"({edges[0]:g}–{edges[-1]:g} keV)")
 
         handle = ax.errorbar(
-            E[mask], y[mask], yerr=yerr_abs[mask],
+            E_centres[mask], y[mask], yerr=yerr_abs[mask],
             fmt=marker, ms=5, lw=1.0, ls="-",
             mfc="none", mec=plot_colour, mew=0.5, # hollow markers
             color=plot_colour, ecolor=plot_colour,
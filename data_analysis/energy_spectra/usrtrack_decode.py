@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Decode FLUKA USRTRACK / USRBDX unformatted output (negative output units, e.g. run_01001_fort.27).
+
+Per-cycle files carry values only; files merged by usxsuw also carry a STATISTICS block
+with the relative errors, which are returned in % (as in the _tab.lis).
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "plot_2Dmaps"))
+from usrbin_decode import read_fortran_record
+
+# Scoring units of the main_study input (USRTRACK -27/-28/-29)
+UNITS = {
+    27: "airRflu",   # room air
+    28: "ptmBflu",   # phantom body
+    29: "ptmWflu",   # phantom water
+}
+
+# Run header: title, date, weight, primaries [, primaries / 1e9 [, batches]]
+RUN_HEADER_FORMATS = {struct.calcsize(fmt): fmt for fmt in ("=80s32sfi", "=80s32sfii", "=80s32sfiii")}
+USRTRACK_HEADER = struct.Struct("=i10siiififfif")           # 50 bytes
+USRBDX_HEADER = struct.Struct("=i10siiiifiiiffifffif")      # 78 bytes
+STATISTICS_TAG = b"STATISTICS"
+
+
+def _edges(low, high, n, log):
+    return np.geomspace(low, high, n + 1) if log else np.linspace(low, high, n + 1)
+
+
+def _run_header(rec):
+    fmt = RUN_HEADER_FORMATS.get(len(rec))
+    if fmt is None:
+        raise ValueError(f"Unexpected run header record ({len(rec)} bytes)")
+    fields = struct.unpack(fmt, rec)
+    primaries = fields[3] + (fields[4] * 1_000_000_000 if len(fields) > 4 else 0)
+    return {
+        "title": fields[0].decode("latin1").strip(),
+        "time": fields[1].decode("latin1").strip(),
+        "weight": float(fields[2]),
+        "primaries": int(primaries),
+    }
+
+
+def _usrtrack_detector(rec):
+    nb, name, itype, particle, region, volume, lowneu, elow, ehigh, ne, _ = USRTRACK_HEADER.unpack(rec)
+    return {
+        "kind": "usrtrack",
+        "number": nb, "name": name.decode("latin1").strip(),
+        "particle": particle, "region": region, "volume": float(volume), "lowneu": bool(lowneu),
+        "edges": _edges(elow, ehigh, ne, itype < 0),                 # GeV
+        "shape": (ne,),
+    }
+
+
+def _usrbdx_detector(rec):
+    (nb, name, itype, particle, reg1, reg2, area, twoway, fluence, lowneu,
+     elow, ehigh, ne, _, alow, ahigh, na, _) = USRBDX_HEADER.unpack(rec)
+    return {
+        "kind": "usrbdx",
+        "number": nb, "name": name.decode("latin1").strip(),
+        "particle": particle, "region": (reg1, reg2), "area": float(area),
+        "two_way": bool(twoway), "fluence": bool(fluence), "lowneu": bool(lowneu),
+        "edges": _edges(elow, ehigh, ne, itype < 0),                 # GeV
+        "angle_edges": _edges(alow, ahigh, na, abs(itype) % 10 == 2),        # sr
+        "shape": (na, ne),
+    }
+
+
+DETECTOR_HEADERS = {USRTRACK_HEADER.size: _usrtrack_detector, USRBDX_HEADER.size: _usrbdx_detector}
+
+
+def _read_statistics(f, detectors):
+    """
+    Relative errors from the usxsuw STATISTICS block. Each detector's group starts with its
+    (short) totals record; the first following record with one float per bin holds the errors.
+    """
+    dets = iter(detectors.values())
+    det = next(dets, None)
+    in_group = False
+    while det is not None and (rec := read_fortran_record(f)) is not None:
+        nbytes = 4 * int(np.prod(det["shape"]))
+        if len(rec) != nbytes:
+            in_group = True
+        elif in_group:
+            det["errors"] = np.frombuffer(rec, dtype="<f4").reshape(det["shape"]).astype(float) * 100.0
+            det, in_group = next(dets, None), False
+
+
+def decode_usrxxx(filepath):
+    """
+    Decode one USRTRACK or USRBDX binary file.
+
+    Returns
+    -------
+    dict with the run header (title, time, weight, primaries) and 'detectors':
+    {name: {kind, number, particle, region, edges [GeV], values, errors [%] or None, shape, ...}}.
+    USRTRACK values have shape (ne,), USRBDX values (na, ne); units are those of the _tab.lis.
+    """
+    detectors = {}
+    with open(filepath, "rb") as f:
+        info = _run_header(read_fortran_record(f))
+
+        while (rec := read_fortran_record(f)) is not None:
+            if rec.startswith(STATISTICS_TAG):
+                _read_statistics(f, detectors)
+                break
+            parse = DETECTOR_HEADERS.get(len(rec))
+            if parse is None:
+                raise ValueError(f"{filepath}: unexpected detector header record ({len(rec)} bytes)")
+            det = parse(rec)
+            if det["lowneu"]:
+                read_fortran_record(f)                              # low-energy neutron group structure
+            data = read_fortran_record(f)
+            size = int(np.prod(det["shape"]))
+            det["values"] = np.frombuffer(data, dtype="<f4", count=size).reshape(det["shape"]).astype(float)
+            det["errors"] = None
+            detectors[det["name"]] = det
+
+    info["detectors"] = detectors
+    return info
+
+
+def find_cycles(folder, unit, exclude=()):
+    """
+    Per-cycle binary files of one output unit in folder (e.g. run_01001_fort.27), sorted by name.
+    Cycles whose stem is in exclude (e.g. validate_runs.bad_runs) are left out.
+    """
+    files = sorted(Path(folder).glob(f"*_fort.{abs(int(unit))}"))
+    return [fp for fp in files if fp.name.rsplit("_fort.", 1)[0] not in set(exclude)]
+
+
+def read_cycles(files, workers=None):
+    """Decode several binary files concurrently; results are returned in the order of files."""
+    files = list(files)
+    if len(files) < 2:
+        return [decode_usrxxx(fp) for fp in files]
+    with ThreadPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(files))) as pool:
+        return list(pool.map(decode_usrxxx, files))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        paths = [input("Enter path to USRTRACK/USRBDX binary file: ").strip()]
+    else:
+        paths = sys.argv[1:]
+
+    for fp, run in zip(paths, read_cycles(paths)):
+        print(f"Decoded {fp}: {run['primaries']:,} primaries")
+        for name, det in run["detectors"].items():
+            e = det["edges"]
+            err = "with errors" if det["errors"] is not None else "no errors"
+            print(f"  {det['kind']:8s} {name:10s} {det['shape']} bins, E {e[0]:.3g} → {e[-1]:.3g} GeV, {err}")
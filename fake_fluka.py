@@ -0,0 +1,43 @@
+"""
+Stand-in for rfluka when testing campaigns without FLUKA (scheduler.py --command).
+
+Reads the START primaries and RANDOMIZ seed of the input and writes <stem>001.out with the run
+summary lines that validate_runs.read_summary looks for, as one FLUKA cycle (rfluka -N0 -M1) would.
+    python fake_fluka.py solid992_01.inp [--sleep S] [--fail-seeds 3 7]
+--sleep keeps the cycle running for S seconds (to interrupt a campaign); a cycle whose seed is in
+--fail-seeds writes an .out without summary and exits with 1, as an aborted run.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import campaign
+import fluka_input
+
+
+def main():
+    p = argparse.ArgumentParser(description="Fake one FLUKA cycle of an input.")
+    p.add_argument("input", type=Path)
+    p.add_argument("--sleep", type=float, default=0.0, help="Seconds the cycle takes.")
+    p.add_argument("--fail-seeds", type=int, nargs="*", default=[], help="Seeds whose cycle aborts.")
+    args = p.parse_args()
+
+    model = fluka_input.parse(args.input)
+    seed = int(fluka_input.find(model, "RANDOMIZ")["whats"][campaign.SEED_WHAT - 1] or 0)
+    primaries = int(fluka_input.find(model, "START")["whats"][campaign.PRIMARIES_WHAT - 1] or 0)
+    t0 = time.process_time()
+    time.sleep(args.sleep)
+
+    out = args.input.with_name(f"{args.input.stem}001.out")
+    with out.open("w", encoding="latin-1") as f:
+        f.write(f" Fake FLUKA cycle of {args.input.name}, seed {seed}\n")
+        if seed in args.fail_seeds:
+            f.write(" Run aborted\n")
+            sys.exit(1)
+        f.write(f" Total number of primaries run: {primaries}\n")
+        f.write(f" Total CPU time used to follow all primaries: {time.process_time() - t0 + 1.0:.3f} seconds\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+import re
+import sys
+import time
+from pathlib import Path
+
+# ---- CONFIGURATION ----
+FIELD_WIDTH = 10          # fixed format: name in columns 1-10, WHAT(1..6) in 11-70, SDUM from 71
+N_WHATS = 6
+SDUM_START = 70
+CONTINUATION = "&"        # SDUM of a continuation line (e.g. the second USRTRACK line)
+COMMENT_CHARS = ("*", "!")
+FREE_SPLIT_RE = re.compile(r"[ \t,:;=]+")
+NUMBER_RE = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([EeDd][+-]?\d+)?$")
+
+# Entry kinds, in file order:
+#   card       one card line (continuation lines are separate cards with 'continuation' set)
+#   title      the free-text line after TITLE
+#   geometry   any line between GEOBEGIN and GEOEND (kept verbatim)
+#   directive  preprocessor line (#define, #undef, #if, #ifdef, #ifndef, #elif, #else, #endif, #include, ...)
+#   comment    comment or blank line
+
+
+# ---------------- fields ----------------
+def parse_value(text):
+    """A WHAT field as float, str (names such as 'PHANTOM' or '@LASTREG') or None when blank."""
+    text = text.strip()
+    if not text:
+        return None
+    if NUMBER_RE.match(text):
+        return float(text.replace("D", "E").replace("d", "e"))
+    return text
+
+
+def _compact(number):
+    """'2e+09' -> '2E9', '1e-06' -> '1E-6' (Fortran reads either)."""
+    mantissa, e, exponent = number.upper().partition("E")
+    return f"{mantissa}E{int(exponent)}" if e else mantissa
+
+
+def format_value(value, width=FIELD_WIDTH):
+    """A WHAT field as written by Flair: right-aligned in its column, shortest form that fits."""
+    if value is None:
+        return " " * width
+    if isinstance(value, str):
+        return value.rjust(width)
+    v = float(value)
+    if v.is_integer() and abs(v) < 1e6:
+        return f"{v:.1f}".rjust(width)
+    for digits in range(width - 1, 0, -1):
+        s = _compact(f"{v:.{digits}g}")
+        if len(s) <= width:
+            return s.rjust(width)
+    raise ValueError(f"{value!r} does not fit a {width}-character field")
+
+
+def _fixed_fields(line):
+    body = line.rstrip("\r\n")
+    whats = [parse_value(body[FIELD_WIDTH * (i + 1):FIELD_WIDTH * (i + 2)]) for i in range(N_WHATS)]
+    return body[:FIELD_WIDTH].strip(), whats, body[SDUM_START:].strip()
+
+
+def _free_fields(line):
+    # Comma-separated fields may be empty; otherwise any run of separators splits
+    tokens = [t.strip() for t in line.split(",")] if "," in line else FREE_SPLIT_RE.split(line.strip())
+    name, rest = tokens[0], tokens[1:]
+    whats = [parse_value(t) for t in rest[:N_WHATS]]
+    whats += [None] * (N_WHATS - len(whats))
+    sdum = rest[N_WHATS] if len(rest) > N_WHATS else ""
+    return name, whats, sdum
+
+
+# ---------------- parsing ----------------
+def _not(cond):
+    return cond[1:] if cond.startswith("!") else f"!{cond}"
+
+
+def _negated(level):
+    """Conditions of the next #elif/#else branch: every earlier branch of the block was false."""
+    return level[:-1] + [_not(level[-1])]
+
+
+def _conditions(branch):
+    return tuple(t for level in branch for t in level)
+
+
+def _defined(entries):
+    """Names defined at the end of the input: #define adds a name, #undef removes it again."""
+    names = []
+    for e in entries:
+        if e["kind"] == "directive" and e["directive"] == "define" and e["arg"] not in names:
+            names.append(e["arg"])
+        elif e["kind"] == "directive" and e["directive"] == "undef" and e["arg"] in names:
+            names.remove(e["arg"])
+    return names
+
+
+def parse_text(text):
+    """
+    Parse the text of a FLUKA input into a model:
+        {"entries": [entry, ...], "defines": [name, ...]}
+    Every entry keeps its original line in 'raw' (line ending included); cards also carry
+    'name', 'whats' (6 values), 'sdum', 'continuation', 'free', 'branch' (the preprocessor
+    conditions the line sits under, e.g. ('!solid98', 'solid99') inside '#elif solid99') and
+    'block' (the branch itself, one label per nesting level, e.g. ('solid99',) or ('else',)).
+    """
+    entries = []
+    branch = []
+    block = []
+    free = False
+    in_geometry = False
+    title_next = False
+
+    for raw in text.splitlines(keepends=True):
+        line = raw.rstrip("\r\n")
+        stripped = line.lstrip()
+
+        if stripped.startswith("#"):
+            word, _, arg = stripped[1:].partition(" ")
+            arg = arg.strip()
+            if word in ("if", "ifdef", "ifndef"):
+                cond = f"!{arg}" if word == "ifndef" else arg
+                branch.append([cond])
+                block.append(cond)
+            elif word == "elif" and branch:
+                branch[-1] = _negated(branch[-1]) + [arg]
+                block[-1] = arg
+            elif word == "else" and branch:
+                branch[-1] = _negated(branch[-1])
+                block[-1] = "else"
+            elif word == "endif" and branch:
+                branch.pop()
+                block.pop()
+            entries.append({"kind": "directive", "raw": raw, "directive": word, "arg": arg})
+            continue
+
+        if in_geometry:
+            if line[:FIELD_WIDTH].strip() == "GEOEND":
+                in_geometry = False
+            else:
+                entries.append({"kind": "geometry", "raw": raw, "branch": _conditions(branch)})
+                continue
+
+        if title_next:
+            title_next = False
+            entries.append({"kind": "title", "raw": raw, "text": line})
+            continue
+
+        if not stripped or stripped.startswith(COMMENT_CHARS):
+            entries.append({"kind": "comment", "raw": raw})
+            continue
+
+        name, whats, sdum = _free_fields(line) if free else _fixed_fields(line)
+        entries.append({"kind": "card", "raw": raw, "name": name, "whats": whats, "sdum": sdum,
+                        "continuation": sdum == CONTINUATION, "free": free, "branch": _conditions(branch),
+                        "block": tuple(block)})
+
+        if name == "TITLE":
+            title_next = True
+        elif name == "GEOBEGIN":
+            in_geometry = True
+        elif name == "FREE":
+            free = True
+        elif name == "FIXED":
+            free = False
+        elif name == "GLOBAL" and whats[3] in (1.0, 3.0):
+            free = True
+
+    return {"entries": entries, "defines": _defined(entries)}
+
+
+def parse(path):
+    """Parse a FLUKA .inp file (see parse_text); the path is kept in the model."""
+    path = Path(path)
+    model = parse_text(path.read_bytes().decode("latin-1"))
+    model["path"] = path
+    return model
+
+
+def parse_tree(root, pattern="*.inp"):
+    """{path: model} for every input under root."""
+    return {fp: parse(fp) for fp in sorted(Path(root).rglob(pattern))}
+
+
+# ---------------- writing ----------------
+def format_card(card):
+    """Text of a card line from its fields (fixed or free format as parsed), without line ending."""
+    if card.get("free"):
+        tokens = [card["name"]] + ["" if w is None else w if isinstance(w, str) else _compact(f"{w:.10g}")
+                                   for w in card["whats"]]
+        line = ", ".join(tokens) + (f", {card['sdum']}" if card["sdum"] else "")
+    else:
+        line = card["name"].ljust(FIELD_WIDTH) + "".join(format_value(w) for w in card["whats"]) + card["sdum"]
+    return line.rstrip()
+
+
+def _line_ending(raw):
+    return raw[len(raw.rstrip("\r\n")):] if raw else "\n"
+
+
+def to_text(model):
+    """Text of a model. Untouched entries are written verbatim, so an unmodified model round-trips exactly."""
+    parts = []
+    for e in model["entries"]:
+        if e.get("raw") is not None:
+            parts.append(e["raw"])
+        elif e["kind"] == "card":
+            parts.append(format_card(e) + e.get("eol", "\n"))
+        elif e["kind"] == "title":
+            parts.append(e["text"] + e.get("eol", "\n"))
+        else:
+            raise ValueError(f"{e['kind']} entry without text")
+    return "".join(parts)
+
+
+def write(model, path=None):
+    """Write a model to path (default: the file it was parsed from)."""
+    path = Path(path or model["path"])
+    path.write_bytes(to_text(model).encode("latin-1"))
+    return path
+
+
+# ---------------- queries and edits ----------------
+def cards(model, name=None, sdum=None):
+    """Card entries (optionally of one name and/or SDUM) in file order."""
+    return [e for e in model["entries"] if e["kind"] == "card"
+            and (name is None or e["name"] == name) and (sdum is None or e["sdum"] == sdum)]
+
+
+def find(model, name, sdum=None):
+    """The single card matching name (and SDUM); ValueError when there is none or several."""
+    found = cards(model, name, sdum)
+    if len(found) != 1:
+        raise ValueError(f"{len(found)} {name} cards" + (f" with SDUM {sdum}" if sdum else ""))
+    return found[0]
+
+
+def is_active(entry, defines):
+    """True when every preprocessor condition above the entry holds for the given #define names."""
+    for cond in entry.get("branch", ()):
+        if (cond[1:] in defines) if cond.startswith("!") else (cond not in defines):
+            return False
+    return True
+
+
+def active_cards(model, name=None):
+    """Cards that FLUKA actually reads, given the #define directives of the input."""
+    defines = set(model["defines"])
+    return [c for c in cards(model, name) if is_active(c, defines)]
+
+
+def _touch(entry):
+    if entry.get("raw") is not None:
+        entry["eol"] = _line_ending(entry["raw"])
+        entry["raw"] = None
+
+
+def set_what(card, index, value):
+    """Set WHAT(index) (1-based, as in the FLUKA manual); the line is regenerated on writing."""
+    card["whats"][index - 1] = value
+    _touch(card)
+    return card
+
+
+def set_sdum(card, sdum):
+    card["sdum"] = sdum
+    card["continuation"] = sdum == CONTINUATION
+    _touch(card)
+    return card
+
+
+def set_title(model, text):
+    title = next(e for e in model["entries"] if e["kind"] == "title")
+    title["text"] = text
+    _touch(title)
+    return title
+
+
+def set_defines(model, names):
+    """
+    Switch '#define' directives on or off ('!#define' comments them out) so that exactly names are
+    defined; an '#undef' of one of the names is commented out as well.
+    """
+    names = set(names)
+    for i, e in enumerate(model["entries"]):
+        stripped = (e.get("raw") or "").lstrip()
+        if e["kind"] == "directive" and e["directive"] == "undef" and e["arg"] in names:
+            model["entries"][i] = {"kind": "comment", "raw": f"!#undef {e['arg']}{_line_ending(e['raw'])}"}
+            continue
+        for prefix, kind in (("#define", "directive"), ("!#define", "comment")):
+            if not stripped.startswith(prefix):
+                continue
+            arg = stripped[len(prefix):].strip()
+            want = arg in names
+            if want != (kind == "directive"):
+                eol = _line_ending(e["raw"])
+                text = f"#define {arg}" if want else f"!#define {arg}"
+                model["entries"][i] = ({"kind": "directive", "raw": text + eol, "directive": "define", "arg": arg}
+                                       if want else {"kind": "comment", "raw": text + eol})
+    model["defines"] = _defined(model["entries"])
+    return model
+
+
+def find_body(model, name):
+    """Active geometry body line defining name (name-based input, e.g. 'RPP BBcollim 50.0 53.2 ...')."""
+    defines = set(model["defines"])
+    for e in model["entries"]:
+        if e["kind"] == "geometry" and is_active(e, defines):
+            tokens = e["raw"].split()
+            if len(tokens) > 2 and tokens[1] == name and tokens[0].isalpha() and tokens[0].isupper():
+                return e
+    raise ValueError(f"No geometry body {name}")
+
+
+def body_parameters(body):
+    return [float(t) for t in body["raw"].split()[2:]]
+
+
+def set_body(model, name, index, value):
+    """Set the index-th (1-based) numeric parameter of a body; the line is rewritten on the spot."""
+    body = find_body(model, name)
+    code, _, *params = body["raw"].split()
+    params[index - 1] = _compact(f"{float(value):.10g}")
+    body["raw"] = f"{code} {name.ljust(FIELD_WIDTH)} {' '.join(params)}{_line_ending(body['raw'])}"
+    return body
+
+
+def copy_model(model):
+    """Copy of a model whose entries can be edited without touching the original."""
+    return {**model, "defines": list(model["defines"]),
+            "entries": [{**e, "whats": list(e["whats"])} if "whats" in e else dict(e)
+                        for e in model["entries"]]}
+
+
+# ---------------- diffs ----------------
+def card_keys(model):
+    """
+    {key: card} with key = (name, SDUM of the card it belongs to, preprocessor branch, occurrence
+    within that branch, continuation index). Continuation lines are keyed by the card they continue,
+    so the keys are stable between variants, also when a variant adds or drops an #elif branch.
+    """
+    keyed = {}
+    seen = {}
+    parent = None
+    n_cont = 0
+    for c in cards(model):
+        if c["continuation"] and parent is not None:
+            n_cont += 1
+            keyed[parent + (n_cont,)] = c
+            continue
+        base = (c["name"], c["sdum"], c.get("block", ()))
+        seen[base] = seen.get(base, 0) + 1
+        parent = base + (seen[base],)
+        n_cont = 0
+        keyed[parent + (0,)] = c
+    return keyed
+
+
+def diff(a, b):
+    """
+    Structural differences between two models, as a list of (what, key, value_a, value_b):
+    'defines' (the #define sets), 'title', 'changed' (WHAT fields differ), 'removed' and 'added' cards.
+    Geometry differences are reported once as 'geometry' with the number of differing lines.
+    """
+    out = []
+    if set(a["defines"]) != set(b["defines"]):
+        out.append(("defines", None, sorted(a["defines"]), sorted(b["defines"])))
+    ta = [e["text"] for e in a["entries"] if e["kind"] == "title"]
+    tb = [e["text"] for e in b["entries"] if e["kind"] == "title"]
+    if ta != tb:
+        out.append(("title", None, ta, tb))
+
+    ka, kb = card_keys(a), card_keys(b)
+    for key, ca in ka.items():
+        cb = kb.get(key)
+        if cb is None:
+            out.append(("removed", key, ca["whats"], None))
+        elif ca["whats"] != cb["whats"]:
+            out.append(("changed", key, ca["whats"], cb["whats"]))
+    out += [("added", key, None, cb["whats"]) for key, cb in kb.items() if key not in ka]
+
+    ga = [e["raw"].rstrip() for e in a["entries"] if e["kind"] == "geometry"]
+    gb = [e["raw"].rstrip() for e in b["entries"] if e["kind"] == "geometry"]
+    if ga != gb:
+        n = sum(x != y for x, y in zip(ga, gb)) + abs(len(ga) - len(gb))
+        out.append(("geometry", None, len(ga), n))
+    return out
+
+
+def print_diff(changes):
+    for what, key, va, vb in changes:
+        label = f"{key[0]} {key[1]}".strip() + (f" [{', '.join(key[2])}]" if key[2] else "") + (
+            f" #{key[3]}" if key[3] > 1 else "") + (f" &{key[4]}" if key[4] else "") if key else ""
+        if what == "geometry":
+            print(f"geometry: {vb} of {va} lines differ")
+        elif what in ("defines", "title"):
+            print(f"{what}: {va} -> {vb}")
+        else:
+            print(f"{what:8s} {label:28s} {va} -> {vb}")
+
+
+# ---------------- main ----------------
+def main():
+    args = sys.argv[1:]
+    if len(args) == 2 and all(Path(a).is_file() for a in args):
+        changes = diff(parse(args[0]), parse(args[1]))
+        print_diff(changes)
+        print(f"{len(changes)} difference(s)")
+        return
+    if len(args) == 1 and Path(args[0]).is_dir():
+        t0 = time.perf_counter()
+        models = parse_tree(args[0])
+        elapsed = time.perf_counter() - t0
+        bad = [fp for fp, m in models.items() if to_text(m).encode("latin-1") != fp.read_bytes()]
+        n_cards = sum(len(cards(m)) for m in models.values())
+        print(f"Parsed {len(models)} inputs ({n_cards} cards) in {elapsed:.3f} s; "
+              f"{len(models) - len(bad)} round-trip byte-for-byte")
+        for fp in bad:
+            print(f"  round-trip differs: {fp}")
+        return
+    print("Usage: python fluka_input.py A.inp B.inp   (structural diff)\n"
+          "       python fluka_input.py DIR           (parse and round-trip every input under DIR)")
+
+
+if __name__ == "__main__":
+    main()
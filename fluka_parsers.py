@@ -0,0 +1,172 @@
+import re
+from pathlib import Path
+
+import numpy as np
+
+# ---- PATTERNS ----
+# _tab.lis (USRTRACK/USRBDX): '# Detector n:  1  airRfluP ...' followed by 4-column rows
+DET_HEADER_RE = re.compile(r'^\s*#\s*Detector\s*n:\s*\d+\s+(\S+).*$', re.IGNORECASE | re.MULTILINE)
+COMMENT_LINE_RE = re.compile(r'^\s*#.*$', re.MULTILINE)
+FIRST_ROW_RE = re.compile(r'^[ \t]*\S.*$', re.MULTILINE)
+# .bnn.lis (USRBIN, usbrea output): one header per detector, then value and percentage-error sections
+BNN_HEADER_RE = re.compile(r'^\s*(.*?)\s*binning\s+n\.\s*\d+\s+"\s*([^"]*?)\s*"', re.MULTILINE)
+BNN_SECTION_RE = re.compile(r'^\s*(Data|Percentage errors) follow.*$', re.MULTILINE)
+BNN_AXIS_RE = re.compile(r'([XYZR])\s+coordinate:\s*from\s+(\S+)\s+to\s+(\S+)\s+cm,\s+(\d+)\s+bins', re.IGNORECASE)
+BNN_REGIONS_RE = re.compile(r'from\s+(\d+)\s+to\s+(\d+)\s+step\s+(\d+)', re.IGNORECASE)
+BNN_HEAD_BYTES = 4096     # the first detector header is always within the first lines
+# .out EM-ENRGY table: 7 tokens per row, region name in column 2, energy (GeV) last
+EM_ENERGY_TOKENS = 7
+EM_ENERGY_SKIP = 3         # lines between the EM-ENRGY header and the first data row
+
+
+def _numeric_block(text):
+    """Rows of one detector block (comment lines dropped) as a 2-D float array, via one bulk conversion."""
+    if "#" in text:
+        text = COMMENT_LINE_RE.sub("", text)
+    m = FIRST_ROW_RE.search(text)
+    n_cols = len(m.group(0).split()) if m else 0
+    if n_cols == 0:
+        return np.empty((0, 4))
+    rows = [line for line in text.splitlines() if line.strip()]
+    if any(len(line.split()) != n_cols for line in rows):
+        # Rows with a different column count are skipped, as the line-by-line parser did
+        rows = [line for line in rows if len(line.split()) == n_cols]
+        text = "\n".join(rows)
+    arr = np.fromstring(text, sep=" ")
+    if arr.size != len(rows) * n_cols:
+        raise ValueError(f"{arr.size} numbers in {len(rows)} rows of {n_cols} columns (non-numeric field?)")
+    return arr.reshape(-1, n_cols)
+
+
+def parse_tab_lis(file_path):
+    """
+    Parse a _tab.lis file into per-detector arrays.
+    Detector blocks are located by their '# Detector n:' headers and each block is converted in one pass.
+    Returns {detector_name: (e_low [GeV], e_high [GeV], value [GeV^-1], rel_err [%])};
+    rel_err is zero for 3-column blocks.
+    """
+    content = Path(file_path).read_text(encoding="utf-8", errors="ignore")
+    headers = list(DET_HEADER_RE.finditer(content))
+
+    datasets = {}
+    for i, h in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(content)
+        try:
+            arr = _numeric_block(content[h.end():end])
+        except ValueError as exc:
+            raise ValueError(f"{file_path}: detector {h.group(1)}: {exc}") from None
+        if arr.shape[1] < 4:
+            arr = np.column_stack([arr, np.zeros((arr.shape[0], 4 - arr.shape[1]))])
+        name = h.group(1)
+        if name in datasets:  # repeated detector name: append, as the line-by-line parser did
+            arr = np.vstack([np.column_stack(datasets[name]), arr[:, :4]])
+        datasets[name] = tuple(arr[:, i] for i in range(4))
+    return datasets
+
+
+_bnn_cache = {}  # resolved path -> ((mtime_ns, size), parsed detectors)
+
+
+def _numbers(text):
+    """Convert a block of whitespace-separated numbers in one pass; stray text lines are dropped first."""
+    if re.search(r'[A-DF-Za-df-z]', text):
+        text = "\n".join(line for line in text.splitlines()
+                         if line.strip()[:1] in tuple("+-.0123456789") and not re.search(r'[A-DF-Za-df-z]', line))
+    return np.fromstring(text, sep=" ") if text.strip() else np.empty(0)
+
+
+def _bnn_header_info(header_text):
+    """Mesh shape (Cartesian/cylindrical binnings) or region numbers (region binnings) from a header block."""
+    axes = BNN_AXIS_RE.findall(header_text)
+    shape = tuple(int(n) for _, _, _, n in axes) or None
+    m = BNN_REGIONS_RE.search(header_text)
+    regions = np.arange(int(m.group(1)), int(m.group(2)) + 1, int(m.group(3))) if m and not axes else None
+    return shape, regions
+
+
+def parse_bnn_lis(file_path):
+    """
+    Parse a .bnn.lis file (USRBIN output converted by usbrea) into per-detector arrays:
+        {detector: {"kind": "Region"|"Cartesian"|..., "values": (n,), "errors": (n,) [%],
+                    "shape": (nx, ny, nz) or None, "regions": (n,) or None}}
+    Values are in file order (first index fastest). Sections are located by their headers and each
+    numeric block is converted in a single pass, so large Cartesian dumps avoid per-number regexes.
+    Results are cached per file and reused while its mtime and size are unchanged.
+    """
+    path = Path(file_path).resolve()
+    st = path.stat()
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _bnn_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    content = path.read_text(errors="ignore")
+    headers = list(BNN_HEADER_RE.finditer(content))
+    sections = list(BNN_SECTION_RE.finditer(content))
+    bounds = sorted([m.start() for m in headers] + [m.start() for m in sections]) + [len(content)]
+
+    detectors = {}
+    for i, h in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(content)
+        own = [m for m in sections if h.end() <= m.start() < end]
+        first_section = own[0].start() if own else end
+        shape, regions = _bnn_header_info(content[h.end():first_section])
+
+        blocks = {}
+        for m in own:
+            stop = next(b for b in bounds if b > m.start())
+            blocks[m.group(1)] = _numbers(content[m.end():stop])
+        values = blocks.get("Data", np.empty(0))
+        # Stray numeric lines after a block (e.g. a page-feed '1') would otherwise extend the errors
+        errors = blocks.get("Percentage errors", np.zeros_like(values))[:values.size]
+        if errors.size != values.size:
+            raise ValueError(f"{path}: detector {h.group(2)} has {values.size} values but {errors.size} errors")
+        detectors[h.group(2)] = {"kind": h.group(1).strip(" *"), "values": values, "errors": errors,
+                                 "shape": shape, "regions": regions}
+
+    _bnn_cache[path] = (key, detectors)
+    return detectors
+
+
+def bnn_lis_detectors(file_path):
+    """Detector names of a .bnn.lis file, read from its first lines only (no full parse)."""
+    with Path(file_path).open("r", encoding="utf-8", errors="ignore") as f:
+        head = f.read(BNN_HEAD_BYTES)
+    return [m.group(2) for m in BNN_HEADER_RE.finditer(head)]
+
+
+def find_bnn_lis(folder, detector):
+    """Return the .bnn.lis file in folder that holds the given detector (first match in name order)."""
+    for fp in sorted(Path(folder).glob("*.bnn.lis")):
+        if detector in bnn_lis_detectors(fp):
+            return fp
+    raise FileNotFoundError(f"No .bnn.lis with detector '{detector}' in {folder}")
+
+
+def is_em_energy_header(line):
+    """True for the header line of the EM-ENRGY table."""
+    return ("EM-ENRGY" in line) and ("Density" in line) and ("Region" in line)
+
+
+def iter_em_energy(lines, tokens_per_row=EM_ENERGY_TOKENS):
+    """
+    Yield (region, energy [GeV]) from any iterable of .out lines (e.g. an open file).
+    Consumes lines only up to the end of the EM-ENRGY table, so the rest of the file is never read.
+    """
+    lines = iter(lines)
+    if not any(is_em_energy_header(line) for line in lines):
+        return
+    for _ in range(EM_ENERGY_SKIP):
+        next(lines, None)
+    for line in lines:
+        parts = line.split()
+        if len(parts) != tokens_per_row:
+            return
+        yield parts[1], float(parts[-1].replace("D", "E"))
+
+
+def parse_em_energy(file_path):
+    """Extract per-region EM-ENRGY (GeV) from one .out file, streaming line by line."""
+    with open(file_path, "r", errors="ignore") as f:
+        rows = list(iter_em_energy(f))
+    return [r[0] for r in rows], [r[1] for r in rows]
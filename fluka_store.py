@@ -0,0 +1,158 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+import fluka_parsers
+from run_times import parse_out
+
+# ---- CONFIGURATION ----
+STORE_SUFFIX   = ".npz"   # Store sits next to its source: run_27_tab.lis -> run_27_tab.lis.npz
+SCHEMA_VERSION = 2        # Bump whenever a schema or parser changes so stale stores are rebuilt
+META_PREFIX    = "__meta__"
+
+# Columns (and dtypes) of every table; units are those of the FLUKA output
+SCHEMAS = {
+    "spectra": {            # _tab.lis: one row per energy bin per detector
+        "detector": "U",
+        "e_low":    "f8",   # GeV
+        "e_high":   "f8",   # GeV
+        "value":    "f8",   # per GeV per primary
+        "rel_err":  "f8",   # %
+    },
+    "region_dose": {        # .bnn.lis: one row per bin per detector (file order)
+        "detector": "U",
+        "bin":      "i4",
+        "value":    "f8",
+        "rel_err":  "f8",   # %
+    },
+    "em_energy": {          # .out EM-ENRGY table: one row per region
+        "region":   "U",
+        "energy":   "f8",   # GeV
+    },
+    "run_stats": {          # .out summary: one row per run
+        "cpu_seconds": "f8",
+        "primaries":   "i8",
+    },
+}
+
+# Tables produced by each artefact type (as classified by update_data.should_take)
+ARTEFACT_TABLES = {
+    "tab.lis": ("spectra",),
+    "bnn.lis": ("region_dose",),
+    "out":     ("em_energy", "run_stats"),
+}
+
+
+# ---------------- parsing into typed tables ----------------
+def _spectra_table(src):
+    datasets = fluka_parsers.parse_tab_lis(src)
+    names = [name for name, cols in datasets.items() for _ in range(cols[0].size)]
+    cols = [np.concatenate([d[i] for d in datasets.values()]) if datasets else np.empty(0)
+            for i in range(4)]
+    return {"detector": names, "e_low": cols[0], "e_high": cols[1], "value": cols[2], "rel_err": cols[3]}
+
+
+def _region_dose_table(src):
+    detectors = fluka_parsers.parse_bnn_lis(src)
+    names = [name for name, d in detectors.items() for _ in range(d["values"].size)]
+    cols = {"bin": [np.arange(d["values"].size) for d in detectors.values()],
+            "value": [d["values"] for d in detectors.values()],
+            "rel_err": [d["errors"] for d in detectors.values()]}
+    return {"detector": names, **{c: np.concatenate(v) if v else np.empty(0) for c, v in cols.items()}}
+
+
+def _em_energy_table(src):
+    names, energy = fluka_parsers.parse_em_energy(src)
+    return {"region": names, "energy": energy}
+
+
+def _run_stats_table(src):
+    cpu_seconds, primaries = parse_out(Path(src))
+    return {"cpu_seconds": [cpu_seconds], "primaries": [primaries]}
+
+
+TABLE_PARSERS = {
+    "spectra":     _spectra_table,
+    "region_dose": _region_dose_table,
+    "em_energy":   _em_energy_table,
+    "run_stats":   _run_stats_table,
+}
+
+
+def _typed(table, columns):
+    """Cast raw parser output to the schema dtypes."""
+    schema = SCHEMAS[table]
+    return {c: np.asarray(columns[c], dtype=schema[c]) for c in schema}
+
+
+def parse_tables(src, file_type, tables=None):
+    """Parse a FLUKA text output into {table: {column: array}} following SCHEMAS."""
+    tables = tables or ARTEFACT_TABLES[file_type]
+    return {t: _typed(t, TABLE_PARSERS[t](src)) for t in tables}
+
+
+# ---------------- store I/O ----------------
+def store_path(src):
+    """Return the .npz store path for a source file."""
+    src = Path(src)
+    return src.with_name(src.name + STORE_SUFFIX)
+
+
+def _mtime_ns(path):
+    st = path.stat()
+    return getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))
+
+
+def is_fresh(src):
+    """True if the store exists, was built from the current source and uses the current schema."""
+    src = Path(src)
+    dst = store_path(src)
+    if not dst.exists():
+        return False
+    with np.load(dst, allow_pickle=False) as npz:
+        try:
+            return (int(npz[f"{META_PREFIX}.source_mtime_ns"]) == _mtime_ns(src)
+                    and int(npz[f"{META_PREFIX}.schema_version"]) == SCHEMA_VERSION)
+        except KeyError:
+            return False
+
+
+def ingest(src, file_type):
+    """
+    Parse one source file and write all its tables into a compressed .npz store.
+    Each column is stored as its own array, so readers only decompress what they ask for.
+    Returns the number of rows written per table.
+    """
+    src = Path(src)
+    tables = parse_tables(src, file_type)
+
+    arrays = {f"{t}.{c}": arr for t, cols in tables.items() for c, arr in cols.items()}
+    arrays[f"{META_PREFIX}.source_mtime_ns"] = np.int64(_mtime_ns(src))
+    arrays[f"{META_PREFIX}.schema_version"] = np.int32(SCHEMA_VERSION)
+
+    dst = store_path(src)
+    tmp = dst.with_name(dst.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, dst)
+
+    return {t: len(next(iter(cols.values()))) for t, cols in tables.items()}
+
+
+def load_table(src, table, columns=None):
+    """Load the requested columns (default: all) of one table from the store of src."""
+    columns = columns or list(SCHEMAS[table])
+    with np.load(store_path(src), allow_pickle=False) as npz:
+        return {c: npz[f"{table}.{c}"] for c in columns}
+
+
+def load_or_parse(src, file_type, table, columns=None):
+    """
+    Load a table from the store if it is fresh; otherwise parse the text file directly.
+    This is the entry point for analysis scripts.
+    """
+    if is_fresh(src):
+        return load_table(src, table, columns)
+    cols = parse_tables(src, file_type, tables=(table,))[table]
+    return {c: cols[c] for c in (columns or cols)}
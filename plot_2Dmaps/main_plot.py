@@ -181,9 +181,6 @@ def main(bnn_file, dat_files, out_dir="plots", width=20):
         slice_vals, extent, (xlabel, ylabel) = average_projection(
             values, x_edges, y_edges, z_edges, plane, coord, width, run_type
         )
-        slice_errs, _, _ = average_projection(
-            errors, x_edges, y_edges, z_edges, plane, coord, width, run_type
-        )
 
         # ----- Values plot -----
         data_vals = np.where(slice_vals > 0, slice_vals, np.nan) * factor
@@ -236,7 +233,14 @@ def main(bnn_file, dat_files, out_dir="plots", width=20):
         fig.savefig(os.path.join(out_values, out_name), dpi=600, bbox_inches="tight")
         plt.close(fig)
 
+        if errors is None:  # per-cycle file: no statistics block, so no error map
+            print(f"Saved values -> {os.path.join(out_values, out_name)}")
+            continue
+
         # ----- Errors plot -----
+        slice_errs, _, _ = average_projection(
+            errors, x_edges, y_edges, z_edges, plane, coord, width, run_type
+        )
         data_errs = slice_errs * 100
         data_errs[data_errs <= 0] = np.nan
         bounds = np.logspace(-2, 2, 21)
@@ -27,8 +27,9 @@ def decode_usrbin(filepath):
         Bin edges along z (length nz+1)
     values : np.ndarray
         3D array (nx, ny, nz) with scored values (e.g. GeV/cm^3 per primary)
-    errors : np.ndarray
+    errors : np.ndarray or None
         3D array (nx, ny, nz) with relative 1-sigma errors
+        (None for per-cycle files, which carry no statistics block)
     """
 
     with open(filepath, "rb") as f:
@@ -60,8 +61,11 @@ def decode_usrbin(filepath):
 
         # Record 5: errors
         rec5 = read_fortran_record(f)
-        errors = np.frombuffer(rec5, dtype=np.float32, count=nx * ny * nz)
-        errors = errors.reshape((nz, ny, nx)).transpose(2, 1, 0)
+        if rec5:
+            errors = np.frombuffer(rec5, dtype=np.float32, count=nx * ny * nz)
+            errors = errors.reshape((nz, ny, nx)).transpose(2, 1, 0)
+        else:
+            errors = None
 
     # Build bin edges
     x_edges = np.linspace(xlow, xhigh, nx + 1)
@@ -0,0 +1,244 @@
+"""
+Run a campaign (campaign.py manifest) on the local machine.
+
+Every manifest row is one FLUKA cycle, started as a subprocess in its input folder on a pool with
+one worker per available core (FLUKA runs single-threaded). A cycle is done when the command exits
+with 0 and its .out file carries the run summary with the requested primaries (validate_runs);
+otherwise its outputs are moved to failed/attempt_N/ and it is retried with a fresh RANDOMIZ seed.
+Wall time, CPU time, primaries, seeds and attempts are kept in a SQLite job database next to the
+manifest, so an interrupted campaign resumes where it stopped. When all cycles of a variant are
+done its outputs are validated (validate_runs report) and the optional --on-complete command is run.
+
+The command is a template, so any stand-in executable can replace rfluka, e.g. fake_fluka.py
+(the command runs in the input folder, hence the absolute path):
+    python scheduler.py fluka/tc99m/LEHRS/solid --command "python $PWD/fake_fluka.py {input}"
+A retried cycle's new seed is written to its input and to its manifest row.
+"""
+import argparse
+import os
+import shlex
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import campaign
+import fluka_input
+import validate_runs
+
+# ---- CONFIGURATION ----
+DB_NAME = "jobs.sqlite"
+COMMAND = "rfluka -N0 -M1 {stem}"     # FLUKA: one cycle -> <stem>001.out, <stem>001_fort.NN
+MAX_RETRIES = 2
+FAILED_DIR = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    stem TEXT PRIMARY KEY, variant TEXT, input TEXT, seed INTEGER, requested INTEGER,
+    status TEXT, attempts INTEGER DEFAULT 0, returncode INTEGER,
+    wall_seconds REAL, cpu_seconds REAL, primaries INTEGER, started REAL, finished REAL);
+CREATE TABLE IF NOT EXISTS attempts (
+    stem TEXT, attempt INTEGER, seed INTEGER, returncode INTEGER, wall_seconds REAL,
+    cpu_seconds REAL, primaries INTEGER, ok INTEGER, started REAL);
+CREATE TABLE IF NOT EXISTS studies (
+    variant TEXT PRIMARY KEY, completed REAL, rejected INTEGER, hook_returncode INTEGER);
+"""
+
+
+def available_cores():
+    """Cores this process may run on (affinity-aware where the platform supports it)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# ---------------- job database ----------------
+_DB_LOCK = threading.Lock()     # one connection shared by the worker threads
+_MANIFEST_LOCK = threading.Lock()
+
+
+def open_db(path):
+    con = sqlite3.connect(str(path), check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    with con:
+        con.executescript(SCHEMA)
+    return con
+
+
+def db_execute(con, sql, args=()):
+    with _DB_LOCK, con:
+        return con.execute(sql, args).fetchall()
+
+
+def register(con, rows, out_dir):
+    """Add manifest rows not yet known; cycles left 'running' by an interrupted session are reset."""
+    for r in rows:
+        inp = Path(out_dir) / r["input"]
+        db_execute(con, "INSERT OR IGNORE INTO jobs (stem, variant, input, seed, requested, status) "
+                        "VALUES (?, ?, ?, ?, ?, 'pending')",
+                   (r["stem"], r["variant"], str(inp), int(r["seed"]), validate_runs.requested_primaries(inp)))
+    db_execute(con, "UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+
+
+def allocate_seed(con, stem):
+    """Give a cycle a seed used by no cycle or attempt of the campaign so far."""
+    with _DB_LOCK, con:
+        (top,) = con.execute("SELECT MAX(m) FROM (SELECT MAX(seed) AS m FROM jobs "
+                             "UNION ALL SELECT MAX(seed) FROM attempts)").fetchone()
+        seed = int(top or 0) + 1
+        con.execute("UPDATE jobs SET seed = ? WHERE stem = ?", (seed, stem))
+    return seed
+
+
+def jobs(con, status=None):
+    if status is None:
+        return db_execute(con, "SELECT * FROM jobs ORDER BY stem")
+    return db_execute(con, "SELECT * FROM jobs WHERE status = ? ORDER BY stem", (status,))
+
+
+# ---------------- one cycle ----------------
+def _outputs(folder, stem):
+    """Files written by a cycle of this input (<stem>001.out, <stem>001_fort.21, ...)."""
+    return [fp for fp in folder.glob(f"{stem}[0-9][0-9][0-9]*") if fp.is_file()]
+
+
+def _set_seed(inp, seed, manifest=None):
+    """Write a new seed into a cycle's input and, when given, into its row of the manifest."""
+    model = fluka_input.parse(inp)
+    fluka_input.set_what(fluka_input.find(model, "RANDOMIZ"), campaign.SEED_WHAT, float(seed))
+    fluka_input.write(model)
+    if manifest is None:
+        return
+    with _MANIFEST_LOCK:
+        rows = campaign.read_manifest(manifest)
+        for r in rows:
+            if r["stem"] == Path(inp).stem:
+                r["seed"] = seed
+        campaign.write_manifest(rows, Path(manifest).parent)
+
+
+def run_cycle(job, command, con, max_retries=MAX_RETRIES, manifest=None):
+    """Run one cycle, retrying with new seeds; returns the final status ('done' or 'failed')."""
+    inp = Path(job["input"])
+    folder, stem = inp.parent, inp.stem
+    seed, attempt = job["seed"], job["attempts"]
+
+    while True:
+        attempt += 1
+        args = [a.format(stem=stem, input=inp.name, folder=str(folder), seed=seed) for a in shlex.split(command)]
+        started = time.time()
+        db_execute(con, "UPDATE jobs SET status = 'running', attempts = ?, seed = ?, started = ? WHERE stem = ?",
+                   (attempt, seed, started, stem))
+        with open(folder / f"{stem}.log", "ab") as log:
+            try:
+                returncode = subprocess.run(args, cwd=folder, stdout=log, stderr=subprocess.STDOUT).returncode
+            except OSError as exc:          # executable missing or not runnable
+                log.write(f"{exc}\n".encode())
+                returncode = -1
+        wall = time.time() - started
+
+        outs = sorted(folder.glob(f"{stem}[0-9][0-9][0-9].out"))
+        cpu, primaries = validate_runs.read_summary(outs[-1]) if outs else (None, None)
+        ok = (returncode == 0 and cpu is not None and primaries is not None
+              and (job["requested"] is None or primaries == job["requested"]))
+        db_execute(con, "INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                   (stem, attempt, seed, returncode, wall, cpu, primaries, int(ok), started))
+        if ok:
+            db_execute(con, "UPDATE jobs SET status = 'done', returncode = ?, wall_seconds = ?, cpu_seconds = ?, "
+                       "primaries = ?, finished = ? WHERE stem = ?",
+                       (returncode, wall, cpu, primaries, time.time(), stem))
+            return "done"
+
+        # Keep the failed outputs out of the merges, but do not delete them
+        dest = folder / FAILED_DIR / f"attempt_{attempt}"
+        for fp in _outputs(folder, stem):
+            dest.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(fp), str(dest / fp.name))
+        if attempt > max_retries:
+            db_execute(con, "UPDATE jobs SET status = 'failed', returncode = ?, wall_seconds = ?, finished = ? "
+                       "WHERE stem = ?", (returncode, wall, time.time(), stem))
+            return "failed"
+        seed = allocate_seed(con, stem)
+        _set_seed(inp, seed, manifest)
+
+
+# ---------------- studies ----------------
+def complete_study(con, variant, folder, on_complete=None):
+    """Validate a finished variant and run the downstream hook (e.g. merging) once."""
+    report = validate_runs.validate(folder, validate_runs.find_inputs(folder), usrbin_units={})
+    rejected = len(validate_runs.bad_runs(report))
+    if report:
+        validate_runs.write_report(report, folder / validate_runs.REPORT_NAME)
+    hook_rc = None
+    if on_complete:
+        args = [a.format(variant=variant, folder=str(folder)) for a in shlex.split(on_complete)]
+        try:
+            hook_rc = subprocess.run(args, cwd=folder).returncode
+        except OSError as exc:          # hook executable missing or not runnable
+            print(f"  {variant}: --on-complete failed: {exc}")
+            hook_rc = -1
+    db_execute(con, "INSERT OR REPLACE INTO studies VALUES (?, ?, ?, ?)", (variant, time.time(), rejected, hook_rc))
+    return rejected, hook_rc
+
+
+def schedule(out_dir, command=COMMAND, workers=None, max_retries=MAX_RETRIES, on_complete=None):
+    """Run every pending cycle of the campaign in out_dir; returns {status: count}."""
+    out_dir = Path(out_dir)
+    con = open_db(out_dir / DB_NAME)
+    manifest = out_dir / campaign.MANIFEST_NAME
+    register(con, campaign.read_manifest(manifest), out_dir)
+
+    pending = jobs(con, "pending")
+    remaining = {}
+    for job in db_execute(con, "SELECT variant, COUNT(*) AS n FROM jobs WHERE status != 'done' GROUP BY variant"):
+        remaining[job["variant"]] = job["n"]
+    done_studies = {r["variant"] for r in db_execute(con, "SELECT variant FROM studies")}
+    folders = {j["variant"]: Path(j["input"]).parent for j in jobs(con)}
+
+    # Variants finished in an earlier session whose study step never ran
+    for variant in sorted(set(folders) - set(remaining) - done_studies):
+        complete_study(con, variant, folders[variant], on_complete)
+
+    workers = min(workers or available_cores(), max(len(pending), 1))
+    print(f"{len(pending)} cycle(s) to run on {workers} worker(s)")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_cycle, job, command, con, max_retries, manifest): job for job in pending}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            status = fut.result()
+            print(f"  {job['stem']}: {status}")
+            if status != "done":
+                continue
+            remaining[job["variant"]] -= 1
+            if remaining[job["variant"]] == 0:
+                rejected, hook_rc = complete_study(con, job["variant"], folders[job["variant"]], on_complete)
+                print(f"  {job['variant']} complete ({rejected} cycle(s) rejected by validation"
+                      + (f", hook exit {hook_rc})" if hook_rc is not None else ")"))
+
+    counts = {}
+    for job in jobs(con):
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return counts
+
+
+def main():
+    p = argparse.ArgumentParser(description="Run the cycles of a campaign manifest on a local process pool.")
+    p.add_argument("campaign", type=Path, help="Campaign folder with manifest.csv (campaign.py output).")
+    p.add_argument("--command", default=COMMAND,
+                   help="Command per cycle, run in the input folder; fields {stem} {input} {folder} {seed}.")
+    p.add_argument("--workers", type=int, default=None, help="Parallel cycles (default: available cores).")
+    p.add_argument("--retries", type=int, default=MAX_RETRIES, help="Retries per failed cycle, each with a new seed.")
+    p.add_argument("--on-complete", default=None,
+                   help="Command run in a variant folder once all its cycles are done; fields {variant} {folder}.")
+    args = p.parse_args()
+
+    counts = schedule(args.campaign, args.command, args.workers, args.retries, args.on_complete)
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # repo root
+import fluka_input
+
+INPUT = """\
+TITLE
+preprocessor test
+#define lead
+#define glass
+#undef glass
+#ifndef glass
+MATERIAL                          11.35                               NOGLASS
+#ifdef lead
+MATERIAL                          11.35                               NGLEAD
+#else
+MATERIAL                           6.22                               NGOTHER
+#endif
+#else
+MATERIAL                           6.22                               GLASS
+#endif
+#if lead
+COMPOUND       -0.01      LEAD     -0.99       AIR                    LEADvar
+#elif glass
+COMPOUND       -0.02      LEAD     -0.98       AIR                    LEADvar
+#else
+COMPOUND       -0.03      LEAD     -0.97       AIR                    LEADvar
+#endif
+STOP
+"""
+
+
+def active_sdums(model):
+    return [c["sdum"] for c in fluka_input.active_cards(model) if c["name"] in ("MATERIAL", "COMPOUND")]
+
+
+def test_round_trip():
+    model = fluka_input.parse_text(INPUT)
+    assert fluka_input.to_text(model) == INPUT
+
+
+def test_undef_removes_define():
+    model = fluka_input.parse_text(INPUT)
+    assert model["defines"] == ["lead"]
+
+
+def test_ifndef_branches():
+    model = fluka_input.parse_text(INPUT)
+    assert active_sdums(model) == ["NOGLASS", "NGLEAD", "LEADvar"]
+    assert fluka_input.active_cards(model, "COMPOUND")[0]["whats"][0] == -0.01
+    # #ifndef closes its own block: the cards after it are back at the top level
+    assert fluka_input.find(model, "STOP")["branch"] == ()
+
+
+def test_set_defines_with_undef():
+    model = fluka_input.set_defines(fluka_input.parse_text(INPUT), ["glass"])
+    assert model["defines"] == ["glass"]
+    assert active_sdums(model) == ["GLASS", "LEADvar"]
+    assert fluka_input.active_cards(model, "COMPOUND")[0]["whats"][0] == -0.02
+    assert fluka_input.parse_text(fluka_input.to_text(model))["defines"] == ["glass"]
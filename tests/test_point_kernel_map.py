@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "data_analysis" / "dose_calculations"))
+import point_kernel_map
+
+
+def card(name, *whats, sdum=""):
+    return name.ljust(10) + "".join(str(w).rjust(10) for w in whats).ljust(60) + sdum
+
+
+def write_input(path, define):
+    lines = [
+        card("TITLE"), "point kernel preprocessor test",
+        f"#define {define}" if define else "* nothing defined",
+        card("BEAMPOS", 1.0, 2.0, 3.0),
+        card("GEOBEGIN", sdum="COMBNAME"), "    0    0",
+        "RPP blk -1000 1000 -1000 1000 -1000 1000",
+        "RPP air -500 500 -500 500 -500 500",
+        "#if wall1", "RPP wall1 10 12 -50 50 -50 50",
+        "#elif wall2", "RPP wall2 20 23 -50 50 -50 50",
+        "#else", "RPP wall3 30 34 -50 50 -50 50",
+        "#endif",
+        "END",
+        "BLKBODY 5 +blk -air",
+        "#if wall1", "WALL 5 +wall1", "AIR 5 +air -wall1",
+        "#elif wall2", "WALL 5 +wall2", "AIR 5 +air -wall2",
+        "#else", "WALL 5 +wall3", "AIR 5 +air -wall3",
+        "#endif",
+        "END",
+        card("GEOEND"),
+        card("ASSIGNMA", "BLCKHOLE", "BLKBODY"),
+        card("ASSIGNMA", "LEAD", "WALL"),
+        card("ASSIGNMA", "AIR", "AIR"),
+        card("STOP"),
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="latin-1")
+    return path
+
+
+@pytest.mark.parametrize("define, x_range", [("wall1", (10, 12)), ("wall2", (20, 23)), (None, (30, 34))])
+def test_only_the_active_branch_is_loaded(tmp_path, define, x_range):
+    inp = write_input(tmp_path / "pk.inp", define)
+    bodies, regions, materials = point_kernel_map.read_geometry(inp)
+    walls = {"wall1", "wall2", "wall3"}
+    assert walls & set(bodies) == {f"wall{x_range[0] // 10}"}
+    assert len(regions["WALL"]) == 1 and len(regions["AIR"]) == 1
+
+    barriers = point_kernel_map.barrier_zones(bodies, regions, materials)
+    assert barriers["starts"].size == 1
+    np.testing.assert_allclose(barriers["bbox"][0][[0, 3]], x_range)
+    np.testing.assert_allclose(point_kernel_map.read_source(inp), [1.0, 2.0, 3.0])
+
+
+def test_skipped_zones_are_reported(capsys):
+    bodies = {"cyl": ("RCC", [0, 0, 0, 0, 0, 10, 5], None), "box": ("RPP", [0, 1, 0, 1, 0, 1], None)}
+    regions = {"SHIELD": [[("+", "cyl")], [("+", "box")]]}
+    barriers = point_kernel_map.barrier_zones(bodies, regions, {"SHIELD": "LEAD"})
+    assert barriers["starts"].size == 1
+    out = capsys.readouterr().out
+    assert "SHIELD (LEAD): 1 zone(s)" in out and "cyl (RCC, not planar)" in out
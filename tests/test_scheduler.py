@@ -0,0 +1,90 @@
+import os
+import shlex
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))  # repo root
+import campaign
+import fluka_input
+import scheduler
+
+FAKE = f"{shlex.quote(sys.executable)} {shlex.quote(str(ROOT / 'fake_fluka.py'))} {{input}}"
+BASE = """\
+TITLE
+scheduler test
+RANDOMIZ         1.0
+START         1000.0
+STOP
+"""
+
+
+@pytest.fixture
+def out_dir(tmp_path):
+    (tmp_path / "base.inp").write_text(BASE, encoding="latin-1")
+    grid = {"base": tmp_path / "base.inp", "out": tmp_path / "campaign", "name": "var", "cycles": 3, "seed": 1,
+            "parameters": {}}
+    campaign.write_manifest(campaign.generate(grid), grid["out"])
+    return grid["out"]
+
+
+def db_rows(out_dir):
+    con = sqlite3.connect(out_dir / scheduler.DB_NAME)
+    con.row_factory = sqlite3.Row
+    try:
+        return {r["stem"]: dict(r) for r in con.execute("SELECT * FROM jobs")}
+    finally:
+        con.close()
+
+
+def test_retry_gets_a_new_seed_in_input_and_manifest(out_dir):
+    counts = scheduler.schedule(out_dir, f"{FAKE} --fail-seeds 1", workers=1)
+    assert counts == {"done": 3}
+
+    job = db_rows(out_dir)["var_01"]
+    assert job["attempts"] == 2 and job["seed"] == 4      # seeds 1-3 are taken, the retry gets 4
+    inp = fluka_input.parse(out_dir / "var" / "var_01.inp")
+    assert fluka_input.find(inp, "RANDOMIZ")["whats"][campaign.SEED_WHAT - 1] == 4.0
+    manifest = {r["stem"]: r for r in campaign.read_manifest(out_dir / campaign.MANIFEST_NAME)}
+    assert manifest["var_01"]["seed"] == "4" and manifest["var_02"]["seed"] == "2"
+    assert (out_dir / "var" / scheduler.FAILED_DIR / "attempt_1" / "var_01001.out").is_file()
+
+
+def test_killed_campaign_resumes_from_the_job_database(out_dir):
+    proc = subprocess.Popen([sys.executable, str(ROOT / "scheduler.py"), str(out_dir), "--workers", "1",
+                             "--command", f"{FAKE} --sleep 1"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, start_new_session=True)
+    try:
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if (out_dir / scheduler.DB_NAME).exists():
+                states = [r["status"] for r in db_rows(out_dir).values()]
+                if "done" in states and "running" in states:
+                    break
+            time.sleep(0.05)
+        else:
+            pytest.fail("scheduler never had a finished and a running cycle")
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)     # the scheduler and the running cycle
+        proc.wait()
+
+    before = db_rows(out_dir)
+    done = {s for s, r in before.items() if r["status"] == "done"}
+    killed = {s for s, r in before.items() if r["status"] == "running"}
+    assert done and killed
+
+    assert scheduler.schedule(out_dir, FAKE, workers=1) == {"done": 3}
+    after = db_rows(out_dir)
+    for stem in done:       # finished cycles are not run again
+        assert after[stem]["attempts"] == 1 and after[stem]["finished"] == before[stem]["finished"]
+    for stem in killed:     # the interrupted cycle is started again and completes
+        assert after[stem]["attempts"] == before[stem]["attempts"] + 1
+        assert (out_dir / "var" / f"{stem}001.out").is_file()
+    with sqlite3.connect(out_dir / scheduler.DB_NAME) as con:
+        assert con.execute("SELECT COUNT(*) FROM studies").fetchone()[0] == 1
@@ -3,10 +3,13 @@ from pathlib import Path
 import shutil
 import re
 
+import fluka_store
+
 # ---- CONFIGURATION ----
 DEFAULT_SRC = "/Users/weli/Documents/fluka/Projects/MSc"  # Path to base folder containing FLUKA project data
 DEFAULT_DEST = "."                                        # Path to where matching files will be copied
 OUT_PATTERN = re.compile(r"\d{5}\.out$", re.IGNORECASE)   # Match any filename ending with 5 digits + .out
+INGEST = True                                             # Also parse copied files into the .npz columnar store
 
 
 def files_differ(src, dst):
@@ -44,14 +47,27 @@ def should_take(path, src_base):
     return None
 
 
+def ingest_file(dst, file_type):
+    """
+    Parse a copied file into its .npz store (see fluka_store.SCHEMAS) unless the store is already fresh.
+    Returns True if the store was (re)built.
+    """
+    if fluka_store.is_fresh(dst):
+        return False
+    rows = fluka_store.ingest(dst, file_type)
+    print(f"Ingested: {dst.name} -> " + ", ".join(f"{t} ({n} rows)" for t, n in rows.items()))
+    return True
+
+
 def main():
     """
     Walk the source tree, apply filters, and copy matching files to destination while preserving structure.
+    With INGEST enabled, every copied file is also parsed once into a typed columnar store.
     """
     src_base = Path(DEFAULT_SRC).expanduser().resolve()
     dest_base = Path(DEFAULT_DEST).expanduser().resolve()
 
-    copied, up_to_date = 0, 0
+    copied, up_to_date, ingested = 0, 0, 0
     type_counts = {"tab.lis": 0, "bnn.lis": 0, "out": 0}
 
     for root, dirs, files in os.walk(src_base):
@@ -78,10 +94,15 @@ def main():
             else:
                 up_to_date += 1
 
+            if INGEST and ingest_file(dst, file_type):
+                ingested += 1
+
     total = copied + up_to_date
     print(f"\nDone. Considered {total} matching files.")
     print(f"Copied/updated: {copied}")
     print(f"Up-to-date:     {up_to_date}")
+    if INGEST:
+        print(f"Ingested:       {ingested}")
     print("\nFile type counts:")
     for ftype, count in type_counts.items():
         print(f"  {ftype}: {count}")
@@ -0,0 +1,281 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+import fluka_store
+from run_times import CPU_TIME_RE, PRIMARIES_RE
+
+sys.path.append(str(Path(__file__).resolve().parent / "plot_2Dmaps"))
+from usrbin_decode import read_fortran_record
+
+# ---- CONFIGURATION ----
+TAIL_BYTES = 1 << 16            # the run summary is within the last lines of a .out file
+Z_MAX = 3.5                     # robust z-score above which a value is an outlier
+MAX_OUTLIER_FRACTION = 0.10     # a cycle is rejected when more of its values than this are outliers
+MIN_CYCLES = 4                  # fewer cycles give no meaningful median/MAD
+CHUNK = 1 << 20                 # mesh voxels per robust-z pass
+REPORT_NAME = "validation_report.csv"
+CACHE_NAME = "validation_cache.json"    # per folder: verdicts and run summaries keyed by file mtime/size
+USRBIN_UNITS = {"tld": 25, "mesh": 23}   # main_study: tldDosH (region binning), dosDisH (Cartesian mesh)
+
+START_RE = re.compile(r"^START(.*)$", re.MULTILINE)
+CYCLE_RE = re.compile(r"^(.*?)(?:_fort\.\d+|\.out)$")
+
+
+# ---------------- completeness ----------------
+def cycle_stem(path):
+    """'run_01001.out' and 'run_01001_fort.25' -> 'run_01001'."""
+    m = CYCLE_RE.match(Path(path).name)
+    return m.group(1) if m else Path(path).stem
+
+
+def read_summary(out_path, tail_bytes=TAIL_BYTES):
+    """(cpu_seconds, primaries) from the end of a .out file; None where the summary line is missing."""
+    with open(out_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - tail_bytes, 0))
+        tail = f.read().decode("latin1")
+    cpu = [m.group(1) for line in tail.splitlines() if (m := CPU_TIME_RE.search(line))]
+    prim = [m.group(1) for line in tail.splitlines() if (m := PRIMARIES_RE.search(line))]
+    return (float(cpu[-1]) if cpu else None), (int(prim[-1]) if prim else None)
+
+
+def requested_primaries(inp_path):
+    """Primaries requested by the START card (WHAT(1), columns 11-20) of a FLUKA input, else None."""
+    m = START_RE.search(Path(inp_path).read_text(errors="ignore"))
+    what1 = m.group(0)[10:20].strip() if m else ""
+    try:
+        return int(float(what1.replace("D", "E")))
+    except ValueError:
+        return None
+
+
+def find_inputs(folder):
+    """The FLUKA inputs of a run folder (one per cycle series, e.g. run_01.inp for run_01001.out)."""
+    return sorted(Path(folder).glob("*.inp"))
+
+
+def _requested(stem, requested):
+    """Requested primaries of a cycle: one count for all, or {input stem: count} (cycle = input + NNN)."""
+    if not isinstance(requested, dict):
+        return requested
+    if stem[:-3] in requested:
+        return requested[stem[:-3]]
+    return next(iter(requested.values())) if len(requested) == 1 else None
+
+
+def _file_key(path):
+    st = Path(path).stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_cache(path):
+    """Validation cache of a folder; empty if missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path):
+    tmp = Path(path).with_name(Path(path).name + ".tmp")
+    tmp.write_text(json.dumps(cache, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def check_completeness(out_files, requested=None, summaries=None):
+    """
+    Per cycle: summary present and primaries equal to the requested count (when known; see _requested).
+    summaries ({file name: {'key', 'cpu', 'primaries'}}) caches read_summary while a file is unchanged.
+    """
+    rows = {}
+    for fp in out_files:
+        key = _file_key(fp)
+        cached = summaries.get(fp.name) if summaries is not None else None
+        if cached and cached["key"] == key:
+            cpu, primaries = cached["cpu"], cached["primaries"]
+        else:
+            cpu, primaries = read_summary(fp)
+            if summaries is not None:
+                summaries[fp.name] = {"key": key, "cpu": cpu, "primaries": primaries}
+        want = _requested(cycle_stem(fp), requested)
+        complete = cpu is not None and primaries is not None and (want is None or primaries == want)
+        rows[cycle_stem(fp)] = {"summary": cpu is not None and primaries is not None,
+                                "primaries": primaries, "complete": complete}
+    return rows
+
+
+# ---------------- robust outliers ----------------
+def robust_z(X):
+    """Robust z-scores along axis 0 (cycles): 0.6745 (x − median) / MAD; 0 where the MAD vanishes."""
+    X = np.asarray(X, dtype=float)
+    med = np.median(X, axis=0)
+    mad = np.median(np.abs(X - med), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(mad > 0, 0.6745 * (X - med) / mad, 0.0)
+
+
+def outlier_fraction(X, z_max=Z_MAX):
+    """Fraction of values per cycle with |z| > z_max, for X of shape (n_cycles, ...)."""
+    X = np.asarray(X, dtype=float)
+    flat = X.reshape(X.shape[0], -1)
+    return (np.abs(robust_z(flat)) > z_max).mean(axis=1) if flat.shape[1] else np.zeros(X.shape[0])
+
+
+def _usrbin_values(path):
+    """First USRBIN detector of a binary file as a read-only float32 memmap (no full read)."""
+    with open(path, "rb") as f:
+        read_fortran_record(f)                          # title
+        ints = np.frombuffer(read_fortran_record(f)[10:], dtype=np.int32)
+        n = int(ints[5]) * int(ints[9]) * int(ints[13])
+        offset = f.tell() + 4                           # skip the length word of the values record
+    return np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(n,))
+
+
+def usrbin_outlier_fraction(files, z_max=Z_MAX, chunk=CHUNK):
+    """outlier_fraction over per-cycle USRBIN binaries, streamed in voxel chunks."""
+    maps = [_usrbin_values(fp) for fp in files]
+    n = min(m.size for m in maps)
+    counts = np.zeros(len(maps))
+    for a in range(0, n, chunk):
+        X = np.stack([m[a:a + chunk] for m in maps]).astype(np.float64)
+        counts += (np.abs(robust_z(X)) > z_max).sum(axis=1)
+    return counts / max(n, 1)
+
+
+def _em_energy(fp):
+    return fluka_store.load_or_parse(fp, "out", "em_energy")["energy"]
+
+
+# ---------------- validation ----------------
+def validate(folder, inp=None, usrbin_units=None, z_max=Z_MAX, max_fraction=MAX_OUTLIER_FRACTION,
+             processes=None, use_cache=True):
+    """
+    Validate every cycle of a run folder. Returns {cycle: row} with completeness, the outlier fraction
+    of each check (EM-ENRGY regions and each USRBIN unit) and 'ok'.
+    inp is the input with the requested START primaries, or a list of them (find_inputs), each
+    applying to the cycles named after it. The verdict is cached in the folder (CACHE_NAME) and
+    reused while no .out, binary or input file has changed in mtime or size.
+    """
+    folder = Path(folder)
+    usrbin_units = USRBIN_UNITS if usrbin_units is None else usrbin_units
+    inputs = [] if inp is None else [inp] if isinstance(inp, (str, Path)) else list(inp)
+    out_files = sorted(folder.glob("*.out"))
+    unit_files = {label: sorted(folder.glob(f"*_fort.{abs(int(unit))}")) for label, unit in usrbin_units.items()}
+
+    cache_path = folder / CACHE_NAME
+    cache = load_cache(cache_path) if use_cache else {}
+    signature = {
+        "files": {fp.name: _file_key(fp) for fp in [*out_files, *(f for fs in unit_files.values() for f in fs)]},
+        "inputs": {str(Path(fp).resolve()): _file_key(fp) for fp in inputs},
+        "settings": [z_max, max_fraction, sorted([k, int(u)] for k, u in usrbin_units.items())],
+    }
+    if cache.get("signature") == signature:
+        return cache["report"]
+
+    requested = {Path(fp).stem: requested_primaries(fp) for fp in inputs}
+    summaries = cache.setdefault("summaries", {})
+    rows = check_completeness(out_files, requested, summaries)
+    report = {stem: {**row, "checks": {}} for stem, row in rows.items()}
+
+    # Per region: EM-ENRGY of every complete cycle
+    if out_files:
+        processes = min(processes or os.cpu_count() or 1, len(out_files))
+        if processes == 1:
+            energies = [_em_energy(fp) for fp in out_files]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                energies = list(pool.map(_em_energy, out_files))
+        n_regions = max(e.size for e in energies)
+        with_table = [(fp, e) for fp, e in zip(out_files, energies) if e.size == n_regions and n_regions]
+        for fp, e in zip(out_files, energies):
+            if n_regions and e.size != n_regions:
+                report[cycle_stem(fp)]["complete"] = False          # truncated / missing EM-ENRGY table
+        if len(with_table) >= MIN_CYCLES:
+            frac = outlier_fraction(np.stack([e for _, e in with_table]), z_max)
+            for (fp, _), f in zip(with_table, frac):
+                report[cycle_stem(fp)]["checks"]["regions"] = float(f)
+
+    # Per TLD / per mesh voxel: per-cycle USRBIN binaries
+    for label, files in unit_files.items():
+        if len(files) < MIN_CYCLES:
+            continue
+        for fp, f in zip(files, usrbin_outlier_fraction(files, z_max)):
+            # A binary without its .out is only acceptable when the folder holds no .out files at all
+            report.setdefault(cycle_stem(fp), {"summary": None, "primaries": None, "complete": not out_files,
+                                               "checks": {}})["checks"][label] = float(f)
+
+    for row in report.values():
+        row["ok"] = bool(row["complete"]) and all(f <= max_fraction for f in row["checks"].values())
+    if use_cache and (out_files or any(unit_files.values())):
+        summaries = {fp.name: summaries[fp.name] for fp in out_files if fp.name in summaries}
+        try:
+            save_cache({"signature": signature, "report": report, "summaries": summaries}, cache_path)
+        except OSError:             # read-only run folder: validate without caching
+            pass
+    return report
+
+
+def bad_runs(report):
+    """Cycle stems that failed validation."""
+    return {stem for stem, row in report.items() if not row["ok"]}
+
+
+# ---------------- output ----------------
+def print_report(report, max_fraction=MAX_OUTLIER_FRACTION):
+    checks = list(dict.fromkeys(c for row in report.values() for c in row["checks"]))
+    table = Table(title=f"\nRun validation (outlier fraction limit {max_fraction:.0%})")
+    for h in ["Cycle", "Summary", "Primaries"] + [f"Outliers\n{c}" for c in checks] + ["OK"]:
+        table.add_column(h, justify="center")
+    for stem, row in sorted(report.items()):
+        prim = "—" if row["primaries"] is None else f"{row['primaries']:.3e}"
+        summary = {True: "yes", False: "MISSING", None: "—"}[row["summary"]]
+        cells = [f"{row['checks'][c]:.1%}" if c in row["checks"] else "—" for c in checks]
+        table.add_row(stem, summary, prim, *cells, "yes" if row["ok"] else "NO")
+    Console(width=120, markup=False).print(table)
+
+
+def write_report(report, out_path):
+    checks = list(dict.fromkeys(c for row in report.values() for c in row["checks"]))
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["cycle", "summary", "primaries", "complete"] + [f"outliers_{c}" for c in checks] + ["ok"])
+        for stem, row in sorted(report.items()):
+            w.writerow([stem, row["summary"], row["primaries"], row["complete"]]
+                       + [row["checks"].get(c, "") for c in checks] + [row["ok"]])
+    return out_path
+
+
+def main():
+    p = argparse.ArgumentParser(description="Check FLUKA cycles for completeness and statistical outliers.")
+    p.add_argument("folder", type=Path, help="Folder with the per-cycle .out and binary files.")
+    p.add_argument("--inp", type=Path, default=None,
+                   help="FLUKA input with the requested START primaries (default: the folder's *.inp).")
+    p.add_argument("--tld-unit", type=int, default=USRBIN_UNITS["tld"])
+    p.add_argument("--mesh-unit", type=int, default=USRBIN_UNITS["mesh"])
+    p.add_argument("--z-max", type=float, default=Z_MAX)
+    p.add_argument("--max-fraction", type=float, default=MAX_OUTLIER_FRACTION)
+    args = p.parse_args()
+
+    report = validate(args.folder, args.inp or find_inputs(args.folder), {"tld": args.tld_unit, "mesh": args.mesh_unit},
+                      args.z_max, args.max_fraction)
+    if not report:
+        print(f"No cycles found in {args.folder}")
+        return
+    print_report(report, args.max_fraction)
+    bad = bad_runs(report)
+    print(f"{len(bad)} of {len(report)} cycles rejected" + (f": {', '.join(sorted(bad))}" if bad else ""))
+    print(f"Saved: {write_report(report, args.folder / REPORT_NAME)}")
+
+
+if __name__ == "__main__":
+    main()